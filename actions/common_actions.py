@@ -1,11 +1,14 @@
 # actions/common_actions.py
+import base64
 import time
 import os
 from appium.webdriver.common.appiumby import AppiumBy
-from selenium.webdriver.support.ui import WebDriverWait
+from utils.step_timing import TimedWebDriverWait as WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from appium.webdriver.extensions.android.nativekey import AndroidKey
+from utils import cancellation, dumpsys_parser, app_launch, perf_stats, config_loader, screenshot_service, screencap, visual_diff, image_locator, element_capture, screen_recorder, adb_client, adb_sync, fixture_sync, install_manager, app_snapshot
+from utils.power_profiler import DEFAULT_THROTTLE_STATUS
 
 def get_by_mapping(selector_value: str = None, include_text: bool = True):
     """Helper function to create consistent by_mapping dictionaries"""
@@ -20,33 +23,145 @@ def get_by_mapping(selector_value: str = None, include_text: bool = True):
         mapping["TEXT"] = (AppiumBy.XPATH, f"//*[@text='{selector_value}']")
     return mapping
 
+def _click_image(driver, template_path: str, timeout: int = 10):
+    """Tap the center of a template image found on screen (selector_type IMAGE)"""
+    try:
+        match = image_locator.locate(driver, template_path, timeout)
+        if not match:
+            return False, f"Image '{template_path}' not found on screen within {timeout}s"
+        x, y = match.center
+        driver.execute_script('mobile: shell', {'command': f'input tap {x} {y}'})
+        cancellation.sleep(0.5)
+        return True, f"Clicked image '{template_path}' at ({x},{y}), score {match.score:.3f}"
+    except Exception as e:
+        return False, f"Error clicking image: {e}"
+
 # --- Action Functions ---
 # Each function takes the driver object as the first argument,
 # followed by parameters specific to the action.
 
-def launch_app_by_package(driver, package_name: str, activity_name: str = None):
-    """Launch or bring an app to foreground using package name"""
+def _wait_until_ready(driver, package_name: str, started: float, timeout: float,
+                      wait_selector_type: str = None, wait_selector_value: str = None):
+    """Wait for a launched app's readiness signal; returns (ready, failure message)"""
+    if wait_selector_type and wait_selector_value:
+        remaining = max(1, int(timeout - (time.monotonic() - started)))
+        found, message = wait_for_element(driver, wait_selector_type, wait_selector_value, remaining)
+        return found, None if found else f"Launched '{package_name}' but it did not become ready: {message}"
+    deadline = started + timeout
+    while driver.current_package != package_name:
+        if time.monotonic() >= deadline:
+            return False, f"Launched '{package_name}' but current package is '{driver.current_package}'"
+        cancellation.sleep(0.2)
+    return True, None
+
+def _launch_result(package_name: str, component: str, launch: dict, started: float,
+                   wait_selector_type: str = None, wait_selector_value: str = None):
+    return {
+        "package": package_name,
+        "component": component,
+        "launch_state": launch.get('launch_state'),
+        "total_time_ms": launch.get('total_time_ms'),
+        "ready_ms": int((time.monotonic() - started) * 1000),
+        "ready_signal": f"{wait_selector_type}={wait_selector_value}" if wait_selector_type and wait_selector_value
+                        else ("first_frame" if component else "current_package"),
+    }
+
+def _start_cached(driver, key: tuple, resolver, arguments: str = ''):
+    """am start -W a cached component; re-resolves once if the cached one no longer starts.
+
+    Returns (component, launch) or (None, None) when nothing resolves.
+    """
+    for _ in range(2):
+        component = app_launch.cached_component(driver, key, resolver)
+        if not component:
+            return None, None
+        launch = app_launch.am_start(driver, component, arguments)
+        # The app was already on top and received the intent: nothing more to wait for
+        if not launch['error'] or launch['error'].startswith('Warning: Activity not started'):
+            break
+        # The app may have been reinstalled with different activities
+        app_launch.forget_component(driver, key)
+    return component, launch
+
+def launch_app_by_package(driver, package_name: str, activity_name: str = None, wait_selector_type: str = None,
+                          wait_selector_value: str = None, timeout: int = 20):
+    """Launch or bring an app to foreground using package name, returning once it is ready.
+
+    The activity (or the package's launcher activity) is started with
+    `am start -W`, which returns when its first frame is drawn. When a wait
+    selector is given, the launch also waits for that element to appear.
+    The result includes the measured launch latency.
+    """
     try:
-        driver.activate_app(package_name)
-        time.sleep(5)
-        current_pkg = driver.current_package
-        if current_pkg == package_name:
-            return True, f"App '{package_name}' launched successfully"
-        return False, f"Launched '{package_name}' but current package is '{current_pkg}'"
+        started = time.monotonic()
+        component = app_launch.build_component(package_name, activity_name)
+        launch = {}
+        if component:
+            launch = app_launch.am_start(driver, component)
+        else:
+            component, launch = _start_cached(driver, ('launcher', package_name),
+                                              lambda: app_launch.resolve_launch_activity(driver, package_name))
+        if not component:
+            launch = {}
+            driver.activate_app(package_name)
+        elif launch['error'] and not launch['error'].startswith('Warning: Activity not started'):
+            return False, f"Error launching {component}: {launch['error']}"
+
+        ready, message = _wait_until_ready(driver, package_name, started, timeout, wait_selector_type, wait_selector_value)
+        if not ready:
+            return False, message
+        return True, _launch_result(package_name, component, launch, started, wait_selector_type, wait_selector_value)
     except Exception as e:
         return False, f"Error launching app {package_name}: {e}"
 
+def open_deep_link(driver, uri: str = None, package_name: str = None, extras: str = None,
+                   wait_selector_type: str = None, wait_selector_value: str = None, timeout: int = 20,
+                   intent_action: str = app_launch.VIEW_ACTION):
+    """Open a deep link (or start a package with intent extras) straight at the target screen.
+
+    The activity handling the URI is resolved once per session and cached,
+    so later links to the same scheme, host and path start it directly with
+    `am start -W -n`. Readiness is detected as in launch_app_by_package.
+    """
+    try:
+        if not uri and not package_name:
+            return False, "Either uri or package_name is required"
+        started = time.monotonic()
+        if uri:
+            key = app_launch.intent_key(uri, package_name, intent_action)
+            resolver = lambda: app_launch.resolve_intent_activity(driver, uri, package_name, intent_action)
+        else:
+            key = ('launcher', package_name)
+            resolver = lambda: app_launch.resolve_launch_activity(driver, package_name)
+        component, launch = _start_cached(driver, key, resolver,
+                                          app_launch.intent_arguments(uri, extras, intent_action))
+        if not component:
+            return False, f"No activity handles {uri or package_name}"
+        if launch['error'] and not launch['error'].startswith('Warning: Activity not started'):
+            return False, f"Error opening {uri or component}: {launch['error']}"
+
+        target_package = component.split('/')[0]
+        ready, message = _wait_until_ready(driver, target_package, started, timeout, wait_selector_type, wait_selector_value)
+        if not ready:
+            return False, message
+        result = _launch_result(target_package, component, launch, started, wait_selector_type, wait_selector_value)
+        return True, dict(result, uri=uri)
+    except Exception as e:
+        return False, f"Error opening deep link: {e}"
+
 def close_app(driver, package_name: str):
     """Close the specified application"""
     try:
         driver.terminate_app(package_name)
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"App '{package_name}' closed successfully"
     except Exception as e:
         return False, f"Error closing app {package_name}: {e}"
 
 def click_element(driver, selector_type: str, selector_value: str, timeout: int = 10):
     """Find and click an element using specified selector"""
+    if selector_type.upper() == "IMAGE":
+        return _click_image(driver, selector_value, timeout)
     by_mapping = get_by_mapping(selector_value)
     selector_type_upper = selector_type.upper()
 
@@ -64,7 +179,7 @@ def click_element(driver, selector_type: str, selector_value: str, timeout: int
 
         element = wait.until(EC.element_to_be_clickable((by, value)))
         element.click()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Clicked element ({selector_type}='{selector_value}')"
     except TimeoutException:
         return False, f"Element not found or not clickable within {timeout}s"
@@ -93,7 +208,7 @@ def long_click_element(driver, selector_type: str, selector_value: str, duration
             'elementId': element.id,
             'duration': duration_ms
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Long clicked element ({selector_type}='{selector_value}')"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -114,10 +229,10 @@ def input_text(driver, selector_type: str, selector_value: str, text_to_input: s
         
         if clear_first:
             element.clear()
-            time.sleep(0.2)
+            cancellation.sleep(0.2)
             
         element.send_keys(text_to_input)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Input text into element ({selector_type}='{selector_value}')"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -136,7 +251,7 @@ def clear_text_input(driver, selector_type: str, selector_value: str, timeout: i
 
         element = wait.until(EC.presence_of_element_located((by_mapping[selector_type_upper], selector_value)))
         element.clear()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Cleared text from element ({selector_type}='{selector_value}')"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -216,7 +331,7 @@ def swipe_screen(driver, direction: str, percent: int = 75, duration_ms: int = 4
             return False, f"Invalid direction: {direction}"
             
         driver.swipe(start_x, start_y, end_x, end_y, duration_ms)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Swiped screen {direction.lower()}"
     except Exception as e:
         return False, f"Error swiping screen: {e}"
@@ -267,7 +382,7 @@ def swipe_on_element(driver, selector_type: str, selector_value: str, direction:
             return False, f"Invalid direction: {direction}"
             
         driver.swipe(start_x, start_y, end_x, end_y, duration_ms)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Swiped {direction.lower()} on element ({selector_type}='{selector_value}')"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -309,7 +424,7 @@ def scroll_to_element(driver, target_selector_type: str, target_selector_value:
                     swipe_screen(driver, "UP", 75, 400)
                 else:
                     swipe_screen(driver, "LEFT", 75, 400)
-                time.sleep(0.5)
+                cancellation.sleep(0.5)
 
         return False, f"Element not found after {max_swipes} swipes"
     except Exception as e:
@@ -341,7 +456,7 @@ def pinch_zoom(driver, percent: int = 200, steps: int = 50):
                 'steps': steps
             })
         
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Pinch/zoom gesture completed ({percent}%)"
     except Exception as e:
         return False, f"Error performing pinch/zoom: {e}"
@@ -371,7 +486,7 @@ def press_android_key(driver, key_code_name: str):
 
     try:
         driver.press_keycode(key_mapping[key_code_upper])
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Pressed key '{key_code_upper}'"
     except Exception as e:
         return False, f"Error pressing key: {e}"
@@ -380,7 +495,7 @@ def hide_keyboard(driver):
     """Attempts to hide the software keyboard"""
     try:
         driver.hide_keyboard()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, "Keyboard hidden"
     except Exception as e:
         return False, f"Error hiding keyboard: {e}"
@@ -389,7 +504,7 @@ def open_notifications(driver):
     """Opens the Android notification shade"""
     try:
         driver.open_notifications()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Notifications opened"
     except Exception as e:
         return False, f"Error opening notifications: {e}"
@@ -399,9 +514,9 @@ def open_quick_settings(driver):
     try:
         # Swipe down twice to open quick settings
         swipe_screen(driver, "DOWN", 25, 200)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         swipe_screen(driver, "DOWN", 25, 200)
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Quick settings opened"
     except Exception as e:
         return False, f"Error opening quick settings: {e}"
@@ -413,7 +528,7 @@ def lock_device(driver, seconds: int = 0):
             driver.lock(seconds)
         else:
             driver.lock()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"Device locked for {seconds} seconds" if seconds > 0 else "Device locked"
     except Exception as e:
         return False, f"Error locking device: {e}"
@@ -422,7 +537,7 @@ def unlock_device(driver):
     """Attempts to unlock the device"""
     try:
         driver.unlock()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Device unlocked"
     except Exception as e:
         return False, f"Error unlocking device: {e}"
@@ -435,7 +550,7 @@ def set_rotation(driver, orientation: str):
             return False, f"Invalid orientation: {orientation}"
         
         driver.orientation = orientation
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"Device orientation set to {orientation}"
     except Exception as e:
         return False, f"Error setting device orientation: {e}"
@@ -444,7 +559,7 @@ def shake_device(driver):
     """Simulates shaking the device (emulator feature)"""
     try:
         driver.execute_script('mobile: shake')
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, "Device shaken"
     except Exception as e:
         return False, f"Error shaking device: {e}"
@@ -453,7 +568,7 @@ def fingerprint_auth(driver, finger_id: int = 1):
     """Simulates successful fingerprint auth (emulator feature)"""
     try:
         driver.execute_script('mobile: fingerprint', {'fingerprintId': finger_id})
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Fingerprint authentication simulated (ID: {finger_id})"
     except Exception as e:
         return False, f"Error simulating fingerprint auth: {e}"
@@ -461,7 +576,7 @@ def fingerprint_auth(driver, finger_id: int = 1):
 def wait_seconds(driver, seconds: float):
     """Pause execution for specified duration"""
     try:
-        time.sleep(float(seconds))
+        cancellation.sleep(float(seconds))
         return True, f"Waited for {seconds} seconds"
     except ValueError:
         return False, f"Invalid wait duration: {seconds}"
@@ -470,6 +585,14 @@ def wait_seconds(driver, seconds: float):
 
 def wait_for_element(driver, selector_type: str, selector_value: str, timeout: int = 10, visible: bool = True):
     """Wait for element to be present or visible"""
+    if selector_type.upper() == "IMAGE":
+        try:
+            match = image_locator.locate(driver, selector_value, timeout)
+            if match:
+                return True, f"Image '{selector_value}' found at {match.to_dict()}"
+            return False, f"Image '{selector_value}' not found on screen within {timeout}s"
+        except Exception as e:
+            return False, f"Error waiting for image: {e}"
     try:
         wait = WebDriverWait(driver, timeout)
         by_mapping = get_by_mapping(selector_value)
@@ -497,6 +620,13 @@ def wait_for_element(driver, selector_type: str, selector_value: str, timeout: i
 
 def wait_for_element_to_disappear(driver, selector_type: str, selector_value: str, timeout: int = 10):
     """Wait for element to become invisible or not present"""
+    if selector_type.upper() == "IMAGE":
+        try:
+            if image_locator.wait_until_gone(driver, selector_value, timeout):
+                return True, f"Image '{selector_value}' disappeared"
+            return False, f"Image '{selector_value}' still on screen after {timeout}s"
+        except Exception as e:
+            return False, f"Error waiting for image to disappear: {e}"
     try:
         wait = WebDriverWait(driver, timeout)
         by_mapping = get_by_mapping(selector_value)
@@ -619,25 +749,30 @@ def verify_element_attribute(driver, selector_type: str, selector_value: str, at
         message = f"Error checking element attribute: {e}"
         return not fail_test_if_not, message
 
-def take_screenshot(driver, filename: str):
-    """Save screenshot to reports directory"""
-    project_root = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
-    reports_dir = os.path.join(project_root, 'reports')
-    
-    if not os.path.exists(reports_dir):
-        try:
-            os.makedirs(reports_dir)
-        except OSError as e:
-            return False, f"Error creating reports directory: {e}"
+def _queue_screenshot(driver, filepath: str, capture_backend: str = "appium"):
+    """Capture the screen now and leave encoding and writing to the screenshot service"""
+    service = screenshot_service.get_service()
+    if (capture_backend or "appium").lower() == "appium":
+        return service.capture(driver, filepath)
+    return service.submit_frame(screencap.capture_frame(driver, capture_backend), filepath)
+
+def take_screenshot(driver, filename: str, capture_backend: str = "appium"):
+    """Save screenshot to reports directory (the file is written in the background).
+
+    capture_backend 'screencap' reads raw pixels over `adb exec-out` instead of
+    an Appium PNG screenshot, which is much faster on high resolution screens.
+    """
+    try:
+        reports_dir = config_loader.get_reports_dir()
+    except OSError as e:
+        return False, f"Error creating reports directory: {e}"
 
     safe_filename = filename.replace("..", "").replace("/", "_").replace("\\", "_")
     filepath = os.path.join(reports_dir, safe_filename)
     
     try:
-        success = driver.save_screenshot(filepath)
-        if success:
-            return True, f"Screenshot saved to {filepath}"
-        return False, f"Failed to save screenshot {safe_filename}"
+        _queue_screenshot(driver, filepath, capture_backend)
+        return True, f"Screenshot captured, being written to {filepath}"
     except Exception as e:
         return False, f"Failed to save screenshot: {e}"
 
@@ -697,7 +832,7 @@ def scroll(driver, mode: str, selector_type: str = None, selector_value: str = N
                     return True, "Element found after scrolling"
                 except TimeoutException:
                     driver.swipe(x, start_y, x, end_y, 800)
-                    time.sleep(0.5)
+                    cancellation.sleep(0.5)
                     continue
                 except Exception as e:
                     return False, f"Error during scroll: {e}"
@@ -713,7 +848,7 @@ def scroll(driver, mode: str, selector_type: str = None, selector_value: str = N
                 
                 last_page_source = current_page_source
                 driver.swipe(x, start_y, x, end_y, 800)
-                time.sleep(0.5)
+                cancellation.sleep(0.5)
             
             return True, f"Completed {max_attempts} scroll attempts"
             
@@ -723,7 +858,7 @@ def scroll(driver, mode: str, selector_type: str = None, selector_value: str = N
                     driver.swipe(x, start_y, x, end_y, 800)
                 else:  # down
                     driver.swipe(x, end_y, x, start_y, 800)
-                time.sleep(0.5)
+                cancellation.sleep(0.5)
             
             return True, f"Completed {max_attempts} {mode} scrolls"
             
@@ -776,7 +911,7 @@ def clear_text_field(driver, selector_type: str, selector_value: str, timeout: i
 
         element = wait.until(EC.presence_of_element_located((by, value)))
         element.clear()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Text field cleared"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -805,7 +940,7 @@ def long_press(driver, selector_type: str, selector_value: str, duration: int =
             'elementId': element.id,
             'duration': duration
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Long press performed on element"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -833,7 +968,7 @@ def double_tap(driver, selector_type: str, selector_value: str, timeout: int = 1
         driver.execute_script('mobile: doubleClickGesture', {
             'elementId': element.id
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Double tap performed on element"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -864,7 +999,7 @@ def set_device_orientation(driver, orientation: str):
             return False, f"Invalid orientation: {orientation}"
         
         driver.orientation = orientation
-        time.sleep(1)  # Wait for orientation change to complete
+        cancellation.sleep(1)  # Wait for orientation change to complete
         return True, f"Device orientation set to {orientation}"
     except Exception as e:
         return False, f"Error setting device orientation: {e}"
@@ -915,11 +1050,28 @@ def is_app_installed(driver, package_name: str):
     except Exception as e:
         return False, f"Error checking app installation: {e}"
 
-def install_app(driver, app_path: str):
-    """Install an app from the specified path"""
+def install_app(driver, app_path: str, serials: str = None, force: bool = False, max_workers: int = 8):
+    """Install an app from the specified path, skipping devices that already have this build.
+
+    serials is a comma-separated list, "all" for every connected device, or
+    empty for the session's device. Each device's install is recorded with
+    the APK hash, so repeating it is a cheap version check; force reinstalls.
+    """
     try:
-        driver.install_app(app_path)
-        return True, f"App installed from {app_path}"
+        if serials and str(serials).strip().lower() == 'all':
+            targets = adb_client.list_devices()
+        elif serials:
+            targets = [s.strip() for s in str(serials).split(',') if s.strip()]
+        else:
+            targets = [adb_client.resolve_serial(driver)]
+        if not targets:
+            return False, "No devices to install on"
+        if not serials and not adb_sync.server_available():
+            # No local adb server (e.g. remote Appium): let Appium install it
+            driver.install_app(app_path)
+            return True, f"App installed from {app_path}"
+        results = install_manager.install(app_path, targets, force=force, max_workers=max_workers)
+        return all(r['status'] != 'failed' for r in results), {"app_path": app_path, "devices": results}
     except Exception as e:
         return False, f"Error installing app: {e}"
 
@@ -987,7 +1139,7 @@ def drag_and_drop(driver, source_selector_type: str, source_selector_value: str,
             
         # Perform drag and drop
         driver.drag_and_drop(source_element, target_element)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, "Drag and drop performed successfully"
     except TimeoutException:
         return False, f"Source or target element not found within {timeout}s"
@@ -1018,7 +1170,7 @@ def pinch_to_zoom(driver, selector_type: str, selector_value: str, scale: float
             'scale': scale,
             'velocity': velocity
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, "Pinch to zoom performed"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -1043,7 +1195,7 @@ def check_notification(driver, expected_text: str, timeout: int = 10):
     try:
         # Open notification shade
         driver.open_notifications()
-        time.sleep(1)
+        cancellation.sleep(1)
         
         # Look for notification
         notification_xpath = f"//android.widget.TextView[contains(@text, '{expected_text}')]"
@@ -1088,11 +1240,11 @@ def get_battery_level(driver):
     except Exception as e:
         return False, f"Error getting battery level: {e}"
 
-def get_storage_state(driver):
-    """Get the current storage state (total, used, free space)"""
+def get_storage_state(driver, fields: list = None):
+    """Get the current storage state (total and free space) as typed fields"""
     try:
-        storage_info = driver.execute_script('mobile: getStorageInfo')
-        return True, f"Storage info: {storage_info}"
+        storage_info = dumpsys_parser.query_dumpsys(driver, 'diskstats', fields)
+        return True, storage_info
     except Exception as e:
         return False, f"Error getting storage state: {e}"
 
@@ -1213,34 +1365,141 @@ def clear_shared_preferences(driver, package_name: str):
     except Exception as e:
         return False, f"Error clearing shared preferences: {e}"
 
-def get_app_data_dir(driver, package_name: str):
-    """Get the app's data directory path"""
+def _app_data_dir(driver, package_name: str):
+    """The app's data directory, from Appium or else from the package's dumpsys entry"""
     try:
         data_dir = driver.execute_script('mobile: getAppDataDir', {
             'appId': package_name
         })
-        return True, f"App data directory: {data_dir}"
+        if data_dir:
+            return data_dir
+    except Exception:
+        pass
+    return app_snapshot.data_dir(adb_client.resolve_serial(driver), package_name)
+
+def get_app_data_dir(driver, package_name: str):
+    """Get the app's data directory path"""
+    try:
+        return True, f"App data directory: {_app_data_dir(driver, package_name)}"
     except Exception as e:
         return False, f"Error getting app data directory: {e}"
 
+def _split_list(value):
+    """A list parameter given as a list or a comma-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+def snapshot_app_data(driver, package_name: str, name: str = "default", directories: str = None):
+    """Save the app's data (shared_prefs, databases, files, no_backup) as a named local snapshot.
+
+    Uses run-as for debuggable apps, or plain tar when adbd runs as root.
+    The snapshot is saved to reports/app_snapshots/<package>/<name>.tar and
+    can be restored with restore_app_data in one step.
+    """
+    try:
+        result = app_snapshot.snapshot(adb_client.resolve_serial(driver), package_name,
+                                       app_snapshot.snapshot_path(package_name, name),
+                                       _split_list(directories) or app_snapshot.DEFAULT_DIRECTORIES,
+                                       directory=_app_data_dir(driver, package_name))
+        return True, result
+    except Exception as e:
+        return False, f"Error taking app data snapshot: {e}"
+
+def restore_app_data(driver, package_name: str, name: str = "default", archive_path: str = None):
+    """Restore the app's data from a snapshot taken with snapshot_app_data (the app is stopped first)"""
+    try:
+        archive_path = archive_path or app_snapshot.snapshot_path(package_name, name)
+        if not os.path.exists(archive_path):
+            return False, f"Snapshot not found: {archive_path}"
+        result = app_snapshot.restore(adb_client.resolve_serial(driver), package_name, archive_path,
+                                      directory=_app_data_dir(driver, package_name))
+        return True, result
+    except Exception as e:
+        return False, f"Error restoring app data: {e}"
+
 # App Resource Actions
 
-def push_file(driver, remote_path: str, file_data: bytes):
-    """Push a file to the device"""
+def _transfer_result(direction: str, local_path: str, remote_path: str, size: int, started: float):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return {
+        "direction": direction,
+        "local_path": local_path,
+        "remote_path": remote_path,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(size / 1048576 / elapsed, 2),
+    }
+
+def push_file(driver, remote_path: str, file_data=None, local_path: str = None):
+    """Push a file to the device.
+
+    With local_path the file is streamed over the adb sync protocol in 64 KiB
+    chunks, so large fixtures are never loaded into memory. file_data goes
+    through Appium: a str is passed on as the base64 text Appium expects,
+    bytes are base64-encoded first.
+    """
     try:
+        if local_path:
+            started = time.monotonic()
+            with adb_sync.SyncConnection(adb_client.resolve_serial(driver)) as sync:
+                size = sync.push(local_path, remote_path,
+                                 progress=adb_sync.progress_logger(f"push {os.path.basename(local_path)}"))
+            return True, _transfer_result("push", local_path, remote_path, size, started)
+        if file_data is None:
+            return False, "Either local_path or file_data is required"
+        if isinstance(file_data, (bytes, bytearray)):
+            file_data = base64.b64encode(file_data).decode('ascii')
         driver.push_file(remote_path, file_data)
         return True, f"File pushed to {remote_path}"
     except Exception as e:
         return False, f"Error pushing file: {e}"
 
-def pull_file(driver, remote_path: str):
-    """Pull a file from the device"""
+def pull_file(driver, remote_path: str, local_path: str = None):
+    """Pull a file from the device to local_path (default: reports/pulled/<name>).
+
+    The file is streamed over the adb sync protocol straight to disk; when adb
+    is not reachable (e.g. a remote Appium server) it falls back to Appium.
+    """
     try:
-        file_data = driver.pull_file(remote_path)
-        return True, f"File pulled from {remote_path}"
+        if not local_path:
+            local_path = os.path.join(config_loader.get_reports_dir('pulled'), os.path.basename(remote_path.rstrip('/')))
+        started = time.monotonic()
+        try:
+            sync = adb_sync.SyncConnection(adb_client.resolve_serial(driver))
+        except (OSError, adb_sync.AdbSyncError):
+            # No local adb server, or it does not know the session's device
+            sync = None
+        if sync is None:
+            data = base64.b64decode(driver.pull_file(remote_path))
+            os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+            with open(local_path, 'wb') as f:
+                f.write(data)
+            size = len(data)
+        else:
+            with sync:
+                size = sync.pull(remote_path, local_path,
+                                 progress=adb_sync.progress_logger(f"pull {os.path.basename(remote_path)}"))
+        return True, _transfer_result("pull", local_path, remote_path, size, started)
     except Exception as e:
         return False, f"Error pulling file: {e}"
 
+def sync_directory(driver, local_dir: str, remote_dir: str, delete_stale: bool = False, max_workers: int = 4, dry_run: bool = False):
+    """Push only the files of a local directory that differ from the device copy.
+
+    Files are compared by size and mtime, then by md5 (batched on the device)
+    when only the mtime differs. Changed files are pushed in parallel over
+    the adb sync protocol; delete_stale removes remote files missing locally.
+    """
+    try:
+        result = fixture_sync.sync_directory(local_dir, remote_dir, adb_client.resolve_serial(driver),
+                                             delete_stale=delete_stale, max_workers=max_workers, dry_run=dry_run)
+        return not result['errors'], result
+    except Exception as e:
+        return False, f"Error syncing directory: {e}"
+
 def list_files(driver, remote_path: str):
     """List files in a directory on the device"""
     try:
@@ -1300,7 +1559,7 @@ def multi_tap(driver, selector_type: str, selector_value: str, tap_count: int =
         for i in range(tap_count):
             element.click()
             if i < tap_count - 1:  # Don't sleep after last tap
-                time.sleep(interval_ms / 1000.0)
+                cancellation.sleep(interval_ms / 1000.0)
         
         return True, f"Multi-tapped element ({selector_type}='{selector_value}') {tap_count} times"
     except TimeoutException:
@@ -1504,7 +1763,7 @@ def gesture_sequence(driver, gestures: list):
                 return False, f"Gesture sequence failed at {gesture_type}: {msg}"
             
             # Wait between gestures
-            time.sleep(gesture.get('delay', 0.5))
+            cancellation.sleep(gesture.get('delay', 0.5))
         
         return True, f"Gesture sequence completed: {'; '.join(results)}"
     except Exception as e:
@@ -1778,7 +2037,7 @@ def submit_form(driver, selector_type: str, selector_value: str, timeout: int =
 
         element = wait.until(EC.presence_of_element_located((by, value)))
         element.submit()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Form submitted successfully"
     except TimeoutException:
         return False, f"Form element not found within {timeout}s"
@@ -1804,7 +2063,7 @@ def clear_element(driver, selector_type: str, selector_value: str, timeout: int
 
         element = wait.until(EC.presence_of_element_located((by, value)))
         element.clear()
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Element cleared successfully"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -1830,7 +2089,7 @@ def send_keys_to_element(driver, selector_type: str, selector_value: str, keys:
 
         element = wait.until(EC.presence_of_element_located((by, value)))
         element.send_keys(keys)
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Keys sent to element: {keys}"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
@@ -1848,7 +2107,7 @@ def toggle_airplane_mode(driver):
         driver.execute_script('mobile: shell', {
             'command': 'am broadcast -a android.intent.action.AIRPLANE_MODE'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, "Airplane mode toggled"
     except Exception as e:
         return False, f"Error toggling airplane mode: {e}"
@@ -1860,7 +2119,7 @@ def toggle_wifi(driver, enable: bool = True):
         driver.execute_script('mobile: shell', {
             'command': f'settings put global wifi_on {state}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"WiFi {'enabled' if enable else 'disabled'}"
     except Exception as e:
         return False, f"Error toggling WiFi: {e}"
@@ -1872,7 +2131,7 @@ def toggle_bluetooth(driver, enable: bool = True):
         driver.execute_script('mobile: shell', {
             'command': f'settings put global bluetooth_on {state}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"Bluetooth {'enabled' if enable else 'disabled'}"
     except Exception as e:
         return False, f"Error toggling Bluetooth: {e}"
@@ -1886,7 +2145,7 @@ def set_screen_brightness(driver, brightness: int):
         driver.execute_script('mobile: shell', {
             'command': f'settings put system screen_brightness {brightness}'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"Screen brightness set to {brightness}"
     except Exception as e:
         return False, f"Error setting screen brightness: {e}"
@@ -1912,7 +2171,7 @@ def set_volume(driver, stream_type: str, volume: int):
         driver.execute_script('mobile: shell', {
             'command': f'media volume --show --stream {stream_id} --set {volume}'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"{stream_type} volume set to {volume}"
     except Exception as e:
         return False, f"Error setting volume: {e}"
@@ -1923,7 +2182,7 @@ def set_system_language(driver, language_code: str):
         driver.execute_script('mobile: shell', {
             'command': f'setprop persist.sys.language {language_code}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"System language set to {language_code}"
     except Exception as e:
         return False, f"Error setting system language: {e}"
@@ -1934,7 +2193,7 @@ def set_system_time(driver, time_string: str):
         driver.execute_script('mobile: shell', {
             'command': f'date -s {time_string}'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"System time set to {time_string}"
     except Exception as e:
         return False, f"Error setting system time: {e}"
@@ -1945,7 +2204,7 @@ def enable_developer_options(driver):
         driver.execute_script('mobile: shell', {
             'command': 'settings put global development_settings_enabled 1'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Developer options enabled"
     except Exception as e:
         return False, f"Error enabling developer options: {e}"
@@ -1956,7 +2215,7 @@ def enable_usb_debugging(driver):
         driver.execute_script('mobile: shell', {
             'command': 'settings put global adb_enabled 1'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "USB debugging enabled"
     except Exception as e:
         return False, f"Error enabling USB debugging: {e}"
@@ -1967,7 +2226,7 @@ def clear_app_cache(driver, package_name: str):
         driver.execute_script('mobile: shell', {
             'command': f'pm clear {package_name}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"Cache cleared for {package_name}"
     except Exception as e:
         return False, f"Error clearing app cache: {e}"
@@ -1978,7 +2237,7 @@ def force_stop_app(driver, package_name: str):
         driver.execute_script('mobile: shell', {
             'command': f'am force-stop {package_name}'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"App {package_name} force stopped"
     except Exception as e:
         return False, f"Error force stopping app: {e}"
@@ -1989,7 +2248,7 @@ def kill_all_background_apps(driver):
         driver.execute_script('mobile: shell', {
             'command': 'am kill-all'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, "All background apps killed"
     except Exception as e:
         return False, f"Error killing background apps: {e}"
@@ -2035,7 +2294,7 @@ def set_system_property(driver, property_name: str, value: str):
         driver.execute_script('mobile: shell', {
             'command': f'setprop {property_name} {value}'
         })
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"System property {property_name} set to {value}"
     except Exception as e:
         return False, f"Error setting system property: {e}"
@@ -2089,7 +2348,7 @@ def set_screen_resolution(driver, width: int, height: int):
         driver.execute_script('mobile: shell', {
             'command': f'wm size {width}x{height}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"Screen resolution set to {width}x{height}"
     except Exception as e:
         return False, f"Error setting screen resolution: {e}"
@@ -2110,34 +2369,27 @@ def set_screen_density(driver, density: int):
         driver.execute_script('mobile: shell', {
             'command': f'wm density {density}'
         })
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, f"Screen density set to {density}"
     except Exception as e:
         return False, f"Error setting screen density: {e}"
 
-def take_screenshot_with_timestamp(driver, filename_prefix: str = "screenshot"):
-    """Take a screenshot with timestamp in filename"""
+def take_screenshot_with_timestamp(driver, filename_prefix: str = "screenshot", capture_backend: str = "appium"):
+    """Take a screenshot with timestamp in filename (the file is written in the background)"""
     try:
         import datetime
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{filename_prefix}_{timestamp}.png"
-        
-        if not os.path.exists("reports"):
-            os.makedirs("reports")
-        
-        filepath = os.path.join("reports", filename)
-        driver.save_screenshot(filepath)
-        return True, f"Screenshot saved: {filepath}"
+        filepath = os.path.join(config_loader.get_reports_dir(), filename)
+        _queue_screenshot(driver, filepath, capture_backend)
+        return True, f"Screenshot captured, being written to {filepath}"
     except Exception as e:
         return False, f"Error taking screenshot: {e}"
 
 def record_screen(driver, duration_seconds: int = 10, filename: str = "screen_recording.mp4"):
-    """Record screen for specified duration"""
+    """Record screen for specified duration (blocks the step; see start_screen_recording)"""
     try:
-        if not os.path.exists("reports"):
-            os.makedirs("reports")
-        
-        filepath = os.path.join("reports", filename)
+        filepath = os.path.join(config_loader.get_reports_dir(), filename)
         
         # Start recording
         driver.execute_script('mobile: startRecordingScreen', {
@@ -2147,19 +2399,47 @@ def record_screen(driver, duration_seconds: int = 10, filename: str = "screen_re
         })
         
         # Wait for specified duration
-        time.sleep(duration_seconds)
+        cancellation.sleep(duration_seconds)
         
-        # Stop recording
+        # Stop recording (Appium returns the video base64-encoded)
         result = driver.execute_script('mobile: stopRecordingScreen')
         
         # Save the recording
         with open(filepath, 'wb') as f:
-            f.write(result)
+            f.write(base64.b64decode(result))
         
         return True, f"Screen recording saved: {filepath}"
     except Exception as e:
         return False, f"Error recording screen: {e}"
 
+def start_screen_recording(driver, name: str = "recording", segment_seconds: int = 170, bit_rate_mbps: float = None, size: str = None):
+    """Start recording the screen in the background until stop_screen_recording.
+
+    The recording rolls over into segments shorter than screenrecord's
+    3-minute limit; finished segments are pulled to
+    reports/recordings/<name>_<timestamp>/ while the test keeps running.
+    """
+    try:
+        import datetime
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = config_loader.get_reports_dir('recordings', f"{name}_{timestamp}")
+        recorder = screen_recorder.start(name, adb_client.resolve_serial(driver), output_dir,
+                                         segment_seconds=segment_seconds, bit_rate_mbps=bit_rate_mbps, size=size)
+        return True, f"Screen recording '{name}' started ({recorder.segment_seconds}s segments) -> {output_dir}"
+    except Exception as e:
+        return False, f"Error starting screen recording: {e}"
+
+def stop_screen_recording(driver, name: str = "recording"):
+    """Stop a background screen recording and wait for its segments to be saved"""
+    try:
+        recorder = screen_recorder.stop(name)
+        if recorder is None:
+            return False, f"No screen recording named '{name}' is running"
+        result = {"output_dir": recorder.output_dir, "segments": sorted(recorder.segments), "errors": recorder.errors}
+        return not recorder.errors and bool(recorder.segments), result
+    except Exception as e:
+        return False, f"Error stopping screen recording: {e}"
+
 def get_logcat(driver, log_level: str = "V", max_lines: int = 100):
     """Get logcat output"""
     try:
@@ -2200,43 +2480,35 @@ def get_memory_usage(driver):
     except Exception as e:
         return False, f"Error getting memory usage: {e}"
 
-def get_battery_info(driver):
-    """Get detailed battery information"""
+def get_battery_info(driver, fields: list = None):
+    """Get detailed battery information as typed fields"""
     try:
-        result = driver.execute_script('mobile: shell', {
-            'command': 'dumpsys battery'
-        })
-        return True, f"Battery info: {result}"
+        info = dumpsys_parser.query_dumpsys(driver, 'battery', fields)
+        return True, info
     except Exception as e:
         return False, f"Error getting battery info: {e}"
 
-def get_network_info(driver):
-    """Get network information"""
+def get_network_info(driver, fields: list = None):
+    """Get network information as typed fields"""
     try:
-        result = driver.execute_script('mobile: shell', {
-            'command': 'dumpsys connectivity'
-        })
-        return True, f"Network info: {result}"
+        info = dumpsys_parser.query_dumpsys(driver, 'connectivity', fields)
+        return True, info
     except Exception as e:
         return False, f"Error getting network info: {e}"
 
-def get_wifi_info(driver):
-    """Get WiFi information"""
+def get_wifi_info(driver, fields: list = None):
+    """Get WiFi information as typed fields"""
     try:
-        result = driver.execute_script('mobile: shell', {
-            'command': 'dumpsys wifi'
-        })
-        return True, f"WiFi info: {result}"
+        info = dumpsys_parser.query_dumpsys(driver, 'wifi', fields)
+        return True, info
     except Exception as e:
         return False, f"Error getting WiFi info: {e}"
 
-def get_bluetooth_info(driver):
-    """Get Bluetooth information"""
+def get_bluetooth_info(driver, fields: list = None):
+    """Get Bluetooth information as typed fields"""
     try:
-        result = driver.execute_script('mobile: shell', {
-            'command': 'dumpsys bluetooth'
-        })
-        return True, f"Bluetooth info: {result}"
+        info = dumpsys_parser.query_dumpsys(driver, 'bluetooth', fields)
+        return True, info
     except Exception as e:
         return False, f"Error getting Bluetooth info: {e}"
 
@@ -2457,36 +2729,83 @@ def verify_element_is_focused(driver, selector_type: str, selector_value: str, t
     except Exception as e:
         return False, f"Error verifying element focus: {e}"
 
-def get_element_screenshot(driver, selector_type: str, selector_value: str, filename: str = "element_screenshot.png", timeout: int = 10):
-    """Take a screenshot of a specific element"""
-    try:
-        wait = WebDriverWait(driver, timeout)
-        by_mapping = get_by_mapping(selector_value)
-        selector_type_upper = selector_type.upper()
-
-        if selector_type_upper not in by_mapping and selector_type_upper != "TEXT":
-            return False, f"Invalid selector_type '{selector_type}'"
-
-        if selector_type_upper == "TEXT":
-            by = by_mapping["TEXT"][0]
-            value = by_mapping["TEXT"][1]
-        else:
-            by = by_mapping[selector_type_upper]
-            value = selector_value
+def _snapshot_element_bounds(driver, selector_type: str, selector_value: str, timeout: int = 10, capture_backend: str = "appium", snapshot=None):
+    """Find an element's bounds in a shared screen snapshot, polling until it appears.
 
-        element = wait.until(EC.presence_of_element_located((by, value)))
-        
-        if not os.path.exists("reports"):
-            os.makedirs("reports")
-        
-        filepath = os.path.join("reports", filename)
-        element.screenshot(filepath)
-        return True, f"Element screenshot saved: {filepath}"
+    Returns (snapshot, bounds); bounds is None if the element was not found in time.
+    When a snapshot is passed it is used as is, without polling. Selectors the
+    page source cannot resolve (e.g. UIAUTOMATOR) are looked up through the driver,
+    and the screen is captured once that lookup has found the element.
+    """
+    deadline = time.monotonic() + timeout
+    fixed_snapshot = snapshot is not None
+    while True:
+        if not fixed_snapshot:
+            snapshot = element_capture.snapshot(driver, capture_backend)
+        try:
+            bounds = snapshot.find_bounds(selector_type, selector_value)
+        except ValueError:
+            by_mapping = get_by_mapping(selector_value)
+            selector_type_upper = selector_type.upper()
+            if selector_type_upper not in by_mapping:
+                raise ValueError(f"Invalid selector_type '{selector_type}'")
+            element = WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by_mapping[selector_type_upper], selector_value)))
+            rect = element.rect
+            if not fixed_snapshot:
+                snapshot = element_capture.snapshot(driver, capture_backend)
+            return snapshot, snapshot.to_frame((rect['x'], rect['y'], rect['width'], rect['height']))
+        if bounds or fixed_snapshot or time.monotonic() >= deadline:
+            return snapshot, bounds
+        cancellation.sleep(0.5)
+
+def get_element_screenshot(driver, selector_type: str, selector_value: str, filename: str = "element_screenshot.png", timeout: int = 10, capture_backend: str = "appium"):
+    """Take a screenshot of a specific element (cropped locally from a shared screen capture)"""
+    try:
+        snapshot, bounds = _snapshot_element_bounds(driver, selector_type, selector_value, timeout, capture_backend)
+        if not bounds:
+            return False, f"Element not found within {timeout}s"
+        filepath = os.path.join(config_loader.get_reports_dir(), filename)
+        screenshot_service.get_service().submit_frame(snapshot.crop(bounds), filepath)
+        return True, f"Element screenshot captured, being written to {filepath}"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
     except Exception as e:
         return False, f"Error taking element screenshot: {e}"
 
+def get_elements_screenshots(driver, selectors, filename_prefix: str = "element", timeout: int = 10, capture_backend: str = "appium"):
+    """Save screenshots of several elements, all cropped from one screen capture.
+
+    selectors is a list of {"selector_type", "selector_value", "filename"
+    (optional)} dicts, or a string like "ID=com.app:id/title; TEXT=OK".
+    """
+    try:
+        if isinstance(selectors, str):
+            selectors = [dict(zip(("selector_type", "selector_value"), (part.strip() for part in item.split("=", 1))))
+                         for item in selectors.split(";") if "=" in item]
+        if not selectors:
+            return False, "No selectors given"
+
+        reports_dir = config_loader.get_reports_dir()
+        service = screenshot_service.get_service()
+        saved, missing = {}, []
+        snapshot = None
+        for index, selector in enumerate(selectors, 1):
+            # Only the first lookup waits for the screen; the rest resolve against the same snapshot
+            snapshot, bounds = _snapshot_element_bounds(driver, selector["selector_type"], selector["selector_value"],
+                                                        timeout, capture_backend, snapshot)
+            label = f"{selector['selector_type']}={selector['selector_value']}"
+            if not bounds:
+                missing.append(label)
+                continue
+            filepath = os.path.join(reports_dir, selector.get("filename") or f"{filename_prefix}_{index}.png")
+            service.submit_frame(snapshot.crop(bounds), filepath)
+            saved[label] = filepath
+
+        result = {"saved": saved, "missing": missing}
+        return not missing, result
+    except Exception as e:
+        return False, f"Error taking element screenshots: {e}"
+
 def scroll_element_into_view(driver, selector_type: str, selector_value: str, timeout: int = 10):
     """Scroll element into view"""
     try:
@@ -2506,49 +2825,29 @@ def scroll_element_into_view(driver, selector_type: str, selector_value: str, ti
 
         element = wait.until(EC.presence_of_element_located((by, value)))
         driver.execute_script("arguments[0].scrollIntoView(true);", element)
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Element scrolled into view"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
     except Exception as e:
         return False, f"Error scrolling element into view: {e}"
 
-def highlight_element(driver, selector_type: str, selector_value: str, color: str = "red", duration_ms: int = 2000, timeout: int = 10):
-    """Highlight an element with a colored border"""
-    try:
-        wait = WebDriverWait(driver, timeout)
-        by_mapping = get_by_mapping(selector_value)
-        selector_type_upper = selector_type.upper()
+def highlight_element(driver, selector_type: str, selector_value: str, color: str = "red", duration_ms: int = 2000, timeout: int = 10, capture_backend: str = "appium"):
+    """Save a screenshot with the element outlined in a colored border.
 
-        if selector_type_upper not in by_mapping and selector_type_upper != "TEXT":
-            return False, f"Invalid selector_type '{selector_type}'"
-
-        if selector_type_upper == "TEXT":
-            by = by_mapping["TEXT"][0]
-            value = by_mapping["TEXT"][1]
-        else:
-            by = by_mapping[selector_type_upper]
-            value = selector_value
-
-        element = wait.until(EC.presence_of_element_located((by, value)))
-        
-        # Store original style
-        original_style = element.get_attribute("style")
-        
-        # Apply highlight
-        driver.execute_script(
-            f"arguments[0].style.border = '3px solid {color}'; "
-            f"arguments[0].style.backgroundColor = 'yellow';", 
-            element
-        )
-        
-        # Wait for highlight duration
-        time.sleep(duration_ms / 1000.0)
-        
-        # Restore original style
-        driver.execute_script(f"arguments[0].style = '{original_style}';", element)
-        
-        return True, f"Element highlighted with {color} border for {duration_ms}ms"
+    The border is drawn locally on the shared screen capture, so the device
+    is not touched and nothing waits; duration_ms is accepted for
+    compatibility and ignored.
+    """
+    try:
+        snapshot, bounds = _snapshot_element_bounds(driver, selector_type, selector_value, timeout, capture_backend)
+        if not bounds:
+            return False, f"Element not found within {timeout}s"
+        import datetime
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = os.path.join(config_loader.get_reports_dir(), f"highlight_{timestamp}.png")
+        screenshot_service.get_service().submit_frame(snapshot.highlight(bounds, color), filepath)
+        return True, f"Element highlighted with {color} border, being written to {filepath}"
     except TimeoutException:
         return False, f"Element not found within {timeout}s"
     except Exception as e:
@@ -2590,7 +2889,7 @@ def tap_at_coordinates(driver, x: int, y: int):
         driver.execute_script('mobile: shell', {
             'command': f'input tap {x} {y}'
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Tapped at coordinates: x={x}, y={y}"
     except Exception as e:
         return False, f"Error tapping at coordinates: {e}"
@@ -2601,7 +2900,7 @@ def swipe_between_coordinates(driver, start_x: int, start_y: int, end_x: int, en
         driver.execute_script('mobile: shell', {
             'command': f'input swipe {start_x} {start_y} {end_x} {end_y} {duration_ms}'
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         return True, f"Swiped from ({start_x},{start_y}) to ({end_x},{end_y})"
     except Exception as e:
         return False, f"Error swiping between coordinates: {e}"
@@ -2613,13 +2912,13 @@ def type_text_at_coordinates(driver, x: int, y: int, text: str):
         driver.execute_script('mobile: shell', {
             'command': f'input tap {x} {y}'
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         
         # Then type the text
         driver.execute_script('mobile: shell', {
             'command': f'input text "{text}"'
         })
-        time.sleep(0.5)
+        cancellation.sleep(0.5)
         
         return True, f"Typed '{text}' at coordinates: x={x}, y={y}"
     except Exception as e:
@@ -2681,7 +2980,7 @@ def navigate_back(driver):
     """Navigate back in the app"""
     try:
         driver.back()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Navigated back"
     except Exception as e:
         return False, f"Error navigating back: {e}"
@@ -2690,7 +2989,7 @@ def navigate_forward(driver):
     """Navigate forward in the app"""
     try:
         driver.forward()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Navigated forward"
     except Exception as e:
         return False, f"Error navigating forward: {e}"
@@ -2699,7 +2998,7 @@ def refresh_page(driver):
     """Refresh the current page (for web views)"""
     try:
         driver.refresh()
-        time.sleep(2)
+        cancellation.sleep(2)
         return True, "Page refreshed"
     except Exception as e:
         return False, f"Error refreshing page: {e}"
@@ -2716,7 +3015,7 @@ def switch_to_window(driver, window_handle: str):
     """Switch to a specific window (for web views)"""
     try:
         driver.switch_to.window(window_handle)
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"Switched to window: {window_handle}"
     except Exception as e:
         return False, f"Error switching to window: {e}"
@@ -2725,7 +3024,7 @@ def close_current_window(driver):
     """Close the current window (for web views)"""
     try:
         driver.close()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Current window closed"
     except Exception as e:
         return False, f"Error closing current window: {e}"
@@ -2734,7 +3033,7 @@ def maximize_window(driver):
     """Maximize the current window (for web views)"""
     try:
         driver.maximize_window()
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, "Window maximized"
     except Exception as e:
         return False, f"Error maximizing window: {e}"
@@ -2751,7 +3050,139 @@ def set_window_size(driver, width: int, height: int):
     """Set the window size (for web views)"""
     try:
         driver.set_window_size(width, height)
-        time.sleep(1)
+        cancellation.sleep(1)
         return True, f"Window size set to {width}x{height}"
     except Exception as e:
-        return False, f"Error setting window size: {e}"
\ No newline at end of file
+        return False, f"Error setting window size: {e}"
+
+# App Launch Benchmark Actions
+
+def benchmark_app_launch(driver, package_name: str, activity_name: str = None, cold_runs: int = 5,
+                         warm_runs: int = 5, hot_runs: int = 5, drop_caches: bool = True,
+                         settle_seconds: float = 2.0):
+    """Measure cold, warm and hot start times and persist the raw samples.
+
+    Each start is timed with `am start -W` (TotalTime), falling back to the
+    activity manager 'Displayed' time from logcat. Cold starts force-stop the
+    app (and drop page caches when possible). Warm starts leave the app with
+    BACK and relaunch it with --activity-clear-task: since Android 12 BACK only
+    moves the root task to the background, so the activity has to be finished
+    by the launch. Hot starts leave the app with HOME. Samples whose reported
+    LaunchState is not the mode's are flagged and left out of the statistics.
+    Samples are appended to reports/benchmarks/launch_<package>.jsonl for
+    trend comparison.
+    """
+    try:
+        component = (app_launch.build_component(package_name, activity_name)
+                     or app_launch.resolve_launch_activity(driver, package_name))
+        if not component:
+            return False, f"Could not resolve a launch activity for {package_name}"
+
+        samples = {'cold': [], 'warm': [], 'hot': []}
+        caches_dropped = None
+        thermal_status = [dumpsys_parser.query_dumpsys(driver, 'thermal')['thermal_status']]
+        leave_keys = {'warm': 'KEYCODE_BACK', 'hot': 'KEYCODE_HOME'}
+        start_args = {'cold': '', 'warm': '--activity-clear-task', 'hot': ''}
+
+        for mode, run_count in (('cold', cold_runs), ('warm', warm_runs), ('hot', hot_runs)):
+            if mode != 'cold' and int(run_count) > 0:
+                # Warm and hot starts need a live process, so start it once unmeasured
+                app_launch.am_start(driver, component)
+                cancellation.sleep(settle_seconds)
+
+            for _ in range(int(run_count)):
+                if mode == 'cold':
+                    app_launch.shell(driver, f'am force-stop {package_name}')
+                    if drop_caches:
+                        caches_dropped = app_launch.drop_page_caches(driver)
+                else:
+                    app_launch.shell(driver, f'input keyevent {leave_keys[mode]}')
+                cancellation.sleep(settle_seconds)
+
+                since = app_launch.device_epoch(driver)
+                result = app_launch.am_start(driver, component, start_args[mode])
+                launch_ms, source = result['total_time_ms'], 'am_start'
+                if launch_ms is None:
+                    launch_ms, source = app_launch.read_displayed_time(driver, package_name, since), 'logcat'
+
+                launch_state = result['launch_state']
+                samples[mode].append({
+                    'time_ms': launch_ms,
+                    'wait_time_ms': result['wait_time_ms'],
+                    'launch_state': launch_state,
+                    # LaunchState is only reported by Android 10+; without it the sample is trusted
+                    'state_mismatch': launch_state is not None and launch_state.upper() != mode.upper(),
+                    'source': source,
+                    'error': result['error'],
+                })
+
+        stats = {mode: perf_stats.summarize([s['time_ms'] for s in runs if not s['state_mismatch']])
+                 for mode, runs in samples.items()}
+        for mode, runs in samples.items():
+            stats[mode]['state_mismatches'] = sum(s['state_mismatch'] for s in runs)
+        thermal_status.append(dumpsys_parser.query_dumpsys(driver, 'thermal')['thermal_status'])
+        known_status = [status for status in thermal_status if status is not None]
+        # Launch times measured under thermal throttling are not comparable with the trend
+        throttled = bool(known_status) and max(known_status) >= DEFAULT_THROTTLE_STATUS
+        capabilities = getattr(driver, 'capabilities', None) or {}
+        samples_file = os.path.join(config_loader.get_reports_dir('benchmarks'), f"launch_{package_name}.jsonl")
+        perf_stats.append_record(samples_file, {
+            'package': package_name,
+            'component': component,
+            'device': capabilities.get('deviceUDID') or capabilities.get('deviceName'),
+            'caches_dropped': caches_dropped,
+            'thermal_status': thermal_status,
+            'throttled': throttled,
+            'samples': samples,
+            'stats': stats,
+        })
+
+        if not any(stats[mode]['count'] for mode in stats):
+            return False, f"No launch times could be measured for {component}"
+        return True, {'component': component, **stats, 'throttled': throttled, 'samples_file': samples_file}
+    except Exception as e:
+        return False, f"Error benchmarking app launch: {e}"
+
+# Visual Verification Actions
+
+def verify_screen_matches_baseline(driver, baseline_name: str, max_diff_percent: float = 0.0, channel_tolerance=8,
+                                   ignore_regions: list = None, update_baseline: bool = False,
+                                   capture_backend: str = "appium", save_heatmap: bool = True):
+    """Compare the current screen against a stored baseline image.
+
+    Baselines live in data/baselines/<width>x<height>_<density>dpi/ for the
+    device's current display settings. If no baseline exists yet (or
+    update_baseline is set) the capture is saved as the new baseline. A pixel
+    counts as different when any channel differs by more than
+    channel_tolerance (a number or [r, g, b]). ignore_regions is a list of
+    [x, y, width, height] rectangles to skip. On failure a heatmap of the
+    differences is written to reports/visual_diffs/.
+    """
+    try:
+        frame = screencap.capture_frame(driver, capture_backend)
+        path = visual_diff.baseline_path(baseline_name, visual_diff.display_profile(driver))
+
+        if update_baseline or not os.path.exists(path):
+            visual_diff.save_baseline(frame, path)
+            return True, f"Baseline saved: {path}"
+
+        baseline = visual_diff.load_baseline(path)
+        mask = visual_diff.build_mask(baseline.shape, ignore_regions) if ignore_regions else None
+        stats, delta = visual_diff.compare(frame.pixels, baseline, channel_tolerance, mask)
+        stats['baseline'] = path
+        if stats['diff_percent'] <= float(max_diff_percent):
+            return True, stats
+
+        if save_heatmap:
+            import datetime
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            diff_dir = config_loader.get_reports_dir('visual_diffs')
+            name = os.path.splitext(os.path.basename(path))[0]
+            stats['heatmap'] = os.path.join(diff_dir, f"{name}_{timestamp}_diff.png")
+            stats['actual'] = os.path.join(diff_dir, f"{name}_{timestamp}_actual.png")
+            service = screenshot_service.get_service()
+            service.submit_frame(visual_diff.heatmap(baseline, delta, mask), stats['heatmap'])
+            service.submit_frame(frame, stats['actual'])
+        return False, stats
+    except Exception as e:
+        return False, f"Error comparing screen with baseline: {e}"
\ No newline at end of file
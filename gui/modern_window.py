@@ -6,16 +6,20 @@ import os
 import threading
 import sys
 import time
-import subprocess
-import shlex
 from typing import Dict, List, Any
 
 project_root = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from utils import package_cache
+
 ACTION_LIB_PATH = os.path.join(project_root, "data", "action_library.json")
 TEST_CASE_DIR = os.path.join(project_root, "data", "test_cases")
+# How often the GUI applies queued runner events while a test runs
+RUN_EVENT_POLL_MS = 100
+# Test-level time budgets kept from a loaded test case (see runner/watchdog.py)
+RUN_BUDGET_KEYS = ("test_timeout_s", "step_timeout_s")
 
 # Pastel color palette
 COLORS = {
@@ -33,36 +37,6 @@ COLORS = {
     'shadow': '#E8E8E8'
 }
 
-def get_installed_packages():
-    """Get list of installed packages from Android device"""
-    packages = []
-    adb_command = "adb shell pm list packages"
-    
-    try:
-        result = subprocess.run(
-            shlex.split(adb_command),
-            capture_output=True,
-            text=True,
-            check=False,
-            timeout=15
-        )
-
-        if result.returncode == 0 and result.stdout:
-            output_lines = result.stdout.strip().splitlines()
-            for line in output_lines:
-                if line.startswith("package:"):
-                    packages.append(line.split(":", 1)[1])
-            packages.sort()
-
-    except FileNotFoundError:
-        print("'adb' command not found. Is Android SDK platform-tools in your PATH?")
-    except subprocess.TimeoutExpired:
-        print("ADB command timed out. Is the device responsive?")
-    except Exception as e:
-        print(f"Error getting packages: {e}")
-
-    return packages
-
 class ModernButton(tk.Button):
     """Custom button with modern styling"""
     def __init__(self, parent, **kwargs):
@@ -151,7 +125,11 @@ class App(tk.Tk):
         # Initialize data
         self.available_actions = self.load_action_library()
         self.current_test_sequence = []
+        self.run_budgets = {}
+        self.run_token = None
         self.param_widgets = {}
+        # Start listing installed packages now so the first package dropdown opens filled
+        package_cache.get_cache().get()
         
         # Setup modern styling
         self.setup_styles()
@@ -385,6 +363,9 @@ class App(tk.Tk):
         run_btn = ModernButton(left_buttons, text="▶️ Run Test", command=self.run_test)
         run_btn.pack(side="left", padx=(0, 10))
 
+        stop_btn = ModernButton(left_buttons, text="⏹ Stop", command=self.stop_test)
+        stop_btn.pack(side="left", padx=(0, 10))
+
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
         status_label = ttk.Label(
@@ -498,26 +479,19 @@ class App(tk.Tk):
 
             if is_package_param:
                 var = tk.StringVar(value=current_value)
-                package_list = get_installed_packages()
-
-                try:
-                    widget = ttk.Combobox(
-                        frame, 
-                        textvariable=var, 
-                        values=package_list, 
-                        state="normal" if package_list else "disabled", 
-                        width=35
-                    )
-                    self.param_widgets[param_name] = {'widget': widget, 'var': var, 'type': 'package_choice'}
-                except Exception as e:
-                    print(f"ERROR: Failed to create/update Combobox: {e}")
-                    var = tk.StringVar(value="Error loading packages!")
-                    widget = ttk.Entry(frame, textvariable=var, state="readonly", width=35)
-                    self.param_widgets[param_name] = {'widget': widget, 'var': var, 'type': 'string'}
-
-                if not package_list:
-                    warning_lbl = ttk.Label(frame, text=" (No packages found)", foreground="orange")
-                    warning_lbl.pack(side=tk.LEFT, padx=2)
+                package_list = package_cache.get_cache().get(
+                    callback=lambda packages, added, removed, f=frame: self.after(0, self.fill_package_choices, f, packages))
+                widget = ttk.Combobox(frame, textvariable=var, values=package_list, state="normal", width=35)
+                self.param_widgets[param_name] = {'widget': widget, 'var': var, 'type': 'package_choice'}
+                frame.package_combobox = widget
+                if package_list:
+                    status_text = ""
+                elif package_cache.get_cache().loading():
+                    status_text = " (Loading packages...)"
+                else:
+                    status_text = " (No packages / no device)"
+                frame.package_status = ttk.Label(frame, text=status_text, foreground="orange")
+                frame.package_status.pack(side=tk.LEFT, padx=2)
 
             elif param_type == "string":
                 var = tk.StringVar(value=current_value)
@@ -594,6 +568,13 @@ class App(tk.Tk):
         self.param_inner_frame.update_idletasks()
         self.param_canvas.config(scrollregion=self.param_canvas.bbox("all"))
 
+    def fill_package_choices(self, frame, packages):
+        """Fill a package dropdown once the background listing arrives (Tk thread)"""
+        if not frame.winfo_exists():
+            return
+        frame.package_combobox.configure(values=packages)
+        frame.package_status.configure(text="" if packages else " (No packages / no device)")
+
     def update_step_param(self, step_index, param_name, tk_var):
         """Callback to update the internal sequence data when a param widget changes"""
         if step_index < len(self.current_test_sequence):
@@ -705,7 +686,8 @@ class App(tk.Tk):
         test_data_to_save = {
             "name": test_name,
             "description": test_description,
-            "steps": self.current_test_sequence
+            "steps": self.current_test_sequence,
+            **self.run_budgets
         }
 
         try:
@@ -738,6 +720,7 @@ class App(tk.Tk):
                     step["_display_name"] = action_def['display_name'] if action_def else step['action']
 
             self.current_test_sequence = loaded_data["steps"]
+            self.run_budgets = {key: loaded_data[key] for key in RUN_BUDGET_KEYS if key in loaded_data}
             self.update_sequence_listbox()
             self.clear_param_editor()
             
@@ -763,19 +746,52 @@ class App(tk.Tk):
         test_data = {
             "name": "GUI Generated Test",
             "description": "Test case run from GUI builder",
-            "steps": self.current_test_sequence
+            "steps": self.current_test_sequence,
+            **self.run_budgets
         }
 
         self.status_var.set(f"Running test '{test_data['name']}'...")
 
         from runner.test_runner import run_test_case
+        from runner.events import EventBus
+        from utils.cancellation import CancellationToken
 
+        for index in range(self.sequence_listbox.size()):
+            self.sequence_listbox.itemconfig(index, background=COLORS['white'])
+        run_events = EventBus()
+        self.run_token = CancellationToken()
         test_thread = threading.Thread(
             target=self.execute_test_and_update_gui,
-            args=(test_data, run_test_case),
+            args=(test_data, run_test_case, run_events, self.run_token),
             daemon=True
         )
         test_thread.start()
+        self.after(RUN_EVENT_POLL_MS, self.drain_run_events, run_events)
+
+    def stop_test(self):
+        """Ask the running test to stop; the current step is aborted and the session closed"""
+        if self.run_token is None or self.run_token.cancelled:
+            return
+        self.run_token.cancel("Stopped by user")
+        self.status_var.set("Stopping test...")
+
+    def drain_run_events(self, run_events):
+        """Apply queued runner events to the sequence list and status bar (Tk thread)"""
+        for event in run_events.drain():
+            index = event.get('index')
+            if event['type'] == 'step_started' and index is not None and index < self.sequence_listbox.size():
+                self.sequence_listbox.itemconfig(index, background=COLORS['warning'])
+                self.sequence_listbox.see(index)
+                self.status_var.set(f"Step {event['step']}/{len(self.current_test_sequence)}: {event['action']}...")
+            elif event['type'] == 'step_finished' and index is not None and index < self.sequence_listbox.size():
+                color = COLORS['success'] if event['status'] == "Success" else COLORS['error']
+                self.sequence_listbox.itemconfig(index, background=color)
+                artifacts = f" - {len(event['artifacts'])} artifact(s)" if event['artifacts'] else ""
+                self.status_var.set(f"Step {event['step']}: {event['status']} ({event['duration_s']:.2f}s){artifacts}")
+            elif event['type'] == 'run_finished':
+                self.status_var.set(f"Finished: {event['test']} - {event['status']} ({event['duration_s']:.2f}s)")
+                return
+        self.after(RUN_EVENT_POLL_MS, self.drain_run_events, run_events)
 
     def browse_file(self, var):
         """Open file dialog to select a file path"""
@@ -807,7 +823,7 @@ class App(tk.Tk):
                     except Exception as e:
                         print(f"Warning: Unexpected error updating param {param_name}: {e}")
 
-    def execute_test_and_update_gui(self, test_data_to_run, runner_func):
+    def execute_test_and_update_gui(self, test_data_to_run, runner_func, run_events=None, cancel_token=None):
         """Execute test in background thread and update GUI"""
         test_name = test_data_to_run.get("name", "Unnamed")
         start_time = time.time()
@@ -815,13 +831,10 @@ class App(tk.Tk):
         results_log = []
         
         try:
-            success, results_log = runner_func(test_data_to_run)
+            success, results_log = runner_func(test_data_to_run, events=run_events, cancel_token=cancel_token)
             result_status = "Success" if success else "Failed"
             duration = time.time() - start_time
             final_status_text = f"Finished: {test_name} - {result_status} ({duration:.2f}s)"
-            
-            for entry in results_log:
-                print(f"  Step {entry.get('step', '?')}: [{entry.get('action', 'N/A')}] - {entry.get('status', 'Unknown')} - {entry.get('message', '')}")
 
         except Exception as e:
             duration = time.time() - start_time
@@ -831,6 +844,8 @@ class App(tk.Tk):
             
         finally:
             self.after(0, self.status_var.set, final_status_text)
+            # The test may have installed or removed apps; re-list in the background
+            package_cache.get_cache().get(force=True)
 
     def show_help_dialog(self):
         """Show comprehensive help dialog"""
@@ -0,0 +1,52 @@
+# runner/events.py
+import queue
+import time
+
+# Event types published by run_test_case
+RUN_STARTED = 'run_started'
+STEP_STARTED = 'step_started'
+STEP_FINISHED = 'step_finished'
+RUN_ENTRY = 'run_entry'
+RUN_FINISHED = 'run_finished'
+
+# Result keys whose values are files or folders produced by an action
+_ARTIFACT_KEYS = ('filepath', 'local_path', 'archive', 'output_dir', 'directory',
+                  'heatmap', 'samples_file', 'segments')
+
+
+class EventBus:
+    """Thread-safe queue of structured run events.
+
+    The runner publishes from its thread and never blocks. A consumer
+    such as the GUI drains events in batches from its own thread. Each
+    event is a dict with 'type' and 'time' plus event-specific fields.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def publish(self, event_type: str, **fields):
+        self._queue.put(dict(fields, type=event_type, time=time.time()))
+
+    def drain(self, max_events: int = 200):
+        """Up to max_events queued events, without waiting"""
+        events = []
+        while len(events) < max_events:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+def artifacts_from_result(result):
+    """Paths of files an action reported in its result dict (some may still be being written)"""
+    if not isinstance(result, dict):
+        return []
+    paths = []
+    for key in _ARTIFACT_KEYS:
+        value = result.get(key)
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and item:
+                paths.append(item)
+    return paths
@@ -0,0 +1,148 @@
+# runner/run_log.py
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from utils import artifact_store, config_loader
+
+# Logger the runner writes its structured events to
+log = logging.getLogger('runner')
+# Loggers routed into a run's log: the runner's, and the module loggers of actions and helpers
+RUN_LOGGERS = ('runner', 'actions', 'utils')
+
+# Field values whose JSON is longer than this are stored as artifacts and referenced from the record
+DEFAULT_MAX_PAYLOAD_CHARS = 2000
+# Characters of a stored payload kept inline as a preview
+PREVIEW_CHARS = 200
+# Console lines are cut to this length; the JSONL stream keeps the rest
+CONSOLE_LINE_CHARS = 300
+
+
+def event(level: int, event_type: str, message: str, **fields):
+    """Log a runner event.
+
+    message is the short human-readable text; fields are the structured
+    data (params, results, reports), serialized only by the JSONL sink on
+    the logging thread.
+    """
+    if log.isEnabledFor(level):
+        log.log(level, message, extra={'event': event_type, 'fields': fields})
+
+
+def _to_json(value):
+    return json.dumps(value, default=str)
+
+
+class JsonlFormatter(logging.Formatter):
+    """One JSON object per record; oversized field values become artifact references"""
+
+    def __init__(self, payload_dir: str, max_payload_chars: int = DEFAULT_MAX_PAYLOAD_CHARS):
+        super().__init__()
+        self.payload_dir = payload_dir
+        self.max_payload_chars = max_payload_chars
+        self._stored = 0
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'event': getattr(record, 'event', 'log'),
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', {})
+        for key, value in fields.items():
+            entry[key] = self._payload(key, value, fields.get('step'))
+        return _to_json(entry)
+
+    def _payload(self, key: str, value, step):
+        text = value if isinstance(value, str) else _to_json(value)
+        if len(text) <= self.max_payload_chars:
+            return value
+        self._stored += 1
+        ext = '.txt' if isinstance(value, str) else '.json'
+        step_label = str(step).replace('/', '_') if step is not None else 'run'
+        path = os.path.join(self.payload_dir, f"{self._stored:05d}_step{step_label}_{key}{ext}")
+        data = text.encode('utf-8')
+        artifact_store.get_store().put_bytes(data, path, ext=ext, step=step)
+        return {'artifact': path, 'bytes': len(data), 'preview': text[:PREVIEW_CHARS]}
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The message, followed by a shortened 'result' field when the record has one"""
+
+    def format(self, record):
+        line = record.getMessage()
+        result = getattr(record, 'fields', {}).get('result')
+        if result is not None and result != '':
+            line = f"{line} - {result}"
+        if len(line) > CONSOLE_LINE_CHARS:
+            line = f"{line[:CONSOLE_LINE_CHARS]}... (see events.jsonl)"
+        return line
+
+
+class RunLog:
+    """Structured event log of one test run.
+
+    Records from the runner and from the `actions.*` and `utils.*` module
+    loggers are handed to a queue, so logging never blocks the run on disk
+    or console I/O. A listener thread writes them to
+    reports/logs/<test>_<timestamp>/events.jsonl and, optionally, renders
+    them to the console.
+
+    Options (the test case's "log" object):
+    - console (bool, default True): also print to stdout
+    - console_level (default "INFO") and level (JSONL, default "DEBUG")
+    - max_payload_chars (default 2000): larger field values are stored
+      under payloads/ and replaced by a reference with a preview
+    """
+
+    def __init__(self, test_name: str, options=None):
+        options = options if isinstance(options, dict) else {}
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in test_name)
+        self.directory = config_loader.get_reports_dir('logs', f"{safe_name}_{timestamp}")
+        self.path = os.path.join(self.directory, 'events.jsonl')
+
+        file_handler = logging.FileHandler(self.path, encoding='utf-8')
+        file_handler.setLevel(options.get('level', 'DEBUG'))
+        file_handler.setFormatter(JsonlFormatter(os.path.join(self.directory, 'payloads'),
+                                                 int(options.get('max_payload_chars', DEFAULT_MAX_PAYLOAD_CHARS))))
+        self._handlers = [file_handler]
+        if options.get('console', True):
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(options.get('console_level', 'INFO'))
+            console_handler.setFormatter(ConsoleFormatter())
+            self._handlers.append(console_handler)
+
+        self._saved = {}
+        self._queue = queue.SimpleQueue()
+        self._queue_handler = logging.handlers.QueueHandler(self._queue)
+        self._listener = logging.handlers.QueueListener(self._queue, *self._handlers, respect_handler_level=True)
+
+    def start(self):
+        level = min(handler.level for handler in self._handlers)
+        for name in RUN_LOGGERS:
+            logger = logging.getLogger(name)
+            # The loggers are process-wide (the GUI keeps using them); close() puts them back
+            self._saved[name] = (logger.level, logger.propagate)
+            logger.setLevel(level)
+            logger.propagate = False
+            logger.addHandler(self._queue_handler)
+        self._listener.start()
+        return self
+
+    def close(self):
+        """Detach from the run loggers, restore their level and propagation and write out everything still queued"""
+        for name in RUN_LOGGERS:
+            logger = logging.getLogger(name)
+            logger.removeHandler(self._queue_handler)
+            if name in self._saved:
+                level, logger.propagate = self._saved[name]
+                logger.setLevel(level)
+        self._saved = {}
+        self._listener.stop()
+        for handler in self._handlers:
+            handler.close()
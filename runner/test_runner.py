@@ -3,6 +3,7 @@ import json
 import sys
 import os
 import importlib
+import logging
 import time
 import traceback
 
@@ -11,123 +12,563 @@ if project_root not in sys.path:
      sys.path.insert(0, project_root)
 
 from utils.appium_driver import initialize_driver, quit_driver, get_driver
+from utils import screenshot_service, artifact_store, screen_recorder, config_loader
+from runner.events import EventBus, artifacts_from_result, RUN_STARTED, STEP_STARTED, STEP_FINISHED, RUN_ENTRY, RUN_FINISHED
+from runner.watchdog import Watchdog
+from runner.run_log import RunLog, log, event
+from utils import cancellation, chrome_trace, step_timing
+from utils.cancellation import CancellationToken, Cancelled
 
 ACTION_MAPPING = {}
 try:
     common_actions_module = importlib.import_module("actions.common_actions")
     import inspect
     for name, func in inspect.getmembers(common_actions_module, inspect.isfunction):
-         ACTION_MAPPING[name] = func
-    print(f"Loaded Actions: {list(ACTION_MAPPING.keys())}")
+         if not name.startswith("_"):
+             ACTION_MAPPING[name] = func
+    log.debug("Loaded %d actions: %s", len(ACTION_MAPPING), list(ACTION_MAPPING.keys()))
 except ImportError as e:
-    print(f"FATAL ERROR: Could not load actions.common_actions: {e}")
+    log.critical("Could not load actions.common_actions: %s", e)
     ACTION_MAPPING = {}
 
-def run_test_case(test_data: dict):
-    """Runs a test case defined by the provided data structure."""
+def _step_number(value):
+    """A step number given as an int or a numeric string, or None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _frame_capture_entry(capture: dict):
+    from_step, to_step = capture.get("from_step"), capture.get("to_step")
+    return {"step": f"{from_step}-{to_step}", "steps": [from_step, to_step], "action": "frame_capture"}
+
+def _frame_capture_failed(capture: dict, message: str):
+    entry = _frame_capture_entry(capture)
+    entry.update({"status": "Failed", "message": message})
+    event(logging.WARNING, "frame_capture", f"Frame capture (steps {entry['step']}): Failed",
+          step=entry["step"], status=entry["status"], result=message)
+    return entry
+
+def start_frame_capture(driver, capture: dict):
+    """Reset gfxinfo frame stats for a package at the start of a captured step range.
+
+    Returns a failed results entry if the reset did not work, else None.
+    """
+    from utils import framestats
+    package_name = capture.get("package_name")
+    log.info("Frame capture: resetting frame stats for %s", package_name)
+    try:
+        framestats.reset(driver, package_name)
+    except Exception as e:
+        return _frame_capture_failed(capture, f"Error resetting frame stats: {e}")
+    return None
+
+def start_frame_captures(driver, pending: list, active: list, first_step: int, last_step: int):
+    """Start the pending captures whose from_step lies in first_step..last_step.
+
+    A leak hunt runs its steps as one block, so a capture starting inside
+    the hunt's range is started before the hunt. Started captures move to
+    active; the results entries of failed starts are returned.
+    """
+    entries = []
+    for capture in [c for c in pending if first_step <= c["from_step"] <= last_step]:
+        pending.remove(capture)
+        if capture["from_step"] != first_step:
+            log.info("Frame capture %s-%s starts inside leak hunt steps %s-%s; starting it with the hunt",
+                     capture["from_step"], capture["to_step"], first_step, last_step)
+        failed_entry = start_frame_capture(driver, capture)
+        if failed_entry:
+            entries.append(failed_entry)
+        else:
+            active.append(capture)
+    return entries
+
+def collect_frame_captures(driver, active: list, last_step: int):
+    """Collect the active captures whose to_step is at or before last_step and return their entries"""
+    entries = []
+    for capture in [c for c in active if c["to_step"] <= last_step]:
+        active.remove(capture)
+        entries.append(collect_frame_capture(driver, capture))
+    return entries
+
+def collect_frame_capture(driver, capture: dict):
+    """Collect and analyze frame stats at the end of a captured step range"""
+    from utils import framestats
+    entry = _frame_capture_entry(capture)
+    try:
+        stats = framestats.collect(driver, capture.get("package_name"))
+        max_janky_percent = capture.get("max_janky_percent")
+        # janky_percent covers the whole range (gfxinfo's counters), not just the table's last 120 frames
+        passed = max_janky_percent is None or stats['janky_percent'] <= float(max_janky_percent)
+        if stats.get('truncated'):
+            log.info("Frame capture %s: framestats table holds %s of %s frames; percentiles cover only the last ones",
+                     entry["step"], stats['frames'], stats.get('reported_total_frames'))
+        entry.update({"status": "Success" if passed else "Failed", "message": stats})
+    except Exception as e:
+        entry.update({"status": "Failed", "message": f"Error collecting frame stats: {e}"})
+    event(logging.INFO, "frame_capture", f"Frame capture (steps {entry['step']}): {entry['status']}",
+          step=entry["step"], status=entry["status"], result=entry["message"])
+    return entry
+
+def execute_step(driver, step: dict, step_number: int, total_steps: int, verbose: bool = True):
+    """Executes a single step and returns (log_entry, abort_run).
+
+    abort_run is True when the step raised an unexpected error and the rest of
+    the test should not be executed.
+    """
+    action_name = step.get("action")
+    params = step.get("params", {})
+    notes = step.get("notes", "")
+    step_status = "Failed"
+    result_message = "Action not found or not executed."
+    abort_run = False
+
+    if verbose:
+        event(logging.INFO, "step_started", f"Step {step_number}/{total_steps}: {action_name}", step=step_number)
+        event(logging.DEBUG, "step_params", "Params", step=step_number, params=params, notes=notes)
+
+    if not action_name:
+        log.error("Step %s is missing 'action' name. Skipping.", step_number)
+        result_message = "Step missing 'action' name."
+        return {"step": step_number, "action": action_name, "status": step_status, "message": result_message}, False
+
+    action_function = ACTION_MAPPING.get(action_name)
+    artifact_store.set_current_step(step_number)
+
+    if not action_function:
+        result_message = f"Action '{action_name}' not found in available actions."
+        log.error("Step %s: %s", step_number, result_message)
+    else:
+        try:
+            with chrome_trace.span(action_name, "action"):
+                success, result_message_from_action = action_function(driver, **params)
+            result_message = result_message_from_action
+
+            step_status = "Success" if success else "Failed"
+            if verbose or not success:
+                event(logging.INFO if success else logging.WARNING, "step_result",
+                      f"Step {step_number} {step_status}", step=step_number, action=action_name,
+                      status=step_status, result=result_message)
+
+        except Cancelled as cancelled:
+             result_message = f"Cancelled: {cancelled}"
+             log.warning("Step %s cancelled: %s", step_number, cancelled)
+             abort_run = True
+        except TypeError as te:
+             err_msg = f"Parameter mismatch calling action '{action_name}' with params {params}. Error: {te}"
+             event(logging.ERROR, "step_error", f"Step {step_number}: {err_msg}", step=step_number)
+             result_message = err_msg
+             abort_run = True
+        except Exception as step_err:
+             err_msg = f"Unexpected error during action '{action_name}': {step_err}"
+             event(logging.ERROR, "step_error", f"Step {step_number}: {err_msg}", step=step_number,
+                   traceback=traceback.format_exc())
+             result_message = err_msg
+             abort_run = True
+
+    return {"step": step_number, "action": action_name, "status": step_status, "message": result_message}, abort_run
+
+def run_leak_hunt(driver, steps: list, hunt: dict):
+    """Repeats a block of steps and tracks the app's memory after a forced GC each iteration.
+
+    Only failing steps are reported individually (up to max_reported_failures),
+    so memory stays bounded however many iterations are run.
+    """
+    from utils import leak_detector
+    package_name = hunt.get("package_name")
+    from_step = int(hunt.get("from_step"))
+    to_step = int(hunt.get("to_step", from_step))
+    iterations = int(hunt.get("iterations", 20))
+    stop_on_failure = hunt.get("stop_on_failure", True)
+    max_reported_failures = int(hunt.get("max_reported_failures", 10))
+    block = steps[from_step - 1:to_step]
+
+    entry = {"step": f"{from_step}-{to_step}", "steps": [from_step, to_step], "action": "leak_hunt"}
+    tracker = leak_detector.LeakTracker(
+        threshold_kb_per_iteration=float(hunt.get("threshold_kb_per_iteration", 50)),
+        warmup_iterations=int(hunt.get("warmup_iterations", 2)),
+    )
+    failures = []
+    failed_iterations = 0
+    completed = 0
+
+    log.info("Leak hunt: steps %s-%s x %s iterations (%s)", from_step, to_step, iterations, package_name)
+    try:
+        for iteration in range(iterations):
+            cancellation.check()
+            iteration_started = time.monotonic()
+            iteration_failed = False
+            abort_run = False
+            for offset, step in enumerate(block):
+                step_entry, abort_run = execute_step(driver, step, from_step + offset, len(steps), verbose=False)
+                if step_entry["status"] != "Success":
+                    iteration_failed = True
+                    if len(failures) < max_reported_failures:
+                        failures.append({"iteration": iteration, **step_entry})
+                if abort_run:
+                    break
+            failed_iterations += iteration_failed
+            completed += 1
+
+            gc_forced = leak_detector.force_gc(driver, package_name, float(hunt.get("gc_settle_seconds", 1.0)))
+            sample = dict(leak_detector.sample_memory(driver, package_name), gc_forced=gc_forced)
+            tracker.add(iteration, sample)
+            chrome_trace.complete(f"Iteration {iteration + 1}", "iteration", iteration_started, time.monotonic(),
+                                  total_pss_kb=sample.get('total_pss_kb'))
+
+            if (iteration + 1) % max(1, iterations // 10) == 0:
+                event(logging.INFO, "leak_hunt_progress",
+                      f"Leak hunt: iteration {iteration + 1}/{iterations}, PSS {sample.get('total_pss_kb')} KB",
+                      step=entry["step"], iteration=iteration + 1, sample=sample)
+            if abort_run or (iteration_failed and stop_on_failure):
+                break
+    except Exception as e:
+        failures.append({"iteration": completed, "status": "Failed", "message": f"Leak hunt error: {e}"})
+
+    report = tracker.report()
+    report.update({"iterations": completed, "failed_iterations": failed_iterations, "failures": failures})
+    passed = not report["leak_suspected"] and not failures
+    entry.update({"status": "Success" if passed else "Failed", "message": report})
+    event(logging.INFO, "leak_hunt", f"Leak hunt (steps {entry['step']}): {entry['status']} - "
+          f"leak suspected: {report['leak_suspected']}", step=entry["step"], status=entry["status"], report=report)
+    return entry
+
+def start_power_profile(driver, profile):
+    """Start background battery/thermal sampling for the whole run"""
+    from utils import adb_client
+    from utils.power_profiler import PowerProfiler
+    options = profile if isinstance(profile, dict) else {}
+    profiler = PowerProfiler(
+        serial=options.get("serial") or adb_client.resolve_serial(driver),
+        interval_seconds=float(options.get("interval_seconds", 5)),
+        throttle_status=int(options.get("throttle_status", 2)),
+        reset_batterystats=options.get("reset_batterystats", True),
+    )
+    log.info("Power profile: sampling every %ss on %s", profiler.interval, profiler.serial or 'default device')
+    return profiler.start()
+
+def finish_power_profile(profiler, results_log: list):
+    """Stop sampling, attribute energy to logged steps and return the run summary entry"""
+    entry = {"step": "Run", "action": "power_profile"}
+    try:
+        summary = profiler.stop()
+        profiler.annotate(results_log)
+        entry.update({"status": "Success", "message": summary})
+    except Exception as e:
+        entry.update({"status": "Failed", "message": f"Error collecting power profile: {e}"})
+    event(logging.INFO, "power_profile", f"Power profile: {entry['status']}", status=entry["status"],
+          result=entry["message"])
+    return entry
+
+def start_timeline(test_name: str, options):
+    """Open a delta-encoded screen timeline for this run under reports/timelines/"""
+    import datetime
+    from utils import timeline
+    options = options if isinstance(options, dict) else {}
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in test_name)
+    directory = config_loader.get_reports_dir('timelines', f"{safe_name}_{timestamp}")
+    writer = timeline.TimelineWriter(
+        directory,
+        tile_size=int(options.get("tile_size", timeline.DEFAULT_TILE_SIZE)),
+        keyframe_interval=int(options.get("keyframe_interval", timeline.DEFAULT_KEYFRAME_INTERVAL)),
+    )
+    log.info("Timeline: recording a frame after every step to %s", directory)
+    return writer
+
+def capture_timeline_frame(driver, writer, options, step, label: str = None):
+    """Capture the screen after a step; diffing and storage happen on the timeline's thread"""
+    from utils import screencap
+    backend = options.get("capture_backend", "appium") if isinstance(options, dict) else "appium"
+    try:
+        writer.add(screencap.capture_frame(driver, backend), step=step, label=label)
+    except Exception as e:
+        log.warning("Timeline: could not capture step %s: %s", step, e)
+
+def finish_timeline(writer):
+    summary = writer.close()
+    if summary["raw_bytes"]:
+        summary["compression_ratio"] = round(summary["raw_bytes"] / max(summary["stored_bytes"], 1), 1)
+    status = "Failed" if summary["errors"] else "Success"
+    event(logging.INFO, "timeline", f"Timeline: {status} - {summary['frames']} frames, {summary['stored_bytes']} bytes",
+          status=status, summary=summary)
+    return {"step": "Run", "action": "timeline", "status": status, "message": summary}
+
+def start_trace(driver, test_name: str, options, origin: float):
+    """Stream a Chrome trace of this run to reports/traces/, with logcat markers from the device"""
+    import datetime
+    from utils import adb_client
+    options = options if isinstance(options, dict) else {}
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in test_name)
+    path = os.path.join(config_loader.get_reports_dir('traces'), f"{safe_name}_{timestamp}.json")
+    writer = chrome_trace.TraceWriter(path, origin)
+    chrome_trace.set_current(writer)
+    markers = None
+    if options.get("logcat", True):
+        try:
+            markers = chrome_trace.LogcatMarkers(
+                writer, adb_client.resolve_serial(driver),
+                filters=options.get("logcat_filters", chrome_trace.DEFAULT_LOGCAT_FILTERS),
+                pattern=options.get("logcat_pattern"),
+            ).start()
+        except Exception as e:
+            log.warning("Trace: logcat markers unavailable: %s", e)
+    log.info("Trace: streaming events to %s", path)
+    return writer, markers
+
+def finish_trace(trace, test_name: str, started: float, status: str):
+    writer, markers = trace
+    finished = time.monotonic()
+    if markers:
+        markers.stop()
+    writer.complete(test_name, "test", started, finished, status=status)
+    chrome_trace.set_current(None)
+    writer.close()
+    log.info("Trace: %d events written to %s", writer.events, writer.path)
+    return {"step": "Run", "action": "trace", "status": "Success", "message": {"filepath": writer.path, "events": writer.events}}
+
+def run_test_case(test_data: dict, events: EventBus = None, cancel_token: CancellationToken = None):
+    """Runs a test case defined by the provided data structure.
+
+    When an EventBus is given, structured progress events (run and step
+    started/finished, with status, duration and artifacts) are published
+    to it as the run proceeds. Cancelling cancel_token (e.g. from a Stop
+    button) ends the run after, or during, the current step.
+
+    Runner output goes through a RunLog (see runner/run_log.py), configured
+    by the test case's "log" object: a JSONL event stream under
+    reports/logs/ and, unless disabled, a console rendering of it.
+    """
+    test_name = test_data.get('name', 'Unnamed Test')
+    steps = test_data.get("steps")
+    publish = events.publish if events else lambda event_type, **fields: None
+    run_log = RunLog(test_name, test_data.get("log")).start()
+    publish(RUN_STARTED, test=test_name, total_steps=len(steps) if isinstance(steps, list) else 0, log_path=run_log.path)
+    started = time.monotonic()
+    success, results_log = False, []
+    try:
+        success, results_log = _run_test_case(test_data, publish, cancel_token or CancellationToken())
+    finally:
+        duration_s = round(time.monotonic() - started, 3)
+        event(logging.INFO, "run_finished", f"Events written to {run_log.path}", test=test_name,
+              status="Success" if success else "Failed", duration_s=duration_s)
+        run_log.close()
+        publish(RUN_FINISHED, test=test_name, status="Success" if success else "Failed",
+                duration_s=duration_s, results=results_log)
+    return success, results_log
+
+def _run_test_case(test_data: dict, publish, token: CancellationToken):
     test_name = test_data.get('name', 'Unnamed Test')
-    print(f"\n======= Running Test Case: {test_name} =======")
+    event(logging.INFO, "run_started", f"======= Running Test Case: {test_name} =======", test=test_name,
+          settings={key: value for key, value in test_data.items() if key != "steps"})
 
     steps = test_data.get("steps")
     if not steps or not isinstance(steps, list):
-        print("Error: No valid 'steps' array found in the test data.")
-        return False
+        log.error("No valid 'steps' array found in the test data.")
+        return False, [{"step": "Setup", "status": "Failed", "message": "No valid 'steps' array found in the test data."}]
+
+    frame_captures = test_data.get("frame_capture", [])
+    if isinstance(frame_captures, dict):
+        frame_captures = [frame_captures]
+    capture_errors = []
+    pending_captures, active_captures = [], []
+    for capture in frame_captures:
+        from_step, to_step = _step_number(capture.get("from_step")), _step_number(capture.get("to_step"))
+        if from_step is None or to_step is None:
+            capture_errors.append(_frame_capture_failed(capture, "from_step and to_step must be step numbers"))
+        else:
+            pending_captures.append(dict(capture, from_step=from_step, to_step=to_step))
+    leak_hunts = test_data.get("leak_hunt", [])
+    if isinstance(leak_hunts, dict):
+        leak_hunts = [leak_hunts]
+    power_profile = test_data.get("power_profile")
+    timeline_options = test_data.get("timeline")
+    trace_options = test_data.get("trace")
+    if test_data.get("artifact_store"):
+        artifact_store.get_store().configure(**test_data["artifact_store"])
 
     driver = None
-    overall_status = "Success"
-    results_log = []
+    profiler = None
+    timeline_writer = None
+    trace = None
+    run_started = time.monotonic()
+    overall_status = "Failed" if capture_errors else "Success"
+    results_log = list(capture_errors)
+    watchdog = Watchdog(token, test_data.get("test_timeout_s"), test_data.get("step_timeout_s"))
+    command_recorder = step_timing.CommandRecorder()
+    cancellation.set_current(token)
 
     try:
-        print("\n--- Initializing Driver for Test Run ---")
+        log.info("Initializing driver")
         driver = initialize_driver()
         if driver is None:
-            print("Driver initialization failed. Aborting test run.")
-            print("\nTroubleshooting Steps:")
-            print("1. Check if your Android device is connected via USB")
-            print("2. Enable USB Debugging in Developer Options")
-            print("3. Start Appium Server (default: http://localhost:4723)")
-            print("4. Verify device ID in config/capabilities.json")
-            print("5. Check if required apps are installed on device")
-            print("\nRun 'adb devices' to see connected devices")
-            print("Check Appium server logs for detailed error information")
-            
+            log.error("Driver initialization failed. Aborting test run.\n"
+                      "Troubleshooting Steps:\n"
+                      "1. Check if your Android device is connected via USB\n"
+                      "2. Enable USB Debugging in Developer Options\n"
+                      "3. Start Appium Server (default: http://localhost:4723)\n"
+                      "4. Verify device ID in config/capabilities.json\n"
+                      "5. Check if required apps are installed on device\n"
+                      "Run 'adb devices' to see connected devices\n"
+                      "Check Appium server logs for detailed error information")
+
             results_log.append({"step": "Setup", "status": "Failed", "message": "Driver initialization failed - check device connection and Appium server"})
             return False, results_log
+        watchdog.attach(driver).start()
+        command_recorder.attach(driver)
+
+        if trace_options:
+            try:
+                trace = start_trace(driver, test_name, trace_options, run_started)
+            except Exception as e:
+                log.warning("Trace could not be started: %s", e)
+
+        if power_profile:
+            try:
+                profiler = start_power_profile(driver, power_profile)
+            except Exception as e:
+                log.warning("Power profile could not be started: %s", e)
 
-        print("\n--- Starting Test Execution ---")
-        for i, step in enumerate(steps):
-            step_number = i + 1
-            action_name = step.get("action")
-            params = step.get("params", {})
-            notes = step.get("notes", "")
-            step_status = "Failed"
-            result_message = "Action not found or not executed."
-
-            print(f"\n--- Step {step_number}/{len(steps)} ---")
-            print(f"Action: {action_name}")
-            if notes: print(f"Notes: {notes}")
-            print(f"Params: {params}")
-
-            if not action_name:
-                print("Error: Step is missing 'action' name. Skipping.")
-                result_message = "Step missing 'action' name."
+        if timeline_options:
+            timeline_writer = start_timeline(test_name, timeline_options)
+            capture_timeline_frame(driver, timeline_writer, timeline_options, 0, "start")
+
+        log.info("Starting test execution")
+        step_index = 0
+        while step_index < len(steps):
+            step_number = step_index + 1
+            if token.cancelled:
+                log.warning("Run cancelled before step %s: %s", step_number, token.reason)
                 overall_status = "Failed"
-                results_log.append({"step": step_number, "action": action_name, "status": step_status, "message": result_message})
+                results_log.append({"step": step_number, "action": steps[step_index].get("action"),
+                                    "status": "Failed", "message": f"Not run: {token.reason}"})
+                break
+
+            leak_hunt = next((h for h in leak_hunts if _step_number(h.get("from_step")) == step_number), None)
+            if leak_hunt:
+                hunt_end = max(_step_number(leak_hunt.get("to_step")) or step_number, step_number)
+                for capture_entry in start_frame_captures(driver, pending_captures, active_captures,
+                                                          step_number, hunt_end):
+                    overall_status = "Failed"
+                    results_log.append(capture_entry)
+                    publish(RUN_ENTRY, entry=capture_entry)
+                started = time.monotonic()
+                hunt_label = f"{step_number}-{leak_hunt.get('to_step', step_number)}"
+                watchdog.start_step(hunt_label, leak_hunt.get("timeout_s"))
+                step_timing.start_step(hunt_label)
+                hunt_entry = run_leak_hunt(driver, steps, leak_hunt)
+                hunt_entry["timing"] = step_timing.end_step().breakdown()
+                chrome_trace.complete(f"Leak hunt {hunt_label}", "step", started, time.monotonic(),
+                                      status=hunt_entry["status"])
+                watchdog.end_step()
+                if token.cancelled:
+                    hunt_entry.update({"status": "Failed", "message": f"{token.reason}: {hunt_entry['message']}"})
+                if profiler:
+                    profiler.mark(hunt_entry["step"], started, time.monotonic())
+                if timeline_writer:
+                    capture_timeline_frame(driver, timeline_writer, timeline_options, hunt_entry["step"], "leak_hunt")
+                if hunt_entry["status"] != "Success":
+                    overall_status = "Failed"
+                results_log.append(hunt_entry)
+                publish(RUN_ENTRY, entry=hunt_entry)
+                if token.cancelled:
+                    break
+                for capture_entry in collect_frame_captures(driver, active_captures, hunt_end):
+                    if capture_entry["status"] != "Success":
+                        overall_status = "Failed"
+                    results_log.append(capture_entry)
+                    publish(RUN_ENTRY, entry=capture_entry)
+                step_index = hunt_end
                 continue
 
-            action_function = ACTION_MAPPING.get(action_name)
+            for capture_entry in start_frame_captures(driver, pending_captures, active_captures,
+                                                      step_number, step_number):
+                overall_status = "Failed"
+                results_log.append(capture_entry)
+                publish(RUN_ENTRY, entry=capture_entry)
 
-            if not action_function:
-                result_message = f"Action '{action_name}' not found in available actions."
-                print(f"Error: {result_message}")
+            started = time.monotonic()
+            publish(STEP_STARTED, step=step_number, index=step_index, action=steps[step_index].get("action"))
+            watchdog.start_step(step_number, steps[step_index].get("timeout_s"))
+            step_timing.start_step(step_number)
+            log_entry, abort_run = execute_step(driver, steps[step_index], step_number, len(steps))
+            log_entry["timing"] = step_timing.end_step().breakdown()
+            event(logging.DEBUG, "step_timing", f"Step {step_number} timing", step=step_number, timing=log_entry["timing"])
+            watchdog.end_step()
+            finished = time.monotonic()
+            chrome_trace.complete(f"Step {step_number}: {log_entry['action']}", "step", started, finished,
+                                  step=step_number, status=log_entry["status"])
+            if token.cancelled:
+                # The step may have swallowed the abort and reported its own error
+                if token.reason not in str(log_entry["message"]):
+                    log_entry["message"] = f"{token.reason}: {log_entry['message']}"
+                log_entry["status"] = "Failed"
+                abort_run = True
+            if profiler:
+                profiler.mark(step_number, started, finished)
+            if timeline_writer:
+                capture_timeline_frame(driver, timeline_writer, timeline_options, step_number, log_entry["action"])
+            results_log.append(log_entry)
+            publish(STEP_FINISHED, step=step_number, index=step_index, action=log_entry["action"],
+                    status=log_entry["status"], message=log_entry["message"], duration_s=round(finished - started, 3),
+                    artifacts=artifacts_from_result(log_entry["message"]) + screenshot_service.take_step_paths(step_number),
+                    timing=log_entry["timing"])
+            if log_entry["status"] != "Success":
                 overall_status = "Failed"
-            else:
-                try:
-                    print(f"Executing: {action_function.__name__}(driver=..., **{params})")
-                    success, result_message_from_action = action_function(driver, **params)
-                    result_message = result_message_from_action
-
-                    if success:
-                        step_status = "Success"
-                        print(f"Result: {step_status} - {result_message}")
-                    else:
-                        step_status = "Failed"
-                        print(f"Result: {step_status} - {result_message}")
-                        overall_status = "Failed"
+            if abort_run:
+                break
 
-                except TypeError as te:
-                     err_msg = f"Parameter mismatch calling action '{action_name}' with params {params}. Error: {te}"
-                     print(f"CRITICAL STEP ERROR: {err_msg}")
-                     result_message = err_msg
-                     overall_status = "Failed"
-                     break
-                except Exception as step_err:
-                     err_msg = f"Unexpected error during action '{action_name}': {step_err}"
-                     print(f"CRITICAL STEP ERROR: {err_msg}")
-                     traceback.print_exc()
-                     result_message = err_msg
-                     overall_status = "Failed"
-                     break
+            for capture_entry in collect_frame_captures(driver, active_captures, step_number):
+                if capture_entry["status"] != "Success":
+                    overall_status = "Failed"
+                results_log.append(capture_entry)
+                publish(RUN_ENTRY, entry=capture_entry)
 
-            results_log.append({"step": step_number, "action": action_name, "status": step_status, "message": result_message})
+            step_index += 1
 
-        print("\n--- Test Execution Finished ---")
+        log.info("Test execution finished")
 
     except Exception as run_err:
-         print(f"An unexpected error occurred during the test run orchestration: {run_err}")
+         event(logging.ERROR, "run_error", f"An unexpected error occurred during the test run orchestration: {run_err}",
+               traceback=traceback.format_exc())
          overall_status = "Failed"
          results_log.append({"step": "Orchestration", "status": "Failed", "message": str(run_err)})
-         traceback.print_exc()
 
     finally:
-        print("\n--- Quitting Driver ---")
+        if profiler:
+            results_log.append(finish_power_profile(profiler, results_log))
+        if timeline_writer:
+            timeline_entry = finish_timeline(timeline_writer)
+            if timeline_entry["status"] != "Success":
+                overall_status = "Failed"
+            results_log.append(timeline_entry)
+        if trace:
+            results_log.append(finish_trace(trace, test_name, run_started, overall_status))
+        for name, recorder in screen_recorder.stop_all().items():
+            log.warning("Screen recording '%s' was still running; stopped with %d segment(s)", name, len(recorder.segments))
+            if recorder.errors:
+                overall_status = "Failed"
+                results_log.append({"step": "Recording", "status": "Failed", "message": f"{name}: {'; '.join(recorder.errors)}"})
+        watchdog.stop()
+        if command_recorder.detach().run.round_trips:
+            results_log.append({"step": "Run", "action": "command_stats", "status": "Success",
+                                "message": command_recorder.summary()})
+        cancellation.set_current(None)
+        log.info("Quitting driver")
         quit_driver()
+        screenshot_errors = screenshot_service.flush(timeout=60)
+        if screenshot_errors:
+            overall_status = "Failed"
+            results_log.append({"step": "Screenshots", "status": "Failed", "message": "; ".join(screenshot_errors)})
 
-    print(f"\n======= Test Run Summary: {test_name} =======")
-    print(f"Overall Status: {overall_status}")
-    print("Detailed Log:")
+    failed = [entry for entry in results_log if entry.get('status') != "Success"]
+    log.info("======= Test Run Summary: %s - %s (%d entries, %d failed) =======",
+             test_name, overall_status, len(results_log), len(failed))
+    # Successful entries were already logged as their steps finished; repeat only the failures
     for log_entry in results_log:
-         print(f"  Step {log_entry.get('step', '?')}: [{log_entry.get('action', 'N/A')}] - {log_entry.get('status', 'Unknown')} - {log_entry.get('message', '')}")
-    print(f"==================================================")
+        event(logging.WARNING if log_entry.get('status') != "Success" else logging.DEBUG, "summary_entry",
+              f"  Step {log_entry.get('step', '?')}: [{log_entry.get('action', 'N/A')}] - {log_entry.get('status', 'Unknown')}",
+              step=log_entry.get('step'), status=log_entry.get('status'), result=log_entry.get('message', ''))
 
     return overall_status == "Success", results_log
\ No newline at end of file
@@ -0,0 +1,172 @@
+# runner/watchdog.py
+import socket
+import threading
+import time
+import urllib3
+from utils.cancellation import Cancelled
+
+# HTTP timeout used for quitting the session after a cancelled run
+QUIT_TIMEOUT_S = 10
+
+
+class Watchdog:
+    """Enforces the step and test time budgets of one run and aborts it on Stop.
+
+    The Appium client's urllib3 PoolManager gets a `request` wrapper that
+    refuses new requests once the run is cancelled and passes a per-request
+    timeout bounded by the time left in the tighter budget. Pools and their
+    keep-alive connections are reused as before. The connections checked
+    out of a pool are tracked; when the token is cancelled (Stop, or a
+    budget running out) the background thread shuts their sockets down, so
+    a request blocked on a hung server or device fails at once.
+    """
+
+    def __init__(self, token, test_timeout_s: float = None, step_timeout_s: float = None):
+        self.token = token
+        self.step_timeout_s = float(step_timeout_s) if step_timeout_s else None
+        self._test_deadline = time.monotonic() + float(test_timeout_s) if test_timeout_s else None
+        self._test_timeout_s = test_timeout_s
+        self._step_deadline = None
+        self._step_label = None
+        self._step_timeout = None
+        self._executor = None
+        self._managers = []
+        self._pools = []
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def attach(self, driver):
+        """Route the driver's HTTP requests through the cancellation and budget checks"""
+        executor = getattr(driver, 'command_executor', None)
+        if executor is None:
+            return self
+        self._executor = executor
+        if getattr(executor, '_conn', None) is not None:
+            self._wrap_manager(executor._conn)
+        if hasattr(executor, '_get_connection_manager'):
+            # Without keep-alive the client creates a PoolManager per request
+            create = executor._get_connection_manager
+            executor._get_connection_manager = lambda: self._wrap_manager(create())
+        return self
+
+    def _wrap_manager(self, manager):
+        original = manager.request
+
+        def request(method, url, *args, **kwargs):
+            if self._closing:
+                kwargs['timeout'] = urllib3.Timeout(connect=QUIT_TIMEOUT_S, read=QUIT_TIMEOUT_S)
+            else:
+                self.token.check()
+                remaining = self.remaining()
+                if remaining is not None:
+                    if remaining <= 0:
+                        raise Cancelled(self._expired_reason())
+                    kwargs['timeout'] = urllib3.Timeout(connect=remaining, read=remaining)
+                self._track(manager.connection_from_url(url))
+            return original(method, url, *args, **kwargs)
+
+        manager.request = request
+        with self._lock:
+            self._managers.append(manager)
+        return manager
+
+    def _track(self, pool):
+        """Record the connections a pool hands out until they are returned"""
+        if '_get_conn' in pool.__dict__:
+            return
+        get_conn, put_conn = pool._get_conn, pool._put_conn
+
+        def _get_conn(*args, **kwargs):
+            # Also stops urllib3 retrying a request whose socket was shut down
+            if self.token.cancelled and not self._closing:
+                raise Cancelled(self.token.reason)
+            conn = get_conn(*args, **kwargs)
+            with self._lock:
+                self._in_flight.add(conn)
+            return conn
+
+        def _put_conn(conn):
+            with self._lock:
+                self._in_flight.discard(conn)
+            return put_conn(conn)
+
+        pool._get_conn, pool._put_conn = _get_conn, _put_conn
+        with self._lock:
+            self._pools.append(pool)
+
+    def _abort_in_flight(self):
+        with self._lock:
+            connections = list(self._in_flight)
+        for conn in connections:
+            sock = getattr(conn, 'sock', None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="run-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def start_step(self, label, timeout_s: float = None):
+        timeout_s = float(timeout_s) if timeout_s else self.step_timeout_s
+        self._step_label = label
+        self._step_timeout = timeout_s
+        self._step_deadline = time.monotonic() + timeout_s if timeout_s else None
+
+    def end_step(self):
+        # A request may time out just before the next watchdog tick; attribute it to the budget
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            self.token.cancel(self._expired_reason())
+        self._step_deadline = None
+
+    def remaining(self):
+        """Seconds left in the tighter of the step and test budgets, or None without budgets"""
+        deadlines = [d for d in (self._step_deadline, self._test_deadline) if d is not None]
+        return min(deadlines) - time.monotonic() if deadlines else None
+
+    def _expired_reason(self):
+        now = time.monotonic()
+        if self._test_deadline is not None and now >= self._test_deadline:
+            return f"Test exceeded its {self._test_timeout_s}s time budget"
+        return f"Step {self._step_label} exceeded its {self._step_timeout:g}s time budget"
+
+    def _run(self):
+        while not self._stop_event.wait(0.1):
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                self.token.cancel(self._expired_reason())
+            if self.token.cancelled:
+                # Repeated each tick: a connection checked out just before the cancel may not have a socket yet
+                self._abort_in_flight()
+
+    def stop(self):
+        """Stop watching and restore the driver's HTTP requests.
+
+        After a cancelled run the wrapper stays in place with a short
+        timeout, so quitting a session on a hung server cannot block either.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        if self.token.cancelled:
+            self._closing = True
+            return
+        with self._lock:
+            managers, self._managers = self._managers, []
+            pools, self._pools = self._pools, []
+        for manager in managers:
+            manager.__dict__.pop('request', None)
+        for pool in pools:
+            pool.__dict__.pop('_get_conn', None)
+            pool.__dict__.pop('_put_conn', None)
+        if self._executor is not None:
+            self._executor.__dict__.pop('_get_connection_manager', None)
+            self._executor = None
@@ -27,7 +27,9 @@ def check_dependencies():
     
     required_packages = [
         ('Appium-Python-Client', 'appium'),
-        ('requests', 'requests')
+        ('requests', 'requests'),
+        ('numpy', 'numpy'),
+        ('Pillow', 'PIL')
     ]
     
     missing_packages = []
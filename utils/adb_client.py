@@ -0,0 +1,57 @@
+import subprocess
+from .config_loader import load_capabilities
+
+
+def resolve_serial(driver=None):
+    """Get the serial of the device under test from the session or capabilities"""
+    if driver is not None:
+        capabilities = getattr(driver, 'capabilities', None) or {}
+        serial = capabilities.get('deviceUDID') or capabilities.get('udid')
+        if serial:
+            return serial
+    capabilities = load_capabilities() or {}
+    return capabilities.get('appium:udid') or capabilities.get('appium:deviceName')
+
+
+def adb_args(args: list, serial: str = None):
+    """Build an adb command line, targeting a specific device when a serial is given"""
+    command = ['adb']
+    if serial:
+        command += ['-s', serial]
+    return command + list(args)
+
+
+def run_adb(args: list, serial: str = None, timeout: float = 30, text: bool = True, check: bool = False):
+    """Run an adb command and return the CompletedProcess"""
+    return subprocess.run(
+        adb_args(args, serial),
+        capture_output=True,
+        text=text,
+        timeout=timeout,
+        check=check
+    )
+
+
+def shell(command: str, serial: str = None, timeout: float = 30):
+    """Run a shell command on the device over adb and return stdout as text"""
+    result = run_adb(['shell', command], serial, timeout=timeout)
+    return result.stdout
+
+
+def exec_out(command: str, serial: str = None, timeout: float = 30):
+    """Run a command with `adb exec-out` and return raw stdout bytes (no tty translation)"""
+    result = run_adb(['exec-out', command], serial, timeout=timeout, text=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"adb exec-out '{command}' failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def list_devices():
+    """List serials of connected, authorized devices"""
+    result = run_adb(['devices'], timeout=10)
+    serials = []
+    for line in result.stdout.strip().splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == 'device':
+            serials.append(parts[0])
+    return serials
@@ -0,0 +1,182 @@
+import logging
+import os
+import socket
+import stat
+import struct
+import time
+
+log = logging.getLogger(__name__)
+
+ADB_HOST = '127.0.0.1'
+ADB_PORT = 5037
+# The sync protocol limits DATA packets to 64 KiB
+CHUNK_SIZE = 64 * 1024
+
+_HEADER = struct.Struct('<4sI')
+_STAT = struct.Struct('<4sIII')
+_DENT = struct.Struct('<4sIIII')
+
+
+class AdbSyncError(Exception):
+    """Raised when the adb server or device rejects a sync request"""
+
+
+class SyncConnection:
+    """A file sync session with one device over the adb server's socket.
+
+    Files move in 64 KiB DATA packets straight between the socket and local
+    files, so memory use does not depend on the file size. Progress
+    callbacks receive (bytes_transferred, total_bytes).
+
+        with SyncConnection(serial) as sync:
+            sync.push('video.mp4', '/sdcard/Movies/video.mp4', progress=progress_logger('push video.mp4'))
+    """
+
+    def __init__(self, serial: str = None, host: str = ADB_HOST, port: int = ADB_PORT, timeout: float = 60):
+        self.serial = serial
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        try:
+            self._host_request(f"host:transport:{serial}" if serial else "host:transport-any")
+            self._host_request("sync:")
+        except Exception:
+            self._socket.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self._send_request(b'QUIT', b'')
+        except OSError:
+            pass
+        self._socket.close()
+
+    # -- low level -------------------------------------------------------
+
+    def _read_exact(self, size: int):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self._socket.recv_into(view[received:], size - received)
+            if count == 0:
+                raise AdbSyncError("Connection closed by adb server")
+            received += count
+        return bytes(buffer)
+
+    def _host_request(self, request: str):
+        data = request.encode('utf-8')
+        self._socket.sendall(b'%04x' % len(data) + data)
+        status = self._read_exact(4)
+        if status != b'OKAY':
+            length = int(self._read_exact(4), 16)
+            raise AdbSyncError(f"adb {request}: {self._read_exact(length).decode(errors='replace')}")
+
+    def _send_request(self, command: bytes, payload: bytes):
+        self._socket.sendall(_HEADER.pack(command, len(payload)) + payload)
+
+    def _read_fail(self, length: int):
+        return AdbSyncError(self._read_exact(length).decode(errors='replace'))
+
+    # -- sync commands ---------------------------------------------------
+
+    def stat(self, remote_path: str):
+        """(mode, size, mtime) of a remote path; mode is 0 if it does not exist"""
+        self._send_request(b'STAT', remote_path.encode('utf-8'))
+        command, mode, size, mtime = _STAT.unpack(self._read_exact(_STAT.size))
+        if command != b'STAT':
+            raise AdbSyncError(f"Unexpected reply {command!r} to STAT")
+        return mode, size, mtime
+
+    def list(self, remote_path: str):
+        """Entries of a remote directory as (name, mode, size, mtime) tuples"""
+        self._send_request(b'LIST', remote_path.encode('utf-8'))
+        entries = []
+        while True:
+            command, mode, size, mtime, name_length = _DENT.unpack(self._read_exact(_DENT.size))
+            if command == b'DONE':
+                return entries
+            if command != b'DENT':
+                raise AdbSyncError(f"Unexpected reply {command!r} to LIST")
+            name = self._read_exact(name_length).decode('utf-8', errors='replace')
+            if name not in ('.', '..'):
+                entries.append((name, mode, size, mtime))
+
+    def push(self, local_path: str, remote_path: str, mode: int = None, progress=None):
+        """Stream a local file to the device; returns the number of bytes sent"""
+        file_stat = os.stat(local_path)
+        mode = stat.S_IMODE(file_stat.st_mode) if mode is None else mode
+        total = file_stat.st_size
+        self._send_request(b'SEND', f"{remote_path},{mode | stat.S_IFREG}".encode('utf-8'))
+        sent = 0
+        with open(local_path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._send_request(b'DATA', chunk)
+                sent += len(chunk)
+                if progress:
+                    progress(sent, total)
+        self._socket.sendall(_HEADER.pack(b'DONE', int(file_stat.st_mtime)))
+        command, length = _HEADER.unpack(self._read_exact(_HEADER.size))
+        if command == b'FAIL':
+            raise self._read_fail(length)
+        if command != b'OKAY':
+            raise AdbSyncError(f"Unexpected reply {command!r} to SEND")
+        return sent
+
+    def pull(self, remote_path: str, local_path: str, progress=None):
+        """Stream a device file into local_path (written atomically); returns the number of bytes received"""
+        total = self.stat(remote_path)[1]
+        self._send_request(b'RECV', remote_path.encode('utf-8'))
+        directory = os.path.dirname(os.path.abspath(local_path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{local_path}.part"
+        received = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    command, length = _HEADER.unpack(self._read_exact(_HEADER.size))
+                    if command == b'DONE':
+                        break
+                    if command == b'FAIL':
+                        raise self._read_fail(length)
+                    if command != b'DATA':
+                        raise AdbSyncError(f"Unexpected reply {command!r} to RECV")
+                    f.write(self._read_exact(length))
+                    received += length
+                    if progress:
+                        progress(received, total)
+            os.replace(temp_path, local_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return received
+
+
+def server_available(host: str = ADB_HOST, port: int = ADB_PORT, timeout: float = 1):
+    """Whether an adb server is listening (it is not when Appium runs on another host)"""
+    try:
+        socket.create_connection((host, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+def progress_logger(label: str, step_percent: int = 10):
+    """Progress callback logging every step_percent of a transfer with its throughput"""
+    started = time.monotonic()
+    state = {'next': step_percent}
+
+    def report(done: int, total: int):
+        percent = 100 if not total else done * 100 // total
+        if percent >= state['next'] or done == total:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            log.info("%s: %d%% (%.1f MB, %.1f MB/s)", label, percent, done / 1048576, done / 1048576 / elapsed)
+            state['next'] = percent - percent % step_percent + step_percent
+    return report
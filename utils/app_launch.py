@@ -0,0 +1,204 @@
+import re
+import shlex
+from urllib.parse import urlsplit
+
+_AM_START_FIELDS = {
+    'status': re.compile(r'^Status:\s*(\S+)', re.M),
+    'launch_state': re.compile(r'^LaunchState:\s*(\S+)', re.M),
+    'activity': re.compile(r'^Activity:\s*(\S+)', re.M),
+    'total_time_ms': re.compile(r'^TotalTime:\s*(\d+)', re.M),
+    'wait_time_ms': re.compile(r'^WaitTime:\s*(\d+)', re.M),
+}
+
+_DISPLAYED_RE = re.compile(r'Displayed\s+(\S+):\s*\+(?:(\d+)s)?(\d+)ms')
+
+VIEW_ACTION = 'android.intent.action.VIEW'
+
+# (session, kind, package, ...) -> resolved component, so repeated launches skip `resolve-activity`
+_resolved_components = {}
+
+
+def shell(driver, command: str):
+    """Run a shell command on the device through Appium and return its output as text"""
+    result = driver.execute_script('mobile: shell', {'command': command})
+    return result if isinstance(result, str) else (result or '')
+
+
+def parse_am_start(output: str):
+    """Parse the output of `am start -W` into typed fields"""
+    parsed = {}
+    for name, pattern in _AM_START_FIELDS.items():
+        match = pattern.search(output or '')
+        if not match:
+            parsed[name] = None
+        elif name.endswith('_ms'):
+            parsed[name] = int(match.group(1))
+        else:
+            parsed[name] = match.group(1)
+    parsed['error'] = None
+    for line in (output or '').splitlines():
+        if line.startswith('Error') or line.startswith('Warning: Activity not started'):
+            parsed['error'] = line.strip()
+            break
+    return parsed
+
+
+def parse_displayed_time(logcat_output: str, package_name: str):
+    """Return the last 'Displayed' time in ms reported by the activity manager for a package"""
+    displayed_ms = None
+    for match in _DISPLAYED_RE.finditer(logcat_output or ''):
+        if not match.group(1).startswith(package_name + '/'):
+            continue
+        seconds = int(match.group(2) or 0)
+        displayed_ms = seconds * 1000 + int(match.group(3))
+    return displayed_ms
+
+
+def _parse_resolved(output: str):
+    """Component (pkg/.Activity) from `cmd package resolve-activity --brief` output, or None"""
+    for line in reversed((output or '').strip().splitlines()):
+        line = line.strip()
+        if '/' in line and ' ' not in line:
+            return line
+    return None
+
+
+def is_chooser(component: str):
+    """Whether a resolved component is the system's handler chooser rather than a handler.
+
+    With several matching activities resolve-activity returns the chooser
+    (android/com.android.internal.app.ResolverActivity, or an OEM variant).
+    """
+    return component.split('/', 1)[-1].endswith(('ResolverActivity', 'ChooserActivity'))
+
+
+def resolve_launch_activity(driver, package_name: str):
+    """Resolve the launcher activity component (pkg/.Activity) for a package"""
+    output = shell(driver, f'cmd package resolve-activity --brief -a android.intent.action.MAIN '
+                           f'-c android.intent.category.LAUNCHER {package_name}')
+    component = _parse_resolved(output)
+    if component and is_chooser(component):
+        raise ValueError(f"{package_name} has several launcher activities; set activity_name to pick one")
+    return component
+
+
+def resolve_intent_activity(driver, uri: str, package_name: str = None, action: str = VIEW_ACTION):
+    """Resolve the activity component that handles a URI, optionally limited to one package.
+
+    Raises ValueError when several activities handle the URI, since starting
+    the chooser would not open the link.
+    """
+    output = shell(driver, f'cmd package resolve-activity --brief -a {action} -d {shlex.quote(uri)} '
+                           f'{package_name or ""}'.rstrip())
+    component = _parse_resolved(output)
+    if component and is_chooser(component):
+        if package_name:
+            raise ValueError(f"Several activities of {package_name} handle {uri}; it would open the chooser")
+        raise ValueError(f"Several apps handle {uri}; set package_name to pick one instead of opening the chooser")
+    return component
+
+
+def intent_key(uri: str, package_name: str = None, action: str = VIEW_ACTION):
+    """Cache key for a URI's handler: scheme, host and path, ignoring the query and fragment"""
+    parts = urlsplit(uri)
+    return ('intent', package_name, action, parts.scheme, parts.netloc, parts.path)
+
+
+def intent_arguments(uri: str = None, extras=None, action: str = VIEW_ACTION):
+    """am start arguments for an optional data URI and extras"""
+    arguments = [f"-a {action} -d {shlex.quote(uri)}" if uri else '', intent_extras(extras)]
+    return ' '.join(a for a in arguments if a)
+
+
+def _session_key(driver):
+    return getattr(driver, 'session_id', None) or id(driver)
+
+
+def cached_component(driver, key: tuple, resolver):
+    """Resolve a component once per session and key; None results are not cached"""
+    cache_key = (_session_key(driver),) + key
+    if cache_key not in _resolved_components:
+        component = resolver()
+        if not component:
+            return None
+        _resolved_components[cache_key] = component
+    return _resolved_components[cache_key]
+
+
+def forget_component(driver, key: tuple):
+    _resolved_components.pop((_session_key(driver),) + key, None)
+
+
+def intent_extras(extras):
+    """am start extra arguments from a dict or a 'key=value; key2=value2' string.
+
+    Value types pick the flag: booleans use --ez, integers --ei or --el,
+    floats --ef and everything else --es.
+    """
+    if not extras:
+        return ''
+    if isinstance(extras, str):
+        pairs = {}
+        for item in extras.split(';'):
+            if '=' in item:
+                key, value = item.split('=', 1)
+                pairs[key.strip()] = _typed_value(value.strip())
+        extras = pairs
+    arguments = []
+    for key, value in extras.items():
+        if isinstance(value, bool):
+            flag, value = '--ez', str(value).lower()
+        elif isinstance(value, int):
+            flag = '--ei' if -2 ** 31 <= value < 2 ** 31 else '--el'
+        elif isinstance(value, float):
+            flag = '--ef'
+        else:
+            flag = '--es'
+        arguments.append(f"{flag} {shlex.quote(str(key))} {shlex.quote(str(value))}")
+    return ' '.join(arguments)
+
+
+def _typed_value(text: str):
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def build_component(package_name: str, activity_name: str = None):
+    """Build an am component name from a package and an optional activity"""
+    if not activity_name:
+        return None
+    if '/' in activity_name:
+        return activity_name
+    return f"{package_name}/{activity_name}"
+
+
+def device_epoch(driver):
+    """Current device time in seconds since the epoch, used to scope logcat reads"""
+    output = shell(driver, 'date +%s').strip()
+    return int(output) if output.isdigit() else None
+
+
+def read_displayed_time(driver, package_name: str, since_epoch: int = None):
+    """Read the activity manager 'Displayed' line for a package from logcat"""
+    since = f"-T {since_epoch}.000 " if since_epoch else ""
+    output = shell(driver, f'logcat -d {since}-s ActivityTaskManager:I ActivityManager:I')
+    return parse_displayed_time(output, package_name)
+
+
+def am_start(driver, component: str, extra_args: str = ''):
+    """Start a component with `am start -W` and return the parsed launch timings"""
+    output = shell(driver, f'am start -W {extra_args} -n {component}'.replace('  ', ' '))
+    return parse_am_start(output)
+
+
+def drop_page_caches(driver):
+    """Drop the kernel page cache so the next start reads the app from storage (needs root)"""
+    output = shell(driver, "sync; (echo 3 > /proc/sys/vm/drop_caches || "
+                           "su 0 sh -c 'echo 3 > /proc/sys/vm/drop_caches') 2>/dev/null && echo dropped")
+    return 'dropped' in output
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+import shlex
+import subprocess
+import time
+from utils import adb_client, config_loader, install_manager
+
+# App data directories captured by default (relative to the app's data dir)
+DEFAULT_DIRECTORIES = ('shared_prefs', 'databases', 'files', 'no_backup')
+# exec-out/exec-in do not report the device command's exit status, so it is left in this file
+_STATUS_FILE = '.app_snapshot_status'
+
+
+def snapshot_path(package: str, name: str):
+    """Local archive path of a named snapshot: reports/app_snapshots/<package>/<name>.tar"""
+    return os.path.join(config_loader.get_reports_dir('app_snapshots', package), f"{name}.tar")
+
+
+def data_dir(serial: str, package: str):
+    """The package's dataDir from dumpsys (fallback when Appium cannot report it)"""
+    output = adb_client.shell(f"dumpsys package {shlex.quote(package)} | grep -m1 dataDir=", serial, timeout=30)
+    match = re.search(r'dataDir=(\S+)', output)
+    return match.group(1) if match else f"/data/data/{package}"
+
+
+def access_method(serial: str, package: str):
+    """'root' when adbd runs as root, 'run-as' for debuggable apps; raises otherwise"""
+    if adb_client.shell('id -u', serial, timeout=15).strip() == '0':
+        return 'root'
+    probe = adb_client.shell(f"run-as {shlex.quote(package)} id -u", serial, timeout=15).strip()
+    if probe.isdigit():
+        return 'run-as'
+    raise RuntimeError(f"Cannot read the data of {package}: it is not debuggable and adbd is not running as root "
+                       f"({probe or 'run-as failed'})")
+
+
+def _wrap(method: str, package: str, directory: str, command: str):
+    """Run a shell command inside the app's data directory with the access the method allows"""
+    if method == 'run-as':
+        # run-as starts in the app's data directory
+        return f"run-as {shlex.quote(package)} sh -c {shlex.quote(command)}"
+    return f"cd {shlex.quote(directory)} && {{ {command}; }}"
+
+
+def _with_status(command: str):
+    """Run command and record its exit status in the data directory"""
+    return f"{{ {command}; }}; echo $? > {_STATUS_FILE}"
+
+
+def _check_status(serial: str, method: str, package: str, directory: str, what: str, stderr: bytes):
+    """Read back (and remove) the status left by _with_status; raise unless it is 0"""
+    output = adb_client.shell(_wrap(method, package, directory, f"cat {_STATUS_FILE}; rm -f {_STATUS_FILE}"),
+                              serial, timeout=30).strip()
+    if output != '0':
+        detail = stderr.decode(errors='replace').strip()
+        status = f"exit status {output}" if output.isdigit() else "unknown exit status"
+        raise RuntimeError(f"{what} failed on the device ({status}){': ' + detail if detail else ''}")
+
+
+def snapshot(serial: str, package: str, archive_path: str, directories=DEFAULT_DIRECTORIES, directory: str = None):
+    """Stop the app and stream a tar of its data directories to archive_path.
+
+    The archive goes straight from `adb exec-out` into the file, so large
+    databases are never held in memory. A <archive>.json sidecar records the
+    package, versionCode and captured directories. directory is the app's
+    data directory (looked up with dumpsys when not given).
+    """
+    started = time.monotonic()
+    method = access_method(serial, package)
+    directory = directory or data_dir(serial, package)
+    adb_client.shell(f"am force-stop {shlex.quote(package)}", serial, timeout=30)
+
+    listing = adb_client.shell(_wrap(method, package, directory, 'ls -1'), serial, timeout=30).split()
+    present = [d for d in directories if d in listing]
+    if not present:
+        raise RuntimeError(f"None of {', '.join(directories)} exist in the data directory of {package}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+    temp_path = f"{archive_path}.part"
+    command = _wrap(method, package, directory, _with_status(f"tar -cf - {' '.join(shlex.quote(d) for d in present)}"))
+    try:
+        with open(temp_path, 'wb') as archive:
+            result = subprocess.run(adb_client.adb_args(['exec-out', command], serial),
+                                    stdout=archive, stderr=subprocess.PIPE, timeout=600)
+        if result.returncode != 0:
+            raise RuntimeError(f"adb exec-out failed: {result.stderr.decode(errors='replace').strip()}")
+        # A partial archive (unreadable file, run-as denial) shows up only in tar's exit status
+        _check_status(serial, method, package, directory, "tar", result.stderr)
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    state = install_manager.installed_state(serial, package) or {}
+    metadata = {
+        'package': package,
+        'version_code': state.get('version_code'),
+        'directories': present,
+        'method': method,
+        'serial': serial,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'bytes': os.path.getsize(archive_path),
+    }
+    with open(f"{archive_path}.json", 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return dict(metadata, archive=archive_path, seconds=round(time.monotonic() - started, 3))
+
+
+def restore(serial: str, package: str, archive_path: str, directory: str = None):
+    """Stop the app, replace its captured data directories with the archive's and fix ownership.
+
+    Directories the snapshot did not capture are left alone. directory is
+    the app's data directory (looked up with dumpsys when not given).
+    """
+    started = time.monotonic()
+    try:
+        with open(f"{archive_path}.json", 'r') as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        metadata = {'directories': list(DEFAULT_DIRECTORIES)}
+    method = access_method(serial, package)
+    directory = directory or data_dir(serial, package)
+    warnings = []
+    state = install_manager.installed_state(serial, package)
+    if state is None:
+        raise RuntimeError(f"{package} is not installed")
+    if metadata.get('version_code') not in (None, state['version_code']):
+        warnings.append(f"Snapshot was taken from versionCode {metadata['version_code']}, "
+                        f"installed is {state['version_code']}")
+
+    adb_client.shell(f"am force-stop {shlex.quote(package)}", serial, timeout=30)
+    remove = f"rm -rf {' '.join(shlex.quote(d) for d in metadata['directories'])}"
+    extract = f"{remove} && tar -xf -"
+    if method == 'root':
+        # Files extracted as root must go back to the app's uid and SELinux label
+        extract += f" && chown -R $(stat -c %u:%g .) . && restorecon -R {shlex.quote(directory)}"
+    with open(archive_path, 'rb') as archive:
+        result = subprocess.run(adb_client.adb_args(['exec-in', _wrap(method, package, directory, _with_status(extract))], serial),
+                                stdin=archive, capture_output=True, timeout=600)
+    if result.returncode != 0:
+        raise RuntimeError(f"Restoring {package} failed: {result.stderr.decode(errors='replace').strip()}")
+    _check_status(serial, method, package, directory, f"Restoring {package}", result.stderr)
+    return {
+        'package': package,
+        'archive': archive_path,
+        'directories': metadata['directories'],
+        'method': method,
+        'seconds': round(time.monotonic() - started, 3),
+        'warnings': warnings,
+    }
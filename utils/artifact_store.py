@@ -0,0 +1,191 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from PIL import Image
+from utils import config_loader
+
+_current_step = None
+
+
+def set_current_step(step):
+    """Record which test step artifacts stored from now on belong to"""
+    global _current_step
+    _current_step = step
+
+
+def current_step():
+    return _current_step
+
+
+def dhash(image):
+    """64-bit difference hash of a PIL image (similar images get hashes a few bits apart)"""
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _hamming(values, target: int):
+    """Bit distance between each uint64 in values and target"""
+    xor = np.bitwise_xor(values, np.uint64(target))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class ArtifactStore:
+    """Content-addressed store for screenshots and other binary artifacts.
+
+    Each unique blob is kept once under objects/<sha256[:2]>/<sha256><ext>.
+    The requested file path becomes a hard link to the object (or a copy
+    where links are not supported). Every reference is appended to
+    manifest.jsonl together with the step that produced it. With
+    near_duplicate_distance > 0, an image whose difference hash is within that
+    many bits of an already stored image is linked to the stored image instead.
+    """
+
+    def __init__(self, root: str = None, near_duplicate_distance: int = 0):
+        self.root = root or config_loader.get_reports_dir('artifacts')
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.manifest_path = os.path.join(self.root, 'manifest.jsonl')
+        self.near_duplicate_distance = near_duplicate_distance
+        self._lock = threading.Lock()
+        self._hashes = []
+        self._hash_objects = []
+        self._hash_array = None
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._load_hash_index()
+
+    def configure(self, near_duplicate_distance: int = None):
+        if near_duplicate_distance is not None:
+            self.near_duplicate_distance = int(near_duplicate_distance)
+
+    def _load_hash_index(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        seen = set()
+        with open(self.manifest_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('dhash') and record['object'] not in seen and not record.get('duplicate'):
+                    seen.add(record['object'])
+                    self._hashes.append(int(record['dhash'], 16))
+                    self._hash_objects.append(record['object'])
+
+    def object_path(self, digest: str, ext: str = '.png'):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def _find_near_duplicate(self, image_hash: int):
+        if self.near_duplicate_distance <= 0 or not self._hashes:
+            return None
+        if self._hash_array is None or len(self._hash_array) != len(self._hashes):
+            self._hash_array = np.array(self._hashes, dtype=np.uint64)
+        distances = _hamming(self._hash_array, image_hash)
+        best = int(np.argmin(distances))
+        if distances[best] <= self.near_duplicate_distance:
+            return self._hash_objects[best], int(distances[best])
+        return None
+
+    def put_bytes(self, data: bytes, filepath: str, ext: str = '.png', step=None, digest: str = None):
+        """Store a blob and link filepath to it; returns the manifest record"""
+        return self._put(digest or hashlib.sha256(data).hexdigest(), lambda: data, filepath, ext, step)
+
+    def put_png(self, png_bytes: bytes, filepath: str, step=None):
+        """Store PNG data, computing a perceptual hash when near-duplicate matching is on"""
+        image_hash = None
+        if self.near_duplicate_distance > 0:
+            image_hash = dhash(Image.open(io.BytesIO(png_bytes)))
+        return self._put(hashlib.sha256(png_bytes).hexdigest(), lambda: png_bytes, filepath, '.png', step, image_hash)
+
+    def put_frame(self, frame, filepath: str, step=None):
+        """Store a RawFrame keyed by its pixel hash; PNG encoding is skipped for known frames"""
+        image_hash = dhash(frame.to_image()) if self.near_duplicate_distance > 0 else None
+        return self._put(frame.digest(), frame.encode_png, filepath, '.png', step, image_hash)
+
+    def _put(self, digest: str, load, filepath: str, ext: str, step, image_hash: int = None):
+        object_path = self.object_path(digest, ext)
+        duplicate = 'exact' if os.path.exists(object_path) else None
+        if duplicate is None and image_hash is not None:
+            with self._lock:
+                near = self._find_near_duplicate(image_hash)
+            if near:
+                object_path, distance = near
+                duplicate = f'near:{distance}'
+        if duplicate is None:
+            # Encoding happens outside the lock; concurrent writers of the same object replace it atomically
+            self._write_object(object_path, load())
+            if image_hash is not None:
+                with self._lock:
+                    self._hashes.append(image_hash)
+                    self._hash_objects.append(object_path)
+
+        self._link(object_path, filepath)
+        record = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'step': step,
+            'path': os.path.abspath(filepath),
+            'object': object_path,
+            'sha256': digest,
+            'dhash': None if image_hash is None else f'{image_hash:016x}',
+            'duplicate': duplicate,
+        }
+        with self._lock:
+            with open(self.manifest_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
+
+    def _write_object(self, object_path: str, data: bytes):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, object_path)
+
+    def _link(self, object_path: str, filepath: str):
+        """Point filepath at the object without ever writing through an existing link"""
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(filepath) and os.path.samefile(object_path, filepath):
+            return
+        temp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        try:
+            os.link(object_path, temp_path)
+        except OSError:
+            shutil.copyfile(object_path, temp_path)
+        os.replace(temp_path, filepath)
+
+    def stats(self):
+        """Number of references, how many were duplicates and the bytes deduplication saved"""
+        references = duplicates = saved_bytes = 0
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    references += 1
+                    if record.get('duplicate') and os.path.exists(record['object']):
+                        duplicates += 1
+                        saved_bytes += os.path.getsize(record['object'])
+        return {'references': references, 'duplicates': duplicates, 'saved_bytes': saved_bytes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Get the shared artifact store under reports/artifacts, creating it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,68 @@
+import threading
+import time
+from utils import step_timing
+
+
+class Cancelled(Exception):
+    """Raised inside a run once it was stopped or ran out of time"""
+
+
+class CancellationToken:
+    """Cooperative stop signal for one test run, settable from any thread"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason: str = "Stopped by user"):
+        """Request the run to stop; the first reason given is kept"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None):
+        """Block up to timeout seconds; returns True if the token was cancelled"""
+        return self._event.wait(timeout)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+
+# Token of the run in progress, so actions can honour it without passing it around
+_current = None
+
+
+def set_current(token: CancellationToken = None):
+    global _current
+    _current = token
+
+
+def current():
+    return _current
+
+
+def check():
+    """Raise Cancelled if the current run was cancelled"""
+    if _current is not None:
+        _current.check()
+
+
+def sleep(seconds: float):
+    """time.sleep that ends early, raising Cancelled, when the current run is cancelled.
+
+    The time slept counts as sleep time in the current step's breakdown.
+    """
+    token = _current
+    started = time.monotonic()
+    try:
+        if token is None:
+            time.sleep(seconds)
+        elif token.wait(max(0.0, float(seconds))):
+            raise Cancelled(token.reason)
+    finally:
+        step_timing.record_sleep(time.monotonic() - started, started)
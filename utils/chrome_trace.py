@@ -0,0 +1,169 @@
+import contextlib
+import json
+import re
+import subprocess
+import threading
+import time
+from utils import adb_client
+
+# Trace process ids: the runner on the host, and the device's counters and logcat markers
+HOST_PID = 1
+DEVICE_PID = 2
+# logcat filterspecs followed by default: activity launches and crashes
+DEFAULT_LOGCAT_FILTERS = ('ActivityTaskManager:I', 'ActivityManager:I', 'AndroidRuntime:E')
+
+_LOGCAT_RE = re.compile(r'^\s*(\d+\.\d+)\s+(\d+)\s+(\d+)\s+([VDIWEF])\s+(.*?)\s*: (.*)$')
+
+_current = None
+
+
+class TraceWriter:
+    """Streams Chrome Trace Event JSON (array format) to a file as events happen.
+
+    Events are appended under a lock and never kept in memory, so soak runs
+    of any length cost only disk. The array is closed by close(); a file
+    cut short by a crash still opens in Perfetto and chrome://tracing, which
+    accept an unterminated array. Timestamps are microseconds since origin
+    (a time.monotonic() value, by default when the writer was created).
+    """
+
+    def __init__(self, path: str, origin: float = None):
+        self.path = path
+        self.origin = time.monotonic() if origin is None else origin
+        self.events = 0
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[')
+        self._write({'ph': 'M', 'name': 'process_name', 'pid': HOST_PID, 'tid': 0, 'args': {'name': 'Test runner'}})
+        self._write({'ph': 'M', 'name': 'process_name', 'pid': DEVICE_PID, 'tid': 0, 'args': {'name': 'Device'}})
+
+    def _ts(self, monotonic_time: float):
+        return round((monotonic_time - self.origin) * 1e6, 1)
+
+    def _write(self, event: dict):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(f"{',' if self.events else ''}\n{line}")
+            self.events += 1
+
+    def _tid(self):
+        """Current thread id, announcing the thread's name the first time it is seen"""
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self._write({'ph': 'M', 'name': 'thread_name', 'pid': HOST_PID, 'tid': tid,
+                         'args': {'name': threading.current_thread().name}})
+        return tid
+
+    def complete(self, name: str, category: str, start: float, end: float, **args):
+        """A finished span on the calling thread, from monotonic start to end"""
+        self._write({'ph': 'X', 'name': name, 'cat': category, 'pid': HOST_PID, 'tid': self._tid(),
+                     'ts': self._ts(start), 'dur': round(max(end - start, 0.0) * 1e6, 1), 'args': args})
+
+    def instant(self, name: str, category: str, when: float = None, pid: int = HOST_PID, **args):
+        self._write({'ph': 'i', 's': 'p', 'name': name, 'cat': category, 'pid': pid,
+                     'tid': self._tid() if pid == HOST_PID else 0,
+                     'ts': self._ts(time.monotonic() if when is None else when), 'args': args})
+
+    def counter(self, name: str, values: dict, when: float = None):
+        """A sample of a device counter track; None values are left out"""
+        values = {key: value for key, value in values.items() if value is not None}
+        if values:
+            self._write({'ph': 'C', 'name': name, 'pid': DEVICE_PID, 'tid': 0,
+                         'ts': self._ts(time.monotonic() if when is None else when), 'args': values})
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write('\n]\n')
+            self._file.close()
+            self._file = None
+
+
+class LogcatMarkers:
+    """Follows logcat in the background and adds matching lines as instant events.
+
+    Device timestamps are mapped onto the trace clock with the offset
+    between the device's epoch time and the host's monotonic clock,
+    measured once at start.
+    """
+
+    def __init__(self, writer: TraceWriter, serial: str = None, filters=DEFAULT_LOGCAT_FILTERS, pattern: str = None):
+        self.writer = writer
+        self.serial = serial
+        self.filters = list(filters)
+        self.pattern = re.compile(pattern) if pattern else None
+        self._process = None
+        self._thread = None
+
+    def start(self):
+        before = time.monotonic()
+        device_now = float(adb_client.shell('date +%s.%N', self.serial, timeout=15).strip())
+        self._offset = device_now - (before + time.monotonic()) / 2
+        self._process = subprocess.Popen(
+            adb_client.adb_args(['logcat', '-v', 'epoch', '-T', f"{device_now:.3f}", *self.filters, '*:S'], self.serial),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors='replace')
+        self._thread = threading.Thread(target=self._run, name="trace-logcat", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        for line in self._process.stdout:
+            match = _LOGCAT_RE.match(line)
+            if not match:
+                continue
+            device_time, pid, tid, level, tag, message = match.groups()
+            if self.pattern and not self.pattern.search(message):
+                continue
+            self.writer.instant(f"{tag}: {message[:80]}", 'logcat', float(device_time) - self._offset, pid=DEVICE_PID,
+                                level=level, tag=tag, message=message, device_pid=int(pid), device_tid=int(tid))
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._thread.join(timeout=5)
+
+
+def set_current(writer: TraceWriter = None):
+    global _current
+    _current = writer
+
+
+def current():
+    return _current
+
+
+def complete(name: str, category: str, start: float, end: float, **args):
+    """Record a finished span in the current trace, if one is being written"""
+    writer = _current
+    if writer is not None:
+        writer.complete(name, category, start, end, **args)
+
+
+def counter(name: str, values: dict, when: float = None):
+    writer = _current
+    if writer is not None:
+        writer.counter(name, values, when)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str, **args):
+    """Record the enclosed block as a span in the current trace"""
+    writer = _current
+    if writer is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        writer.complete(name, category, started, time.monotonic(), **args)
@@ -54,4 +54,11 @@ def create_default_capabilities():
         return True
     except Exception as e:
         print(f"Failed to create capabilities file: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def get_reports_dir(*subdirs):
+    """Get the project reports directory (or a subdirectory of it), creating it if needed"""
+    config_dir = os.path.dirname(__file__)
+    reports_dir = os.path.normpath(os.path.join(config_dir, '..', 'reports', *subdirs))
+    os.makedirs(reports_dir, exist_ok=True)
+    return reports_dir
@@ -0,0 +1,174 @@
+import re
+
+# Each field spec is: name -> (marker, regex, converter)
+# - marker is a literal substring used to filter lines on the device (grep -F)
+# - regex extracts the value from a matching line (group 1, or presence if no group)
+# - converter turns the captured string into a typed value
+
+
+def _bool(value):
+    return value.strip().lower() in ('true', 'enabled', 'on', '1')
+
+
+def _tenths(value):
+    return int(value) / 10.0
+
+
+BATTERY_FIELDS = {
+    'ac_powered': ('AC powered:', re.compile(r'AC powered:\s*(\w+)'), _bool),
+    'usb_powered': ('USB powered:', re.compile(r'USB powered:\s*(\w+)'), _bool),
+    'wireless_powered': ('Wireless powered:', re.compile(r'Wireless powered:\s*(\w+)'), _bool),
+    'status': ('status:', re.compile(r'^\s*status:\s*(\d+)'), int),
+    'health': ('health:', re.compile(r'^\s*health:\s*(\d+)'), int),
+    'present': ('present:', re.compile(r'^\s*present:\s*(\w+)'), _bool),
+    'level': ('level:', re.compile(r'^\s*level:\s*(\d+)'), int),
+    'scale': ('scale:', re.compile(r'^\s*scale:\s*(\d+)'), int),
+    'voltage_mv': ('voltage:', re.compile(r'^\s*voltage:\s*(\d+)'), int),
+    'temperature_c': ('temperature:', re.compile(r'^\s*temperature:\s*(-?\d+)'), _tenths),
+    'technology': ('technology:', re.compile(r'^\s*technology:\s*(\S+)'), str),
+}
+
+CONNECTIVITY_FIELDS = {
+    'default_network_id': ('Active default network:', re.compile(r'Active default network:\s*(\d+)'), int),
+    'transports': ('Transports:', re.compile(r'Transports:\s*([A-Z_|]+)'), lambda v: v.split('|')),
+    'validated': ('VALIDATED', re.compile(r'Capabilities:[^\]]*\bVALIDATED\b'), None),
+    'link_down_kbps': ('LinkDnBandwidth', re.compile(r'LinkDnBandwidth>=(\d+)Kbps'), int),
+    'link_up_kbps': ('LinkUpBandwidth', re.compile(r'LinkUpBandwidth>=(\d+)Kbps'), int),
+}
+
+WIFI_FIELDS = {
+    'enabled': ('Wi-Fi is ', re.compile(r'Wi-Fi is (enabled|disabled)'), _bool),
+    'ssid': ('mWifiInfo', re.compile(r'mWifiInfo SSID:\s*"?([^",]*)"?,'), str),
+    'bssid': ('mWifiInfo', re.compile(r'mWifiInfo .*?BSSID:\s*([0-9a-fA-F:]{17})'), str),
+    'supplicant_state': ('mWifiInfo', re.compile(r'mWifiInfo .*?Supplicant state:\s*(\w+)'), str),
+    'rssi_dbm': ('mWifiInfo', re.compile(r'mWifiInfo .*?RSSI:\s*(-?\d+)'), int),
+    'link_speed_mbps': ('mWifiInfo', re.compile(r'mWifiInfo .*?Link speed:\s*(\d+)Mbps'), int),
+    'frequency_mhz': ('mWifiInfo', re.compile(r'mWifiInfo .*?Frequency:\s*(\d+)MHz'), int),
+}
+
+BLUETOOTH_FIELDS = {
+    'enabled': ('enabled:', re.compile(r'^\s*enabled:\s*(\w+)'), _bool),
+    'state': ('state:', re.compile(r'^\s*state:\s*(\w+)'), str),
+    'address': ('address:', re.compile(r'^\s*address:\s*([0-9A-Fa-f:]{17})'), str),
+    'name': ('name:', re.compile(r'^\s*name:\s*(.+?)\s*$'), str),
+}
+
+DISKSTATS_FIELDS = {
+    'data_free_kb': ('Data-Free:', re.compile(r'Data-Free:\s*(\d+)K'), int),
+    'data_total_kb': ('Data-Free:', re.compile(r'Data-Free:\s*\d+K\s*/\s*(\d+)K'), int),
+    'data_free_percent': ('Data-Free:', re.compile(r'Data-Free:.*=\s*(\d+)%'), int),
+    'system_free_kb': ('System-Free:', re.compile(r'System-Free:\s*(\d+)K'), int),
+    'system_total_kb': ('System-Free:', re.compile(r'System-Free:\s*\d+K\s*/\s*(\d+)K'), int),
+    'cache_free_kb': ('Cache-Free:', re.compile(r'Cache-Free:\s*(\d+)K'), int),
+}
+
+MEMINFO_FIELDS = {
+    'java_heap_kb': ('Java Heap:', re.compile(r'Java Heap:\s*(\d+)'), int),
+    'native_heap_kb': ('Native Heap:', re.compile(r'Native Heap:\s*(\d+)'), int),
+    'code_kb': ('Code:', re.compile(r'^\s*Code:\s*(\d+)'), int),
+    'graphics_kb': ('Graphics:', re.compile(r'^\s*Graphics:\s*(\d+)'), int),
+    'total_pss_kb': ('TOTAL', re.compile(r'TOTAL(?: PSS)?:\s*(\d+)'), int),
+}
+
+THERMAL_FIELDS = {
+    'thermal_status': ('Thermal Status:', re.compile(r'Thermal Status:\s*(\d+)'), int),
+}
+
+# service key -> (dumpsys service name, field spec)
+SERVICES = {
+    'battery': ('battery', BATTERY_FIELDS),
+    'connectivity': ('connectivity', CONNECTIVITY_FIELDS),
+    'wifi': ('wifi', WIFI_FIELDS),
+    'bluetooth': ('bluetooth_manager', BLUETOOTH_FIELDS),
+    'diskstats': ('diskstats', DISKSTATS_FIELDS),
+    'meminfo': ('meminfo', MEMINFO_FIELDS),
+    'thermal': ('thermalservice', THERMAL_FIELDS),
+}
+
+
+def iter_lines(text):
+    """Yield lines from a string without building a list of all lines"""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find('\n', start)
+        if end == -1:
+            end = length
+        yield text[start:end]
+        start = end + 1
+
+
+def select_fields(spec: dict, fields=None):
+    """Return the requested subset of a field spec, validating names"""
+    if not fields:
+        return spec
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in spec]
+    if unknown:
+        raise ValueError(f"Unknown field(s) {unknown}. Available: {', '.join(spec.keys())}")
+    return {name: spec[name] for name in fields}
+
+
+def parse_fields(output, spec: dict, fields=None):
+    """Extract typed values from dumpsys output.
+
+    Scanning stops as soon as every requested field has been found, so only
+    the leading part of a large dump is ever examined. Fields that are not
+    present in the output are returned as None.
+    """
+    selected = select_fields(spec, fields)
+    result = {name: None for name in selected}
+    pending = dict(selected)
+
+    lines = iter_lines(output) if isinstance(output, str) else output
+    for line in lines:
+        for name, (marker, pattern, converter) in list(pending.items()):
+            if marker not in line:
+                continue
+            match = pattern.search(line)
+            if not match:
+                continue
+            if converter is None:
+                result[name] = True
+            else:
+                try:
+                    result[name] = converter(match.group(1))
+                except (ValueError, IndexError):
+                    continue
+            del pending[name]
+        if not pending:
+            break
+
+    # Presence-only fields that never matched are definitively False
+    for name, (_, _, converter) in selected.items():
+        if converter is None and result[name] is None:
+            result[name] = False
+    return result
+
+
+def build_command(service: str, spec: dict, fields=None, args: str = ''):
+    """Build a dumpsys command that only sends lines relevant to the requested fields.
+
+    grep exits 1 when nothing matches (a missing service, or a process that
+    has died), and `mobile: shell` raises on a non-zero exit, so the command
+    always exits 0 and missing fields come back as None.
+    """
+    selected = select_fields(spec, fields)
+    markers = []
+    for marker, _, _ in selected.values():
+        if marker not in markers:
+            markers.append(marker)
+    grep_args = ' '.join(f"-e '{m}'" for m in markers)
+    command = f"dumpsys {service} {args}".strip()
+    return f"{command} | grep -F {grep_args} || true"
+
+
+def query_dumpsys(driver, service_key: str, fields=None, args: str = ''):
+    """Run a filtered dumpsys on the device and return the parsed typed fields"""
+    if service_key not in SERVICES:
+        raise ValueError(f"Unknown dumpsys service '{service_key}'. Available: {', '.join(SERVICES.keys())}")
+    service, spec = SERVICES[service_key]
+    command = build_command(service, spec, fields, args)
+    output = driver.execute_script('mobile: shell', {'command': command}) or ''
+    return parse_fields(output, spec, fields)
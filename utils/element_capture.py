@@ -0,0 +1,115 @@
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from PIL import ImageColor
+from utils import screencap
+from utils.screencap import RawFrame
+
+_BOUNDS_RE = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+
+# selector type -> page source attribute matched exactly
+_ATTRIBUTE_SELECTORS = {
+    'ID': 'resource-id',
+    'ACCESSIBILITY_ID': 'content-desc',
+    'TEXT': 'text',
+    'CLASS_NAME': 'class',
+}
+
+
+def parse_bounds(value: str):
+    """'[x1,y1][x2,y2]' -> (x, y, width, height)"""
+    match = _BOUNDS_RE.match(value or '')
+    if not match:
+        return None
+    x1, y1, x2, y2 = (int(v) for v in match.groups())
+    return x1, y1, x2 - x1, y2 - y1
+
+
+class ScreenSnapshot:
+    """One page source and one screen capture, used to serve any number of element crops.
+
+    Element bounds are looked up in the page source hierarchy, so cropping
+    N elements costs two device round trips instead of N screenshots. The
+    capture is taken on first use (when a bound is first mapped to pixels),
+    so polling for an element only reads the page source, and the pixels
+    are taken once the element is there.
+    """
+
+    def __init__(self, page_source: str, frame: RawFrame = None, capture=None):
+        self.root = ET.fromstring(page_source.encode('utf-8'))
+        self._frame = frame
+        self._capture = capture
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self._capture()
+        return self._frame
+
+    @property
+    def scale(self):
+        # The hierarchy may be in different units than the capture (e.g. scaled screenshots)
+        width = int(self.root.get('width') or 0)
+        return self.frame.width / width if width else 1.0
+
+    def find_bounds(self, selector_type: str, selector_value: str):
+        """Bounds of the first matching node in capture pixels, or None.
+
+        Raises ValueError for selectors that cannot be resolved from the page source.
+        """
+        selector_type = selector_type.upper()
+        node = None
+        if selector_type in _ATTRIBUTE_SELECTORS:
+            attribute = _ATTRIBUTE_SELECTORS[selector_type]
+            node = next((n for n in self.root.iter() if n.get(attribute) == selector_value), None)
+            if node is None and selector_type == 'CLASS_NAME':
+                node = next(self.root.iter(selector_value), None)
+        elif selector_type == 'XPATH':
+            path = '.' + selector_value if selector_value.startswith('/') else selector_value
+            try:
+                node = self.root.find(path)
+            except SyntaxError as e:
+                raise ValueError(f"XPath not supported for local lookup: {e}")
+        else:
+            raise ValueError(f"Selector type '{selector_type}' cannot be resolved from the page source")
+        if node is None:
+            return None
+        bounds = parse_bounds(node.get('bounds'))
+        return self.to_frame(bounds) if bounds else None
+
+    def to_frame(self, bounds):
+        """Clip (x, y, width, height) hierarchy bounds to capture pixels"""
+        x, y, width, height = (int(round(v * self.scale)) for v in bounds)
+        x, y = max(x, 0), max(y, 0)
+        width = min(width, self.frame.width - x)
+        height = min(height, self.frame.height - y)
+        return (x, y, width, height) if width > 0 and height > 0 else None
+
+    def crop(self, bounds):
+        """RawFrame of a region of the capture"""
+        x, y, width, height = bounds
+        pixels = np.ascontiguousarray(self.frame.pixels[y:y + height, x:x + width])
+        return RawFrame(pixels, width, height)
+
+    def highlight(self, bounds, color: str = 'red', thickness: int = None):
+        """Copy of the capture with a rectangle drawn around bounds"""
+        x, y, width, height = bounds
+        rgb = ImageColor.getrgb(color)[:3]
+        thickness = thickness or max(3, self.frame.width // 240)
+        pixels = np.array(self.frame.pixels)
+        bottom, right = y + height, x + width
+        for top_edge, bottom_edge, left_edge, right_edge in (
+                (y, y + thickness, x, right), (bottom - thickness, bottom, x, right),
+                (y, bottom, x, x + thickness), (y, bottom, right - thickness, right)):
+            pixels[max(top_edge, 0):bottom_edge, max(left_edge, 0):right_edge, :3] = rgb
+        return RawFrame(pixels, self.frame.width, self.frame.height)
+
+
+def snapshot(driver, capture_backend: str = 'appium'):
+    """A fresh snapshot of the current screen.
+
+    Snapshots are not kept across calls: pixels can change without the
+    hierarchy changing (images loading, video, animations), so callers share
+    one only within a single action.
+    """
+    return ScreenSnapshot(driver.page_source, capture=lambda: screencap.capture_frame(driver, capture_backend))
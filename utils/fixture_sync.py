@@ -0,0 +1,167 @@
+import hashlib
+import os
+import posixpath
+import shlex
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import adb_client, adb_sync
+
+DEFAULT_WORKERS = 4
+# Keep batched shell command lines well under the device's argument length limit
+MAX_COMMAND_LENGTH = 8000
+
+
+def local_tree(local_dir: str):
+    """{relative posix path: (size, mtime)} of every file under local_dir"""
+    files = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            file_stat = os.stat(path)
+            files[relative] = (file_stat.st_size, int(file_stat.st_mtime))
+    return files
+
+
+def remote_tree(sync: adb_sync.SyncConnection, remote_dir: str):
+    """{relative posix path: (size, mtime)} of every file under remote_dir (empty if it does not exist)"""
+    files = {}
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        for name, mode, size, mtime in sync.list(posixpath.join(remote_dir, relative_dir)):
+            relative = posixpath.join(relative_dir, name) if relative_dir else name
+            if stat.S_ISDIR(mode):
+                pending.append(relative)
+            elif stat.S_ISREG(mode):
+                files[relative] = (size, mtime)
+    return files
+
+
+def _batches(arguments, prefix_length: int):
+    """Split shell arguments into groups that fit in one command line"""
+    batch, length = [], prefix_length
+    for argument in arguments:
+        if batch and length + len(argument) + 1 > MAX_COMMAND_LENGTH:
+            yield batch
+            batch, length = [], prefix_length
+        batch.append(argument)
+        length += len(argument) + 1
+    if batch:
+        yield batch
+
+
+def remote_md5(serial: str, remote_dir: str, relative_paths):
+    """{relative path: md5} from batched `md5sum` runs on the device"""
+    hashes = {}
+    prefix = f"cd {shlex.quote(remote_dir)} && md5sum"
+    for batch in _batches([shlex.quote(p) for p in relative_paths], len(prefix)):
+        output = adb_client.shell(f"{prefix} {' '.join(batch)}", serial, timeout=300)
+        for line in output.splitlines():
+            parts = line.strip().split(None, 1)
+            if len(parts) == 2 and len(parts[0]) == 32:
+                hashes[parts[1].lstrip('*')] = parts[0]
+    return hashes
+
+
+def touch_mtimes(serial: str, remote_dir: str, mtimes: dict):
+    """Set remote file mtimes ({relative path: epoch seconds}) in batched shell commands"""
+    prefix = f"cd {shlex.quote(remote_dir)}"
+    commands = [f"touch -m -d @{mtime} {shlex.quote(path)}" for path, mtime in mtimes.items()]
+    for batch in _batches(commands, len(prefix)):
+        adb_client.shell(f"{prefix} && {'; '.join(batch)}", serial, timeout=120)
+
+
+def local_md5(path: str):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def sync_directory(local_dir: str, remote_dir: str, serial: str = None, delete_stale: bool = False,
+                   max_workers: int = DEFAULT_WORKERS, dry_run: bool = False):
+    """Make remote_dir match local_dir, transferring only files that changed.
+
+    A file with the same size and mtime on both sides is skipped without
+    reading it. Pushes set the remote mtime to the local one, so after the
+    first sync that check settles almost every file. Files with the same
+    size but a different mtime are compared by md5, computed on the device
+    in batches and locally in parallel; matches get the local mtime so
+    they are not hashed again. Changed files are pushed
+    concurrently, each worker over its own sync connection. With
+    delete_stale, remote files that do not exist locally are removed.
+    """
+    started = time.monotonic()
+    if not os.path.isdir(local_dir):
+        raise ValueError(f"Local directory not found: {local_dir}")
+    remote_dir = remote_dir.rstrip('/') or '/'
+    local_files = local_tree(local_dir)
+    with adb_sync.SyncConnection(serial) as sync:
+        remote_files = remote_tree(sync, remote_dir)
+
+    changed, check_hash = [], []
+    for relative, (size, mtime) in local_files.items():
+        remote = remote_files.get(relative)
+        if remote is None or remote[0] != size:
+            changed.append(relative)
+        elif remote[1] != mtime:
+            check_hash.append(relative)
+    stale = sorted(set(remote_files) - set(local_files)) if delete_stale else []
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="fixture-sync") as executor:
+        if check_hash:
+            local_hashes = executor.map(lambda r: local_md5(os.path.join(local_dir, r)), check_hash)
+            remote_hashes = remote_md5(serial, remote_dir, check_hash)
+            matching = []
+            for relative, digest in zip(check_hash, local_hashes):
+                (matching if remote_hashes.get(relative) == digest else changed).append(relative)
+            if matching and not dry_run:
+                # Same content: copy the local mtime over so the next sync skips hashing them
+                touch_mtimes(serial, remote_dir, {r: local_files[r][1] for r in matching})
+
+        transferred_bytes = 0
+        if changed and not dry_run:
+            # Largest files first, dealt round-robin, so workers finish at about the same time
+            ordered = sorted(changed, key=lambda r: local_files[r][0], reverse=True)
+            workers = max(1, int(max_workers))
+            batches = [ordered[i::workers] for i in range(workers)]
+            futures = [executor.submit(_push_batch, serial, local_dir, remote_dir, batch) for batch in batches if batch]
+            for future in futures:
+                sent, batch_errors = future.result()
+                transferred_bytes += sent
+                errors += batch_errors
+
+    if stale and not dry_run:
+        prefix = f"cd {shlex.quote(remote_dir)} && rm -f"
+        for batch in _batches([shlex.quote(p) for p in stale], len(prefix)):
+            adb_client.shell(f"{prefix} {' '.join(batch)}", serial, timeout=120)
+
+    return {
+        'local_dir': local_dir,
+        'remote_dir': remote_dir,
+        'files': len(local_files),
+        'unchanged': len(local_files) - len(changed),
+        'transferred': sorted(changed),
+        'transferred_bytes': transferred_bytes,
+        'deleted': stale,
+        'hash_checked': len(check_hash),
+        'dry_run': dry_run,
+        'seconds': round(time.monotonic() - started, 3),
+        'errors': errors,
+    }
+
+
+def _push_batch(serial: str, local_dir: str, remote_dir: str, relative_paths):
+    """Push files over one sync connection; returns (bytes sent, errors)"""
+    sent, errors = 0, []
+    with adb_sync.SyncConnection(serial) as sync:
+        for relative in relative_paths:
+            try:
+                sent += sync.push(os.path.join(local_dir, relative), posixpath.join(remote_dir, relative))
+            except (adb_sync.AdbSyncError, OSError) as e:
+                errors.append(f"{relative}: {e}")
+    return sent, errors
@@ -0,0 +1,143 @@
+import re
+import numpy as np
+
+# Frames slower than this are reported as frozen (Android vitals definition)
+FROZEN_FRAME_MS = 700.0
+
+# Histogram bucket edges in milliseconds: fine-grained around the frame budget, coarse after
+HISTOGRAM_EDGES_MS = np.concatenate([np.arange(0, 34, 2), [40, 50, 75, 100, 150, 200, 300, 500, 700, 1000, np.inf]])
+
+_TOTAL_FRAMES_RE = re.compile(r'Total frames rendered:\s*(\d+)')
+_JANKY_FRAMES_RE = re.compile(r'Janky frames:\s*(\d+)')
+
+
+def reset(driver, package_name: str):
+    """Clear the app's collected frame statistics so a new capture window starts now"""
+    driver.execute_script('mobile: shell', {'command': f'dumpsys gfxinfo {package_name} reset'})
+
+
+def parse_profile_data(output: str):
+    """Extract the framestats table(s) from `dumpsys gfxinfo <pkg> framestats`.
+
+    Returns (columns, rows) where rows is an int64 array with one row per frame.
+    Tables from multiple windows are concatenated.
+    """
+    columns = None
+    rows = []
+    in_table = False
+    for line in (output or '').splitlines():
+        line = line.strip()
+        if line == '---PROFILEDATA---':
+            in_table = not in_table
+            continue
+        if not in_table or not line:
+            continue
+        if line.startswith('Flags'):
+            columns = [c for c in line.split(',') if c]
+            continue
+        values = [v for v in line.split(',') if v]
+        if columns and len(values) == len(columns):
+            rows.append(values)
+
+    if not columns or not rows:
+        return columns or [], np.empty((0, len(columns or [])), dtype=np.int64)
+    return columns, np.array(rows, dtype=np.int64)
+
+
+def _apply_reported_totals(result: dict, table_frames: int):
+    """Take janky_percent from gfxinfo's whole-window counters and flag a truncated table.
+
+    The framestats table only keeps the last 120 frames, so for longer
+    captures the percentiles and histogram describe only the tail, while the
+    reported counters cover the whole window.
+    """
+    total, janky = result.get('reported_total_frames'), result.get('reported_janky_frames')
+    if total:
+        result['truncated'] = table_frames < total
+    if total and janky is not None:
+        result['janky_percent'] = round(100.0 * janky / total, 2)
+        result['janky_percent_source'] = 'reported'
+    return result
+
+
+def analyze(columns: list, rows, reported_totals: dict = None):
+    """Compute frame time percentiles, jank counts and a histogram from framestats rows.
+
+    janky_percent comes from the reported whole-window totals when they are
+    given, and from the table otherwise (janky_percent_source says which).
+    """
+    result = {
+        'frames': 0,
+        'janky_frames': 0,
+        'janky_percent': 0.0,
+        'frozen_frames': 0,
+        'frame_budget_ms': None,
+        'percentiles_ms': {},
+        'histogram': {'edges_ms': [], 'counts': []},
+        'janky_percent_source': 'framestats',
+        'truncated': False,
+    }
+    if reported_totals:
+        result.update(reported_totals)
+    table_frames = 0 if rows is None else len(rows)
+    if table_frames == 0:
+        return _apply_reported_totals(result, table_frames)
+
+    col = {name: i for i, name in enumerate(columns)}
+    # Frames with non-zero flags (first draw, window changes) are not representative
+    valid = rows[rows[:, col['Flags']] == 0] if 'Flags' in col else rows
+    if len(valid) == 0:
+        return _apply_reported_totals(result, table_frames)
+
+    intended = valid[:, col['IntendedVsync']]
+    completed = valid[:, col['FrameCompleted']]
+    durations_ms = (completed - intended) / 1e6
+
+    # Estimate the vsync period from the spacing of consecutive frames
+    vsync_deltas_ms = np.diff(np.sort(intended)) / 1e6
+    vsync_deltas_ms = vsync_deltas_ms[vsync_deltas_ms > 1.0]
+    budget_ms = float(np.min(vsync_deltas_ms)) if len(vsync_deltas_ms) else 1000.0 / 60
+    budget_ms = min(max(budget_ms, 1000.0 / 144), 1000.0 / 30)
+
+    janky = int(np.count_nonzero(durations_ms > budget_ms))
+    counts, _ = np.histogram(durations_ms, bins=HISTOGRAM_EDGES_MS)
+    p50, p90, p95, p99 = np.percentile(durations_ms, [50, 90, 95, 99])
+
+    result.update({
+        'frames': int(len(durations_ms)),
+        'janky_frames': janky,
+        'janky_percent': round(100.0 * janky / len(durations_ms), 2),
+        'frozen_frames': int(np.count_nonzero(durations_ms > FROZEN_FRAME_MS)),
+        'frame_budget_ms': round(budget_ms, 3),
+        'percentiles_ms': {
+            'p50': round(float(p50), 3),
+            'p90': round(float(p90), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(np.max(durations_ms)), 3),
+        },
+        'histogram': {
+            'edges_ms': [float(e) for e in HISTOGRAM_EDGES_MS[:-1]],
+            'counts': counts.tolist(),
+        },
+    })
+    return _apply_reported_totals(result, table_frames)
+
+
+def parse_reported_totals(output: str):
+    """Read the summary counters gfxinfo keeps for the whole capture window"""
+    totals = {}
+    match = _TOTAL_FRAMES_RE.search(output or '')
+    if match:
+        totals['reported_total_frames'] = int(match.group(1))
+    match = _JANKY_FRAMES_RE.search(output or '')
+    if match:
+        totals['reported_janky_frames'] = int(match.group(1))
+    return totals
+
+
+def collect(driver, package_name: str):
+    """Read framestats for a package and return the analyzed frame timing summary"""
+    output = driver.execute_script('mobile: shell', {'command': f'dumpsys gfxinfo {package_name} framestats'})
+    columns, rows = parse_profile_data(output)
+    return analyze(columns, rows, parse_reported_totals(output))
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+import numpy as np
+from PIL import Image
+from utils import cancellation, screencap
+
+TEMPLATES_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'data', 'templates'))
+
+DEFAULT_THRESHOLD = 0.85
+# Template scales tried relative to its stored size, for screens of other densities
+DEFAULT_SCALES = (0.5, 0.625, 0.75, 0.875, 1.0, 1.25, 1.5, 1.75, 2.0)
+# Coarse search runs on the screen downsampled so it is about this wide
+COARSE_WIDTH = 360
+
+_pyramids = {}
+_last_matches = {}
+_backends = {}
+_lock = threading.Lock()
+
+
+class Match:
+    """Location of a template on screen, in screen pixels"""
+
+    def __init__(self, x: int, y: int, width: int, height: int, score: float, scale: float):
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.score = score
+        self.scale = scale
+
+    @property
+    def center(self):
+        return self.x + self.width // 2, self.y + self.height // 2
+
+    def to_dict(self):
+        return {'x': self.x, 'y': self.y, 'width': self.width, 'height': self.height,
+                'center': list(self.center), 'score': round(self.score, 4), 'scale': self.scale}
+
+
+def resolve_template(path: str):
+    """Template path as given, or relative to data/templates/"""
+    if os.path.isabs(path) or os.path.exists(path):
+        return path
+    return os.path.join(TEMPLATES_DIR, path)
+
+
+def _fast_length(n: int):
+    """Smallest length >= n with only 2, 3 and 5 as prime factors (fast FFT sizes)"""
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+def gray_image(pixels):
+    """8-bit grayscale PIL image of (height, width, 4) RGBA pixels"""
+    height, width = pixels.shape[:2]
+    if pixels.flags.c_contiguous:
+        image = Image.frombuffer('RGBA', (width, height), pixels.data, 'raw', 'RGBA', 0, 1)
+    else:
+        image = Image.fromarray(np.ascontiguousarray(pixels), 'RGBA')
+    return image.convert('L')
+
+
+class _Pyramid:
+    """A template resized to every search scale, at full and coarse resolution, plus cached FFTs"""
+
+    def __init__(self, path: str, scales, factor: int):
+        with Image.open(path) as image:
+            image = image.convert('L')
+            self.levels = []
+            for scale in scales:
+                width, height = round(image.width * scale), round(image.height * scale)
+                if width < 2 * factor or height < 2 * factor:
+                    continue
+                resized = image.resize((width, height), Image.BILINEAR)
+                self.levels.append({
+                    'scale': scale,
+                    'full': np.asarray(resized, dtype=np.float64),
+                    'coarse': np.asarray(resized.reduce(factor) if factor > 1 else resized, dtype=np.float64),
+                    'fft': {},
+                })
+
+
+class _SearchImage:
+    """A grayscale search image with its FFT and integral images, shared by all template levels"""
+
+    def __init__(self, image):
+        self.image = image
+        self.fft_shape = tuple(_fast_length(n) for n in image.shape)
+        self.fft = np.fft.rfft2(image, s=self.fft_shape)
+        self.integral = self._integral(image)
+        self.integral_squares = self._integral(image ** 2)
+
+    @staticmethod
+    def _integral(image):
+        integral = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.float64)
+        np.cumsum(np.cumsum(image, axis=0), axis=1, out=integral[1:, 1:])
+        return integral
+
+    @staticmethod
+    def _window_sums(integral, height: int, width: int):
+        """Sums over every height x width window"""
+        return integral[height:, width:] - integral[:-height, width:] - integral[height:, :-width] + integral[:-height, :-width]
+
+    def ncc(self, level: dict, key: str):
+        """Normalized cross-correlation of a template level at every valid position"""
+        template = level[key]
+        height, width = template.shape
+        if self.image.shape[0] < height or self.image.shape[1] < width:
+            return None
+        template_fft, template_norm = _template_fft(level, key, self.fft_shape)
+        correlation = np.fft.irfft2(self.fft * template_fft, s=self.fft_shape)
+        correlation = correlation[:self.image.shape[0] - height + 1, :self.image.shape[1] - width + 1]
+
+        sums = self._window_sums(self.integral, height, width)
+        squares = self._window_sums(self.integral_squares, height, width)
+        variance = np.maximum(squares - sums ** 2 / (height * width), 0)
+        denominator = np.sqrt(variance) * template_norm
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator > 1e-6, correlation / denominator, 0.0)
+
+
+def _template_fft(level: dict, key: str, shape):
+    """rfft2 of the zero-mean template padded to the FFT shape (cached per shape)"""
+    cache_key = (key, shape)
+    if cache_key not in level['fft']:
+        if len(level['fft']) >= 16:
+            level['fft'].clear()
+        template = level[key] - level[key].mean()
+        level['fft'][cache_key] = (np.conj(np.fft.rfft2(template, s=shape)), float(np.sqrt((template ** 2).sum())))
+    return level['fft'][cache_key]
+
+
+def _patch_score(patch, template):
+    """NCC of a template against a screen patch of the same size"""
+    if patch.shape != template.shape:
+        return 0.0
+    patch = patch - patch.mean()
+    centered = template - template.mean()
+    denominator = np.sqrt((patch ** 2).sum() * (centered ** 2).sum())
+    return float((patch * centered).sum() / denominator) if denominator > 1e-6 else 0.0
+
+
+def _crop(gray, left: int, top: int, width: int, height: int):
+    return np.asarray(gray.crop((left, top, left + width, top + height)), dtype=np.float64)
+
+
+def get_pyramid(path: str, factor: int, scales=DEFAULT_SCALES):
+    key = (path, os.path.getmtime(path), factor, tuple(scales))
+    with _lock:
+        if key not in _pyramids:
+            _pyramids[key] = _Pyramid(path, scales, factor)
+        return _pyramids[key]
+
+
+def find_template(pixels, template_path: str, threshold: float = DEFAULT_THRESHOLD, scales=DEFAULT_SCALES):
+    """Find a template image in screen pixels; returns a Match or None.
+
+    The last match of each template is re-checked first with a single patch
+    comparison, so repeated lookups on an unchanged screen skip the search.
+    Otherwise every scale is searched on a downsampled screen, sharing one
+    FFT of it, and the best candidate is refined at full resolution in a
+    small window around it.
+    """
+    path = resolve_template(template_path)
+    gray = gray_image(pixels)
+    factor = max(1, gray.width // COARSE_WIDTH)
+    pyramid = get_pyramid(path, factor, scales)
+
+    last = _last_matches.get(path)
+    if last:
+        level = next((l for l in pyramid.levels if l['scale'] == last.scale), None)
+        if level is not None:
+            score = _patch_score(_crop(gray, last.x, last.y, last.width, last.height), level['full'])
+            if score >= threshold:
+                return Match(last.x, last.y, last.width, last.height, score, last.scale)
+
+    coarse = _SearchImage(np.asarray(gray.reduce(factor) if factor > 1 else gray, dtype=np.float64))
+    best = None
+    for level in pyramid.levels:
+        scores = coarse.ncc(level, 'coarse')
+        if scores is None:
+            continue
+        index = int(np.argmax(scores))
+        score = float(scores.flat[index])
+        if best is None or score > best[0]:
+            best = (score, level, divmod(index, scores.shape[1]))
+    if best is None:
+        return None
+
+    _, level, (coarse_y, coarse_x) = best
+    height, width = level['full'].shape
+    margin = 2 * factor
+    top = max(coarse_y * factor - margin, 0)
+    left = max(coarse_x * factor - margin, 0)
+    region = _SearchImage(_crop(gray, left, top, min(width + 2 * margin, gray.width - left),
+                                min(height + 2 * margin, gray.height - top)))
+    scores = region.ncc(level, 'full')
+    if scores is None:
+        return None
+    index = int(np.argmax(scores))
+    score = float(scores.flat[index])
+    if score < threshold:
+        return None
+    offset_y, offset_x = divmod(index, scores.shape[1])
+    match = Match(left + offset_x, top + offset_y, width, height, score, level['scale'])
+    _last_matches[path] = match
+    return match
+
+
+def capture(driver):
+    """Capture the screen, preferring raw screencap and falling back to Appium when adb is unavailable"""
+    key = getattr(driver, 'session_id', None) or id(driver)
+    backend = _backends.get(key, 'screencap')
+    if backend == 'screencap':
+        try:
+            return screencap.capture_frame(driver, 'screencap')
+        except Exception:
+            _backends[key] = 'appium'
+    return screencap.capture_frame(driver, 'appium')
+
+
+def locate(driver, template_path: str, timeout: float = 10, threshold: float = DEFAULT_THRESHOLD, poll_interval: float = 0.5):
+    """Poll the screen until the template is found or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while True:
+        match = find_template(capture(driver).pixels, template_path, threshold)
+        if match or time.monotonic() >= deadline:
+            return match
+        cancellation.sleep(poll_interval)
+
+
+def wait_until_gone(driver, template_path: str, timeout: float = 10, threshold: float = DEFAULT_THRESHOLD, poll_interval: float = 0.5):
+    """Poll the screen until the template is no longer found; returns True if it disappeared"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if find_template(capture(driver).pixels, template_path, threshold) is None:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        cancellation.sleep(poll_interval)
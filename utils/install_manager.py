@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from utils import adb_client, adb_sync, config_loader
+
+CACHE_FILE = 'install_cache.json'
+REMOTE_STAGING_DIR = '/data/local/tmp'
+DEFAULT_WORKERS = 8
+
+# android:versionCode, for manifests whose attribute names were stripped
+_VERSION_CODE_RESOURCE_ID = 0x0101021b
+_TYPE_STRING_POOL = 0x0001
+_TYPE_RESOURCE_MAP = 0x0180
+_TYPE_START_ELEMENT = 0x0102
+_UTF8_FLAG = 0x100
+
+_apk_info_cache = {}
+
+
+def _pool_string(data: bytes, offset: int, utf8: bool):
+    if utf8:
+        # Character count, then byte count, each one or two bytes
+        for _ in range(2):
+            length = data[offset]
+            offset += 1
+            if length & 0x80:
+                length = ((length & 0x7f) << 8) | data[offset]
+                offset += 1
+        return data[offset:offset + length].decode('utf-8', errors='replace')
+    length = struct.unpack_from('<H', data, offset)[0]
+    offset += 2
+    if length & 0x8000:
+        length = ((length & 0x7fff) << 16) | struct.unpack_from('<H', data, offset)[0]
+        offset += 2
+    return data[offset:offset + 2 * length].decode('utf-16-le', errors='replace')
+
+
+def parse_manifest(data: bytes):
+    """(package, versionCode) from a compiled binary AndroidManifest.xml"""
+    strings, resource_ids = [], []
+    offset = struct.unpack_from('<H', data, 2)[0]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from('<HHI', data, offset)
+        if chunk_type == _TYPE_STRING_POOL:
+            count, _, flags, strings_start = struct.unpack_from('<IIII', data, offset + 8)
+            offsets = struct.unpack_from(f'<{count}I', data, offset + header_size)
+            strings = [_pool_string(data, offset + strings_start + o, bool(flags & _UTF8_FLAG)) for o in offsets]
+        elif chunk_type == _TYPE_RESOURCE_MAP:
+            resource_ids = struct.unpack_from(f'<{(chunk_size - header_size) // 4}I', data, offset + header_size)
+        elif chunk_type == _TYPE_START_ELEMENT:
+            body = offset + header_size
+            name_index = struct.unpack_from('<I', data, body + 4)[0]
+            attribute_start, attribute_size, attribute_count = struct.unpack_from('<HHH', data, body + 8)
+            if strings[name_index] != 'manifest':
+                break
+            package, version_code = None, None
+            for i in range(attribute_count):
+                attribute = body + attribute_start + i * attribute_size
+                name, raw_value = struct.unpack_from('<II', data, attribute + 4)
+                value = struct.unpack_from('<I', data, attribute + 16)[0]
+                name_string = strings[name] if name < len(strings) else ''
+                if name_string == 'package':
+                    package = strings[raw_value]
+                elif name_string == 'versionCode' or (name < len(resource_ids) and resource_ids[name] == _VERSION_CODE_RESOURCE_ID):
+                    version_code = int(strings[raw_value]) if raw_value != 0xffffffff else value
+            return package, version_code
+        offset += chunk_size
+    raise ValueError("No <manifest> element found in AndroidManifest.xml")
+
+
+def apk_info(apk_path: str):
+    """{'sha256', 'package', 'version_code', 'size'} of an APK, cached by path, size and mtime"""
+    file_stat = os.stat(apk_path)
+    key = (os.path.abspath(apk_path), file_stat.st_size, file_stat.st_mtime)
+    if key not in _apk_info_cache:
+        sha256 = hashlib.sha256()
+        with open(apk_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        with zipfile.ZipFile(apk_path) as apk:
+            package, version_code = parse_manifest(apk.read('AndroidManifest.xml'))
+        _apk_info_cache[key] = {'sha256': sha256.hexdigest(), 'package': package,
+                                'version_code': version_code, 'size': file_stat.st_size}
+    return _apk_info_cache[key]
+
+
+def installed_state(serial: str, package: str):
+    """{'version_code', 'last_update_time'} of an installed package, or None if it is not installed"""
+    output = adb_client.shell(f"dumpsys package {package} | grep -E 'versionCode=|lastUpdateTime='", serial, timeout=30)
+    version = re.search(r'versionCode=(\d+)', output)
+    updated = re.search(r'lastUpdateTime=([^\r\n]+)', output)
+    if not version:
+        return None
+    return {'version_code': int(version.group(1)), 'last_update_time': updated.group(1).strip() if updated else None}
+
+
+class InstallCache:
+    """Per-device record of what was installed: {serial: {package: {sha256, version_code, last_update_time}}}.
+
+    An install is skipped when the device still reports the versionCode and
+    lastUpdateTime recorded for the same APK hash, so a reinstall or
+    uninstall made outside the framework is noticed.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(config_loader.get_reports_dir(), CACHE_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, serial: str, package: str):
+        with self._lock:
+            return self.entries.get(serial, {}).get(package)
+
+    def record(self, serial: str, package: str, entry: dict):
+        with self._lock:
+            self.entries.setdefault(serial, {})[package] = entry
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(temp_path, self.path)
+
+    def is_current(self, serial: str, info: dict):
+        entry = self.get(serial, info['package'])
+        if not entry or entry.get('sha256') != info['sha256']:
+            return False
+        state = installed_state(serial, info['package'])
+        return (state is not None and state['version_code'] == entry.get('version_code')
+                and state['last_update_time'] == entry.get('last_update_time'))
+
+
+def install_on_device(apk_path: str, serial: str, cache: InstallCache, force: bool = False, install_flags: str = '-r -t'):
+    """Install an APK on one device unless the cache says it is already there; returns a result dict"""
+    started = time.monotonic()
+    info = apk_info(apk_path)
+    result = {'serial': serial, 'package': info['package'], 'version_code': info['version_code']}
+    if not force and cache.is_current(serial, info):
+        return dict(result, status='skipped', seconds=round(time.monotonic() - started, 3))
+
+    remote_path = f"{REMOTE_STAGING_DIR}/{info['sha256'][:16]}.apk"
+    with adb_sync.SyncConnection(serial) as sync:
+        sync.push(apk_path, remote_path)
+    output = adb_client.shell(f"pm install {install_flags} {remote_path}; rm -f {remote_path}", serial, timeout=600)
+    if 'Success' not in output:
+        raise RuntimeError(f"pm install failed on {serial}: {output.strip()}")
+
+    state = installed_state(serial, info['package']) or {}
+    cache.record(serial, info['package'], {
+        'sha256': info['sha256'],
+        'version_code': state.get('version_code', info['version_code']),
+        'last_update_time': state.get('last_update_time'),
+        'apk_path': os.path.abspath(apk_path),
+    })
+    return dict(result, status='installed', seconds=round(time.monotonic() - started, 3))
+
+
+def install(apk_path: str, serials, force: bool = False, max_workers: int = DEFAULT_WORKERS):
+    """Install an APK on several devices concurrently.
+
+    The APK is hashed and its manifest read once; each device then gets its
+    own worker, which checks the cache, streams the APK over the sync
+    protocol and runs `pm install`. Returns one result dict per serial, with
+    'status' set to installed, skipped or failed.
+    """
+    apk_info(apk_path)
+    cache = InstallCache()
+
+    def run(serial):
+        try:
+            return install_on_device(apk_path, serial, cache, force)
+        except Exception as e:
+            return {'serial': serial, 'status': 'failed', 'error': str(e)}
+
+    serials = list(serials)
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(serials) or 1)),
+                            thread_name_prefix="install") as executor:
+        return list(executor.map(run, serials))
@@ -0,0 +1,137 @@
+import collections
+from utils import cancellation, dumpsys_parser
+
+MEMORY_METRICS = ('total_pss_kb', 'java_heap_kb', 'native_heap_kb')
+
+
+def force_gc(driver, package_name: str, settle_seconds: float = 1.0):
+    """Ask the app's runtime to collect garbage (SIGUSR1 makes ART run a GC).
+
+    Returns whether the signal was delivered: release builds on unrooted
+    devices, or an app that is not running, cannot be signalled. The command
+    always exits 0, since `mobile: shell` raises on a non-zero exit.
+    """
+    output = driver.execute_script('mobile: shell', {
+        'command': f'pid=$(pidof {package_name}); if [ -n "$pid" ] && '
+                   f'{{ kill -10 $pid || run-as {package_name} kill -10 $pid || su 0 kill -10 $pid; }} 2>/dev/null; '
+                   f'then echo gc_forced; fi; true'
+    })
+    forced = 'gc_forced' in (output or '')
+    if forced:
+        cancellation.sleep(settle_seconds)
+    return forced
+
+
+def sample_memory(driver, package_name: str):
+    """Sample PSS and heap sizes (KB) of a running app"""
+    return dumpsys_parser.query_dumpsys(driver, 'meminfo', list(MEMORY_METRICS), args=package_name)
+
+
+class _TrendLine:
+    """Online least-squares fit of value against iteration using running sums"""
+
+    def __init__(self):
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+
+    def add(self, x, y):
+        self.n += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xx += x * x
+        self.sum_xy += x * y
+
+    def slope(self):
+        if self.n < 2:
+            return None
+        denominator = self.n * self.sum_xx - self.sum_x ** 2
+        if denominator == 0:
+            return None
+        return (self.n * self.sum_xy - self.sum_x * self.sum_y) / denominator
+
+
+def _window_slope(points):
+    trend = _TrendLine()
+    for x, y in points:
+        trend.add(x, y)
+    return trend.slope()
+
+
+class LeakTracker:
+    """Tracks memory samples across iterations with bounded memory use.
+
+    The overall trend is fitted from running sums, the most recent samples are
+    kept in a fixed-size window to check that growth is sustained, and a
+    history for reporting is downsampled by doubling its stride whenever it
+    reaches max_history entries.
+    """
+
+    def __init__(self, threshold_kb_per_iteration: float = 50.0, warmup_iterations: int = 2,
+                 window: int = 20, max_history: int = 200, metrics=MEMORY_METRICS):
+        self.threshold = threshold_kb_per_iteration
+        self.warmup = warmup_iterations
+        self.max_history = max_history
+        self.metrics = metrics
+        self.trends = {m: _TrendLine() for m in metrics}
+        self.recent = {m: collections.deque(maxlen=window) for m in metrics}
+        self.stats = {m: {'first': None, 'last': None, 'min': None, 'max': None} for m in metrics}
+        self.history = []
+        self.history_stride = 1
+        self.samples = 0
+        self.gc_forced = 0
+
+    def add(self, iteration: int, sample: dict):
+        self.samples += 1
+        self.gc_forced += bool(sample.get('gc_forced'))
+        if iteration % self.history_stride == 0:
+            self.history.append({'iteration': iteration, **{m: sample.get(m) for m in self.metrics},
+                                 'gc_forced': sample.get('gc_forced')})
+            if len(self.history) >= self.max_history:
+                self.history_stride *= 2
+                self.history = [h for h in self.history if h['iteration'] % self.history_stride == 0]
+
+        if iteration < self.warmup:
+            return
+        for metric in self.metrics:
+            value = sample.get(metric)
+            if value is None:
+                continue
+            self.trends[metric].add(iteration, value)
+            self.recent[metric].append((iteration, value))
+            stats = self.stats[metric]
+            if stats['first'] is None:
+                stats['first'] = value
+            stats['last'] = value
+            stats['min'] = value if stats['min'] is None else min(stats['min'], value)
+            stats['max'] = value if stats['max'] is None else max(stats['max'], value)
+
+    def report(self):
+        """Per-metric trend summary and whether sustained growth above the threshold was seen"""
+        metrics = {}
+        leak_suspected = False
+        for metric in self.metrics:
+            slope = self.trends[metric].slope()
+            recent_slope = _window_slope(self.recent[metric])
+            stats = self.stats[metric]
+            growing = (slope is not None and recent_slope is not None
+                       and slope > self.threshold and recent_slope > self.threshold)
+            leak_suspected = leak_suspected or growing
+            metrics[metric] = {
+                **stats,
+                'growth_kb': None if stats['first'] is None else stats['last'] - stats['first'],
+                'slope_kb_per_iteration': None if slope is None else round(slope, 2),
+                'recent_slope_kb_per_iteration': None if recent_slope is None else round(recent_slope, 2),
+                'sustained_growth': growing,
+            }
+        return {
+            'samples': self.samples,
+            # Without a forced GC, heap sizes include garbage and trends are less reliable
+            'gc_forced_samples': self.gc_forced,
+            'threshold_kb_per_iteration': self.threshold,
+            'leak_suspected': leak_suspected,
+            'metrics': metrics,
+            'history': self.history,
+        }
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import adb_client
+
+# A cached listing older than this is refreshed in the background on the next request
+DEFAULT_MAX_AGE_SECONDS = 30
+
+
+def list_packages(serial: str = None, timeout: float = 15):
+    """Sorted package names installed on a device (`pm list packages`)"""
+    output = adb_client.shell('pm list packages', serial, timeout=timeout)
+    return sorted(line.split(':', 1)[1].strip() for line in output.splitlines() if line.startswith('package:'))
+
+
+def _default_serial():
+    """The configured device if it is connected, otherwise the first connected device"""
+    devices = adb_client.list_devices()
+    configured = adb_client.resolve_serial()
+    if configured in devices:
+        return configured
+    return devices[0] if devices else None
+
+
+class PackageCache:
+    """Installed-package listings per device, fetched off the calling thread.
+
+    `get` returns whatever is cached right away and starts a background
+    refresh when the listing is missing or stale. A refresh diffs the new
+    listing against the cached one and calls listeners only when packages
+    were added or removed, so an unchanged device costs one `pm list
+    packages` and no UI work. Listeners run on the worker thread.
+    """
+
+    def __init__(self, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="package-cache")
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = False
+        self._callbacks = []
+        self._last_serial = None
+        self.errors = []
+
+    def get(self, serial: str = None, callback=None, force: bool = False):
+        """Cached packages for a device (the default device when serial is None).
+
+        callback(packages, added, removed) is called once the background
+        refresh finds a change. It is also called when nothing was cached
+        yet, when the refreshed listing is empty and when the caller joined
+        a refresh that was already running, so a caller showing a loading
+        state always hears back.
+        """
+        with self._lock:
+            key = serial or self._last_serial
+            entry = self._entries.get(key)
+            packages = list(entry['packages']) if entry else []
+            stale = force or entry is None or time.monotonic() - entry['fetched'] > self.max_age_seconds
+            if stale and callback:
+                self._callbacks.append((callback, entry is None or self._refreshing))
+            if stale and not self._refreshing:
+                self._refreshing = True
+                self._executor.submit(self._refresh, serial)
+        return packages
+
+    def loading(self):
+        """Whether a background refresh is in progress"""
+        with self._lock:
+            return self._refreshing
+
+    def _refresh(self, serial: str):
+        try:
+            serial = serial or _default_serial()
+            packages = list_packages(serial)
+        except Exception as e:
+            self.errors.append(str(e))
+            with self._lock:
+                self._refreshing = False
+                callbacks, self._callbacks = self._callbacks, []
+            for callback, _ in callbacks:
+                callback([], [], [])
+            return
+        with self._lock:
+            previous = self._entries.get(serial)
+            old = set(previous['packages']) if previous else set()
+            self._entries[serial] = {'packages': packages, 'fetched': time.monotonic()}
+            self._last_serial = serial
+            # Callbacks registered from here on start a new refresh instead of waiting for this one
+            self._refreshing = False
+            callbacks, self._callbacks = self._callbacks, []
+        current = set(packages)
+        added, removed = sorted(current - old), sorted(old - current)
+        for callback, always in callbacks:
+            if added or removed or always or not packages:
+                callback(packages, added, removed)
+
+    def invalidate(self, serial: str = None):
+        """Force the next `get` to refetch, e.g. after installing or uninstalling an app"""
+        with self._lock:
+            if serial is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(serial, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide package cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PackageCache()
+        return _cache
@@ -0,0 +1,44 @@
+import json
+import math
+import os
+import statistics
+import time
+
+
+def percentile(sorted_values: list, q: float):
+    """Linear-interpolated percentile of an already sorted list (q in 0-100)"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * (q / 100.0)
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: list):
+    """Summary statistics (count, min, median, p90, mean, stddev) for a list of numbers"""
+    values = sorted(v for v in samples if v is not None)
+    if not values:
+        return {'count': 0, 'min': None, 'median': None, 'p90': None, 'mean': None, 'stddev': None}
+    return {
+        'count': len(values),
+        'min': values[0],
+        'median': statistics.median(values),
+        'p90': round(percentile(values, 90), 3),
+        'mean': round(statistics.mean(values), 3),
+        'stddev': round(statistics.stdev(values), 3) if len(values) > 1 else 0.0,
+    }
+
+
+def append_record(path: str, record: dict):
+    """Append one JSON record to a JSONL file so runs can be compared over time"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = dict(record)
+    record.setdefault('timestamp', time.strftime("%Y-%m-%dT%H:%M:%S"))
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+    return path
@@ -0,0 +1,210 @@
+import re
+import threading
+import time
+import numpy as np
+from utils import adb_client, chrome_trace, dumpsys_parser
+
+# Android thermal status levels: 0 none, 1 light, 2 moderate, 3 severe, 4 critical, 5 emergency, 6 shutdown
+DEFAULT_THROTTLE_STATUS = 2
+
+_SAMPLE_FIELDS = ['status', 'level', 'voltage_mv', 'temperature_c']
+# BatteryManager status values during which the battery is fed by a charger (2 charging, 5 full)
+CHARGING_STATUSES = (2, 5)
+_CURRENT_RE = re.compile(r'^CURRENT=(-?\d+)', re.M)
+
+_SAMPLE_COMMAND = (
+    dumpsys_parser.build_command('battery', dumpsys_parser.BATTERY_FIELDS, _SAMPLE_FIELDS)
+    + "; echo CURRENT=$(cat /sys/class/power_supply/battery/current_now 2>/dev/null)"
+    + "; " + dumpsys_parser.build_command('thermalservice', dumpsys_parser.THERMAL_FIELDS)
+)
+
+
+def _charging(sample: dict):
+    return sample.get('status') in CHARGING_STATUSES
+
+
+def _drain_sign(samples: list):
+    """Sign that turns current_now into battery drain on this device.
+
+    The kernel ABI reports discharge as negative, but many vendors flip it.
+    While not charging the battery mostly discharges, so the sign of the
+    median current then is taken as the discharge direction.
+    """
+    currents = [s['current_ua'] for s in samples
+                if not _charging(s) and s.get('current_ua')]
+    if not currents:
+        return -1
+    return -1 if np.median(currents) < 0 else 1
+
+
+def parse_sample(output: str):
+    """Parse one combined battery/current/thermal sample"""
+    sample = dumpsys_parser.parse_fields(output, dumpsys_parser.BATTERY_FIELDS, _SAMPLE_FIELDS)
+    sample.update(dumpsys_parser.parse_fields(output, dumpsys_parser.THERMAL_FIELDS))
+    match = _CURRENT_RE.search(output or '')
+    sample['current_ua'] = int(match.group(1)) if match else None
+    return sample
+
+
+class PowerProfiler:
+    """Samples battery level, current, voltage and thermal status in the background.
+
+    Sampling goes straight through adb so it does not compete with the Appium
+    session. Time windows registered with mark() are later attributed an
+    energy estimate and a throttling flag.
+
+    current_now is assumed to be in µA, as the kernel ABI specifies; devices
+    reporting mA come out 1000x low and are flagged in the summary. Power is
+    the signed battery drain, so a net charge counts as negative. Stretches
+    next to samples taken while charging are left out of energy estimates,
+    since the charger rather than the battery feeds the device then.
+    """
+
+    def __init__(self, serial: str = None, interval_seconds: float = 5.0,
+                 throttle_status: int = DEFAULT_THROTTLE_STATUS, reset_batterystats: bool = True):
+        self.serial = serial
+        self.interval = interval_seconds
+        self.throttle_status = throttle_status
+        self.reset_batterystats = reset_batterystats
+        self.samples = []
+        self.windows = {}
+        self.errors = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.reset_batterystats:
+            adb_client.shell('dumpsys batterystats --reset', self.serial)
+        self._take_sample()
+        self._thread = threading.Thread(target=self._run, name="power-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 30)
+        self._take_sample()
+        return self.summary()
+
+    def mark(self, key, start: float, end: float):
+        """Register the monotonic time window of a step (or step range) for attribution"""
+        self.windows[key] = (start, end)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._take_sample()
+
+    def _take_sample(self):
+        try:
+            sample = parse_sample(adb_client.shell(_SAMPLE_COMMAND, self.serial, timeout=15))
+        except Exception:
+            self.errors += 1
+            return
+        sample['time'] = time.monotonic()
+        with self._lock:
+            self.samples.append(sample)
+            sign = _drain_sign(self.samples)
+        power_mw = (sample['voltage_mv'] * sign * sample['current_ua'] / 1e6
+                    if sample.get('voltage_mv') and sample.get('current_ua') is not None and not _charging(sample)
+                    else None)
+        chrome_trace.counter('Power (mW)', {'power': power_mw}, sample['time'])
+        chrome_trace.counter('Battery (%)', {'level': sample.get('level')}, sample['time'])
+        chrome_trace.counter('Temperature (°C)', {'battery': sample.get('temperature_c')}, sample['time'])
+        chrome_trace.counter('Thermal status', {'status': sample.get('thermal_status')}, sample['time'])
+
+    def _power_series(self):
+        """Time, battery drain (mW) and charging arrays of samples that carry voltage and current"""
+        with self._lock:
+            samples = [s for s in self.samples if s.get('voltage_mv') and s.get('current_ua') is not None]
+            sign = _drain_sign(self.samples)
+        if not samples:
+            return np.empty(0), np.empty(0), np.empty(0, dtype=bool)
+        times = np.array([s['time'] for s in samples], dtype=np.float64)
+        power = np.array([s['voltage_mv'] * sign * s['current_ua'] / 1e6 for s in samples], dtype=np.float64)
+        charging = np.array([_charging(s) for s in samples], dtype=bool)
+        return times, power, charging
+
+    def _integrate(self, start: float, end: float, times, power, charging):
+        """(energy in mWs, seconds covered) over the discharging stretches between start and end"""
+        if len(times) == 0 or end <= start:
+            return None, 0.0
+        inside = times[(times > start) & (times < end)]
+        grid = np.concatenate([[start], inside, [end]])
+        values = np.interp(grid, times, power)
+        # A stretch is usable when neither sample around it was taken while charging
+        around = np.clip(np.searchsorted(times, (grid[1:] + grid[:-1]) / 2.0), 1, max(len(times) - 1, 1))
+        usable = ~(charging[around - 1] | charging[np.minimum(around, len(times) - 1)])
+        if not usable.any():
+            return None, 0.0
+        widths = np.diff(grid)
+        energy_mws = np.sum(((values[1:] + values[:-1]) / 2.0 * widths)[usable])
+        return float(energy_mws), float(np.sum(widths[usable]))
+
+    def energy_mwh(self, start: float, end: float, times=None, power=None, charging=None):
+        """Battery energy used between two monotonic times, integrating linearly interpolated power.
+
+        None when the whole window was spent charging (or without samples).
+        """
+        if times is None:
+            times, power, charging = self._power_series()
+        energy_mws, _ = self._integrate(start, end, times, power, charging)
+        return round(energy_mws / 3600.0, 4) if energy_mws is not None else None
+
+    def throttled(self, start: float, end: float):
+        """Whether the device reported a thermal status at/above the throttling level in a window"""
+        with self._lock:
+            statuses = [s['thermal_status'] for s in self.samples
+                        if s.get('thermal_status') is not None and start - self.interval <= s['time'] <= end]
+        return bool(statuses) and max(statuses) >= self.throttle_status
+
+    def window_for(self, entry: dict):
+        key = entry.get('step')
+        if key in self.windows:
+            return self.windows[key]
+        steps = entry.get('steps')
+        if steps and steps[0] in self.windows and steps[-1] in self.windows:
+            return self.windows[steps[0]][0], self.windows[steps[-1]][1]
+        return None
+
+    def annotate(self, results_log: list):
+        """Attach energy_mwh and throttled to every results log entry with a known time window"""
+        times, power, charging = self._power_series()
+        for entry in results_log:
+            window = self.window_for(entry)
+            if not window:
+                continue
+            entry['energy_mwh'] = self.energy_mwh(window[0], window[1], times, power, charging)
+            entry['throttled'] = self.throttled(*window)
+        return results_log
+
+    def summary(self):
+        with self._lock:
+            samples = list(self.samples)
+        if not samples:
+            return {'samples': 0, 'errors': self.errors}
+        start, end = samples[0]['time'], samples[-1]['time']
+        levels = [s['level'] for s in samples if s.get('level') is not None]
+        temperatures = [s['temperature_c'] for s in samples if s.get('temperature_c') is not None]
+        statuses = [s['thermal_status'] for s in samples if s.get('thermal_status') is not None]
+        currents = [abs(s['current_ua']) for s in samples if s.get('current_ua')]
+        energy_mws, covered = self._integrate(start, end, *self._power_series())
+        energy = round(energy_mws / 3600.0, 4) if energy_mws is not None else None
+        duration = end - start
+        return {
+            'samples': len(samples),
+            'errors': self.errors,
+            'duration_seconds': round(duration, 1),
+            'battery_level_start': levels[0] if levels else None,
+            'battery_level_end': levels[-1] if levels else None,
+            'energy_mwh': energy,
+            'average_power_mw': round(energy_mws / covered, 1) if energy_mws is not None and covered > 0 else None,
+            'charging_samples': sum(_charging(s) for s in samples),
+            'discharging_seconds': round(covered, 1),
+            # Phones draw tens of mA at least; smaller readings suggest current_now is in mA, not µA
+            'current_units_suspect': bool(currents) and float(np.median(currents)) < 1000,
+            'max_temperature_c': max(temperatures) if temperatures else None,
+            'max_thermal_status': max(statuses) if statuses else None,
+            'throttled': bool(statuses) and max(statuses) >= self.throttle_status,
+        }
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import adb_client
+
+# screenrecord refuses longer recordings than this
+MAX_SEGMENT_SECONDS = 180
+DEFAULT_SEGMENT_SECONDS = 170
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+class SegmentedRecorder:
+    """Records the screen with `screenrecord` in back-to-back segments from a background thread.
+
+    Each segment stays under the device's 3-minute limit. A finished segment
+    is pulled to disk by `adb pull` (streamed, never held in memory) and deleted
+    from the device while the next one records.
+    """
+
+    def __init__(self, serial: str, output_dir: str, segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+                 bit_rate_mbps: float = None, size: str = None):
+        self.serial = serial
+        self.output_dir = output_dir
+        self.segment_seconds = max(1, min(int(segment_seconds), MAX_SEGMENT_SECONDS))
+        self.bit_rate_mbps = bit_rate_mbps
+        self.size = size
+        self.remote_prefix = f"/sdcard/rec_{os.getpid()}_{int(time.time())}"
+        self.segments = []
+        self.errors = []
+        self._stop_event = threading.Event()
+        self._process = None
+        self._thread = None
+        self._pulls = []
+        self._puller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recording-pull")
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="screen-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def _command(self, remote_path: str):
+        command = ['shell', 'screenrecord', '--time-limit', str(self.segment_seconds)]
+        if self.bit_rate_mbps:
+            command += ['--bit-rate', str(int(float(self.bit_rate_mbps) * 1000000))]
+        if self.size:
+            command += ['--size', self.size]
+        return command + [remote_path]
+
+    def _run(self):
+        index = 0
+        while not self._stop_event.is_set():
+            remote_path = f"{self.remote_prefix}_{index:03d}.mp4"
+            started = time.monotonic()
+            try:
+                self._process = subprocess.Popen(adb_client.adb_args(self._command(remote_path), self.serial),
+                                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                _, stderr = self._process.communicate()
+                if self._process.returncode != 0 and time.monotonic() - started < 1:
+                    self.errors.append(f"screenrecord failed: {stderr.decode(errors='replace').strip()}")
+                    break
+            except Exception as e:
+                self.errors.append(f"screenrecord failed: {e}")
+                break
+            local_path = os.path.join(self.output_dir, f"segment_{index:03d}.mp4")
+            self._pulls.append(self._puller.submit(self._pull, remote_path, local_path))
+            index += 1
+
+    def _pull(self, remote_path: str, local_path: str):
+        # screenrecord finalizes the file on exit; give the media writer a moment to close it
+        time.sleep(0.5)
+        result = adb_client.run_adb(['pull', remote_path, local_path], self.serial, timeout=300)
+        adb_client.shell(f'rm -f {remote_path}', self.serial, timeout=30)
+        if result.returncode != 0:
+            raise RuntimeError(f"Pulling {remote_path} failed: {result.stderr.strip()}")
+        self.segments.append(local_path)
+        return local_path
+
+    def stop(self, timeout: float = 300):
+        """Stop recording, wait for all segments to be pulled and return their local paths"""
+        self._stop_event.set()
+        # SIGINT lets screenrecord finish writing the current segment. Repeat in case
+        # a new segment was starting just as the stop was requested.
+        for _ in range(6):
+            adb_client.shell(f'pkill -INT -f {self.remote_prefix}', self.serial, timeout=15)
+            if self._thread:
+                self._thread.join(timeout=5)
+            if not self._thread or not self._thread.is_alive():
+                break
+        else:
+            if self._process and self._process.poll() is None:
+                self._process.terminate()
+        for future in list(self._pulls):
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                self.errors.append(str(e))
+        self._puller.shutdown(wait=False)
+        return sorted(self.segments)
+
+
+def start(name: str, serial: str, output_dir: str, **options):
+    """Start a named background recording; fails if one with this name is already running"""
+    with _recorders_lock:
+        if name in _recorders:
+            raise ValueError(f"Recording '{name}' is already running")
+        recorder = SegmentedRecorder(serial, output_dir, **options).start()
+        _recorders[name] = recorder
+        return recorder
+
+
+def stop(name: str, timeout: float = 300):
+    """Stop a named recording; returns the recorder (segments and errors) or None if not running"""
+    with _recorders_lock:
+        recorder = _recorders.pop(name, None)
+    if recorder:
+        recorder.stop(timeout)
+    return recorder
+
+
+def stop_all(timeout: float = 300):
+    """Stop every running recording (end of a test run); returns {name: recorder}"""
+    with _recorders_lock:
+        names = list(_recorders)
+    return {name: stop(name, timeout) for name in names}
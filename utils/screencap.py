@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import io
+import struct
+import numpy as np
+from PIL import Image
+from utils import adb_client
+
+# screencap pixel formats (android.graphics.PixelFormat / HAL_PIXEL_FORMAT)
+PIXEL_FORMAT_RGBA_8888 = 1
+PIXEL_FORMAT_RGBX_8888 = 2
+PIXEL_FORMAT_BGRA_8888 = 5
+
+_HEADER = struct.Struct('<III')
+
+
+class RawFrame:
+    """A screen capture kept as the raw RGBA buffer it arrived in.
+
+    `pixels` is a read-only (height, width, 4) uint8 view over the captured
+    bytes, so comparing or hashing a frame never copies it. PNG encoding
+    only happens when the frame is written or encoded, and the result is cached.
+    """
+
+    def __init__(self, buffer, width: int, height: int, offset: int = 0):
+        self.width = width
+        self.height = height
+        self.buffer = buffer
+        self.pixels = np.frombuffer(buffer, dtype=np.uint8, count=width * height * 4, offset=offset).reshape(height, width, 4)
+        self._png = None
+
+    @classmethod
+    def from_screencap(cls, data: bytes):
+        """Wrap the output of `screencap` (no -p): a 12 or 16 byte header followed by pixels"""
+        if len(data) < _HEADER.size:
+            raise ValueError(f"screencap returned {len(data)} bytes, expected a raw frame")
+        width, height, pixel_format = _HEADER.unpack_from(data)
+        # Android 10+ appends a color space field to the header
+        offset = len(data) - width * height * 4
+        if offset not in (12, 16):
+            raise ValueError(f"Unexpected screencap size {len(data)} for {width}x{height}")
+        if pixel_format not in (PIXEL_FORMAT_RGBA_8888, PIXEL_FORMAT_RGBX_8888, PIXEL_FORMAT_BGRA_8888):
+            raise ValueError(f"Unsupported screencap pixel format {pixel_format}")
+        frame = cls(data, width, height, offset)
+        if pixel_format == PIXEL_FORMAT_BGRA_8888:
+            frame.pixels = frame.pixels[..., [2, 1, 0, 3]]
+        return frame
+
+    @classmethod
+    def from_png(cls, png_bytes: bytes):
+        """Decode a PNG (e.g. an Appium screenshot) into a frame"""
+        image = Image.open(io.BytesIO(png_bytes)).convert('RGBA')
+        frame = cls(image.tobytes(), image.width, image.height)
+        frame._png = png_bytes
+        return frame
+
+    @property
+    def rgb(self):
+        """(height, width, 3) view without the alpha channel"""
+        return self.pixels[..., :3]
+
+    def digest(self):
+        """SHA-256 of the pixel data"""
+        pixels = self.pixels if self.pixels.flags.c_contiguous else np.ascontiguousarray(self.pixels)
+        return hashlib.sha256(pixels.data).hexdigest()
+
+    def to_image(self):
+        if self.pixels.flags.c_contiguous:
+            return Image.frombuffer('RGBA', (self.width, self.height), self.pixels.data, 'raw', 'RGBA', 0, 1)
+        return Image.fromarray(self.pixels, 'RGBA')
+
+    def encode_png(self):
+        """Encode the frame as PNG (fast compression); the result is cached"""
+        if self._png is None:
+            output = io.BytesIO()
+            self.to_image().convert('RGB').save(output, format='PNG', compress_level=1)
+            self._png = output.getvalue()
+        return self._png
+
+    def save(self, filepath: str):
+        with open(filepath, 'wb') as f:
+            f.write(self.encode_png())
+        return filepath
+
+
+def capture(serial: str = None, timeout: float = 30):
+    """Capture the screen as a RawFrame via `adb exec-out screencap` (raw pixels, no PNG step)"""
+    return RawFrame.from_screencap(adb_client.exec_out('screencap', serial, timeout=timeout))
+
+
+def capture_frame(driver, backend: str = 'appium'):
+    """Capture the current screen with the given backend ('appium' or 'screencap')"""
+    backend = (backend or 'appium').lower()
+    if backend == 'screencap':
+        return capture(adb_client.resolve_serial(driver))
+    if backend == 'appium':
+        return RawFrame.from_png(base64.b64decode(driver.get_screenshot_as_base64()))
+    raise ValueError(f"Unknown capture backend '{backend}'. Use 'appium' or 'screencap'")
@@ -0,0 +1,120 @@
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import artifact_store
+
+
+class ScreenshotService:
+    """Captures screenshots on the caller's thread and saves them in a background worker pool.
+
+    Only the transfer of the image from the device happens synchronously.
+    Decoding, encoding and storing are done by workers. Files go through the
+    content-addressed artifact store, so identical screenshots are kept once.
+    At most max_pending screenshots are held in memory: capture() blocks when
+    the queue is full, so a slow disk cannot grow memory without bound.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._errors = []
+        self._step_paths = {}
+        self.saved = 0
+
+    def capture(self, driver, filepath: str):
+        """Grab the current screen and queue it to be written to filepath"""
+        return self.submit(driver.get_screenshot_as_base64(), filepath)
+
+    def submit(self, encoded_png: str, filepath: str):
+        """Queue already captured base64 PNG data to be written to filepath"""
+        return self._queue(self._write, encoded_png, filepath)
+
+    def submit_frame(self, frame, filepath: str):
+        """Queue a raw frame (utils.screencap.RawFrame) to be PNG-encoded and written to filepath"""
+        return self._queue(self._write_frame, frame, filepath)
+
+    def _queue(self, writer, payload, filepath: str):
+        step = artifact_store.current_step()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(writer, payload, filepath, step)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+            self._step_paths.setdefault(step, []).append(filepath)
+        future.add_done_callback(self._done)
+        return future
+
+    def take_step_paths(self, step):
+        """Paths queued while a step was current (written or still pending); clears them"""
+        with self._lock:
+            return self._step_paths.pop(step, [])
+
+    def _write(self, encoded_png: str, filepath: str, step=None):
+        return artifact_store.get_store().put_png(base64.b64decode(encoded_png), filepath, step=step)
+
+    def _write_frame(self, frame, filepath: str, step=None):
+        return artifact_store.get_store().put_frame(frame, filepath, step=step)
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is not None:
+                self._errors.append(str(future.exception()))
+            else:
+                self.saved += 1
+
+    def flush(self, timeout: float = None):
+        """Wait for all queued screenshots to be written.
+
+        Returns the errors of failed writes since the last flush. Any writes
+        still pending when the timeout expires are reported as errors too.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        with self._lock:
+            errors = self._errors
+            if self._pending:
+                errors.append(f"{len(self._pending)} screenshot(s) still pending")
+            self._errors = []
+        return errors
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Get the shared screenshot service, creating it on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ScreenshotService()
+        return _service
+
+
+def flush(timeout: float = None):
+    """Wait for the shared service's queued screenshots, if it was ever used"""
+    if _service is None:
+        return []
+    return _service.flush(timeout)
+
+
+def take_step_paths(step):
+    """Paths the shared service queued during a step, if it was ever used"""
+    if _service is None:
+        return []
+    return _service.take_step_paths(step)
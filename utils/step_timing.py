@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from utils import chrome_trace
+
+# Appium/WebDriver commands that locate elements ("locating" in a step's breakdown)
+FIND_COMMANDS = ('findElement', 'findElements', 'findChildElement', 'findChildElements')
+# Slowest commands listed per step
+SLOWEST_COMMANDS = 3
+
+_current = None
+_local = threading.local()
+
+
+def _size(value):
+    """Approximate JSON size of a command payload, cheap for the large string cases"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict) and isinstance(value.get('value'), str):
+        return len(value['value'])
+    return len(json.dumps(value, default=str))
+
+
+def _failed(response):
+    if not isinstance(response, dict):
+        return False
+    value = response.get('value')
+    return response.get('status') not in (None, 0) or (isinstance(value, dict) and 'error' in value)
+
+
+class StepTimer:
+    """Where the time of one step (or of the whole run) went.
+
+    Commands issued inside an explicit wait count as waiting; the other
+    commands are split into locating (find element commands) and acting.
+    Whatever is left of the step's wall time is local work such as adb
+    subprocesses and image processing.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+        self.commands = {}
+        self.round_trips = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.command_seconds = 0.0
+        self.find_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.sleep_seconds = 0.0
+        self._slowest = []
+
+    def add_command(self, command: str, endpoint: str, seconds: float, request_bytes: int, response_bytes: int,
+                    failed: bool, waiting: bool):
+        with self._lock:
+            stats = self.commands.setdefault(endpoint, {'count': 0, 'ms': 0.0})
+            stats['count'] += 1
+            stats['ms'] += seconds * 1000
+            self.round_trips += 1
+            self.errors += failed
+            self.request_bytes += request_bytes
+            self.response_bytes += response_bytes
+            if not waiting:
+                self.command_seconds += seconds
+                if command in FIND_COMMANDS:
+                    self.find_seconds += seconds
+            self._slowest.append((seconds, endpoint))
+            if len(self._slowest) > SLOWEST_COMMANDS:
+                self._slowest.remove(min(self._slowest))
+
+    def add_wait(self, seconds: float):
+        with self._lock:
+            self.wait_seconds += seconds
+
+    def add_sleep(self, seconds: float):
+        with self._lock:
+            self.sleep_seconds += seconds
+
+    def stop(self):
+        self.finished = time.monotonic()
+        return self
+
+    def breakdown(self):
+        """Milliseconds per category plus command counts, for the results log"""
+        elapsed = (self.finished or time.monotonic()) - self.started
+        with self._lock:
+            other = elapsed - self.command_seconds - self.wait_seconds - self.sleep_seconds
+            return {
+                'total_ms': round(elapsed * 1000, 1),
+                'locate_ms': round(self.find_seconds * 1000, 1),
+                'act_ms': round((self.command_seconds - self.find_seconds) * 1000, 1),
+                'wait_ms': round(self.wait_seconds * 1000, 1),
+                'sleep_ms': round(self.sleep_seconds * 1000, 1),
+                'other_ms': round(max(other, 0.0) * 1000, 1),
+                'round_trips': self.round_trips,
+                'errors': self.errors,
+                'request_bytes': self.request_bytes,
+                'response_bytes': self.response_bytes,
+                'commands': {endpoint: {'count': stats['count'], 'ms': round(stats['ms'], 1)}
+                             for endpoint, stats in sorted(self.commands.items(), key=lambda item: -item[1]['ms'])},
+                'slowest': [{'endpoint': endpoint, 'ms': round(seconds * 1000, 1)}
+                            for seconds, endpoint in sorted(self._slowest, reverse=True)],
+            }
+
+
+def start_step(label):
+    """Attribute commands, waits and sleeps from now on to a new step"""
+    global _current
+    _current = StepTimer(label)
+    return _current
+
+
+def end_step():
+    """Stop timing the current step and return its timer"""
+    global _current
+    timer, _current = _current, None
+    return timer.stop() if timer else None
+
+
+def current():
+    return _current
+
+
+def record_sleep(seconds: float, started: float = None):
+    timer = _current
+    if timer is not None:
+        timer.add_sleep(seconds)
+    if started is not None:
+        chrome_trace.complete('sleep', 'sleep', started, started + seconds)
+
+
+class CommandRecorder:
+    """Times every WebDriver command the driver sends.
+
+    The driver's command executor gets an instance-level `execute` wrapper
+    that records endpoint, latency and payload sizes to the current step
+    and to a run-wide timer. `detach` restores the class method.
+    """
+
+    def __init__(self):
+        self.run = StepTimer('Run')
+        self._executor = None
+
+    def attach(self, driver):
+        executor = getattr(driver, 'command_executor', None)
+        if executor is None or not hasattr(executor, 'execute'):
+            return self
+        original = executor.execute
+        routes = getattr(executor, '_commands', {}) or {}
+
+        def execute(command, params=None):
+            started = time.monotonic()
+            response = None
+            try:
+                response = original(command, params)
+                return response
+            finally:
+                seconds = time.monotonic() - started
+                route = routes.get(command)
+                endpoint = f"{route[0]} {route[1]}" if route else command
+                record = (command, endpoint, seconds, _size(params), _size(response), response is None or _failed(response),
+                          getattr(_local, 'wait_depth', 0) > 0)
+                self.run.add_command(*record)
+                timer = _current
+                if timer is not None:
+                    timer.add_command(*record)
+                chrome_trace.complete(endpoint, 'webdriver', started, started + seconds, command=command,
+                                      request_bytes=record[3], response_bytes=record[4], failed=record[5])
+
+        executor.execute = execute
+        self._executor = executor
+        return self
+
+    def detach(self):
+        if self._executor is not None:
+            self._executor.__dict__.pop('execute', None)
+            self._executor = None
+        self.run.stop()
+        return self
+
+    def summary(self):
+        """Command totals for the whole run, including commands sent outside steps"""
+        breakdown = self.run.breakdown()
+        return {
+            'total_ms': breakdown['total_ms'],
+            'command_ms': round(sum(stats['ms'] for stats in breakdown['commands'].values()), 1),
+            **{key: breakdown[key] for key in ('round_trips', 'errors', 'request_bytes', 'response_bytes',
+                                               'commands', 'slowest')},
+        }
+
+
+class TimedWebDriverWait(WebDriverWait):
+    """WebDriverWait that reports the time spent waiting to the current step"""
+
+    def _timed(self, wait, method, message):
+        _local.wait_depth = getattr(_local, 'wait_depth', 0) + 1
+        started = time.monotonic()
+        try:
+            return wait(method, message)
+        finally:
+            _local.wait_depth -= 1
+            if _local.wait_depth == 0:
+                finished = time.monotonic()
+                timer = _current
+                if timer is not None:
+                    timer.add_wait(finished - started)
+                chrome_trace.complete('wait', 'wait', started, finished, timeout_s=getattr(self, '_timeout', None))
+
+    def until(self, method, message: str = ""):
+        return self._timed(super().until, method, message)
+
+    def until_not(self, method, message: str = ""):
+        return self._timed(super().until_not, method, message)
@@ -0,0 +1,202 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.screencap import RawFrame
+
+DEFAULT_TILE_SIZE = 32
+DEFAULT_KEYFRAME_INTERVAL = 30
+# Store a keyframe instead of a delta when more than this share of tiles changed
+KEYFRAME_CHANGE_RATIO = 0.5
+
+FRAMES_FILE = 'frames.bin'
+INDEX_FILE = 'index.jsonl'
+
+_COUNT = struct.Struct('<I')
+
+
+def _pad(pixels, tile_size: int):
+    """RGBA pixels padded with zeros so both dimensions are multiples of the tile size"""
+    height, width = pixels.shape[:2]
+    padded_height = -(-height // tile_size) * tile_size
+    padded_width = -(-width // tile_size) * tile_size
+    if (padded_height, padded_width) == (height, width):
+        return np.ascontiguousarray(pixels)
+    padded = np.zeros((padded_height, padded_width, 4), dtype=np.uint8)
+    padded[:height, :width] = pixels
+    return padded
+
+
+def _tiles(pixels, tile_size: int):
+    """Padded pixels rearranged to (rows * cols, tile, tile, 4), one entry per tile"""
+    height, width = pixels.shape[:2]
+    rows, cols = height // tile_size, width // tile_size
+    return pixels.reshape(rows, tile_size, cols, tile_size, 4).swapaxes(1, 2).reshape(rows * cols, tile_size, tile_size, 4)
+
+
+def changed_tiles(previous, current, tile_size: int):
+    """uint32 indexes of tiles that differ between two padded frames"""
+    height, width = current.shape[:2]
+    rows, cols = height // tile_size, width // tile_size
+    words_before = previous.view(np.uint32).reshape(rows, tile_size, cols, tile_size)
+    words_after = current.view(np.uint32).reshape(rows, tile_size, cols, tile_size)
+    changed = (words_before != words_after).any(axis=(1, 3))
+    return np.flatnonzero(changed).astype(np.uint32)
+
+
+class TimelineWriter:
+    """Writes a step-by-step screen timeline as a keyframe followed by changed tiles.
+
+    frames.bin holds zlib-compressed records. A keyframe is the full padded
+    RGBA frame. A delta is a uint32 tile count, the uint32 indexes of changed
+    tiles, and their pixels. index.jsonl gets one line per frame as it is
+    written, so a timeline stays readable even if a run is interrupted.
+    Frames are encoded on a background thread in the order they were added.
+    """
+
+    def __init__(self, directory: str, tile_size: int = DEFAULT_TILE_SIZE,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        self.directory = directory
+        self.tile_size = int(tile_size)
+        self.keyframe_interval = int(keyframe_interval)
+        os.makedirs(directory, exist_ok=True)
+        self._frames = open(os.path.join(directory, FRAMES_FILE), 'wb')
+        self._index = open(os.path.join(directory, INDEX_FILE), 'w')
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timeline")
+        self._previous = None
+        self._previous_shape = None
+        self._since_keyframe = 0
+        self._futures = []
+        self.count = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def add(self, frame: RawFrame, step=None, label: str = None):
+        """Queue a frame; encoding and writing happen in the background"""
+        self._futures.append(self._executor.submit(self._write, frame, step, label))
+
+    def _write(self, frame: RawFrame, step, label):
+        padded = _pad(frame.pixels, self.tile_size)
+        shape = (frame.height, frame.width)
+        delta = None
+        if (self._previous is not None and shape == self._previous_shape
+                and self._since_keyframe < self.keyframe_interval):
+            indexes = changed_tiles(self._previous, padded, self.tile_size)
+            if len(indexes) <= KEYFRAME_CHANGE_RATIO * (padded.shape[0] * padded.shape[1]) / self.tile_size ** 2:
+                delta = indexes
+
+        if delta is None:
+            payload = padded.tobytes()
+            kind = 'key'
+            self._since_keyframe = 0
+        else:
+            tiles = _tiles(padded, self.tile_size)[delta]
+            payload = _COUNT.pack(len(delta)) + delta.tobytes() + np.ascontiguousarray(tiles).tobytes()
+            kind = 'delta'
+            self._since_keyframe += 1
+
+        data = zlib.compress(payload, 1)
+        offset = self._frames.tell()
+        self._frames.write(data)
+        record = {
+            'frame': self.count, 'step': step, 'label': label, 'kind': kind,
+            'offset': offset, 'length': len(data), 'width': frame.width, 'height': frame.height,
+            'tile_size': self.tile_size, 'tiles': None if delta is None else int(len(delta)),
+        }
+        self._index.write(json.dumps(record) + '\n')
+        self._frames.flush()
+        self._index.flush()
+
+        self._previous = padded
+        self._previous_shape = shape
+        self.count += 1
+        self.raw_bytes += frame.width * frame.height * 4
+        self.stored_bytes += len(data)
+
+    def close(self):
+        """Wait for queued frames, close the files and return a summary"""
+        errors = []
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(str(e))
+        self._executor.shutdown(wait=True)
+        self._frames.close()
+        self._index.close()
+        return {
+            'directory': self.directory,
+            'frames': self.count,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'errors': errors,
+        }
+
+
+class TimelineReader:
+    """Random access to the frames of a timeline.
+
+    A frame is rebuilt from the nearest keyframe at or before it. The last
+    rebuilt frame is kept, so stepping forward one frame applies a single delta.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        self._frames = open(os.path.join(directory, FRAMES_FILE), 'rb')
+        self._lock = threading.Lock()
+        self._current_index = None
+        self._current = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        self._frames.close()
+
+    def _payload(self, record):
+        self._frames.seek(record['offset'])
+        return zlib.decompress(self._frames.read(record['length']))
+
+    def _padded_shape(self, record):
+        tile_size = record['tile_size']
+        return (-(-record['height'] // tile_size) * tile_size, -(-record['width'] // tile_size) * tile_size, 4)
+
+    def _apply(self, pixels, record):
+        payload = self._payload(record)
+        if record['kind'] == 'key':
+            return np.frombuffer(payload, dtype=np.uint8).reshape(self._padded_shape(record)).copy()
+        tile_size = record['tile_size']
+        count = _COUNT.unpack_from(payload)[0]
+        indexes = np.frombuffer(payload, dtype=np.uint32, count=count, offset=_COUNT.size)
+        tiles = np.frombuffer(payload, dtype=np.uint8, offset=_COUNT.size + 4 * count).reshape(count, tile_size, tile_size, 4)
+        height, width = pixels.shape[:2]
+        grid = pixels.reshape(height // tile_size, tile_size, width // tile_size, tile_size, 4)
+        rows, cols = np.divmod(indexes, width // tile_size)
+        grid[rows, :, cols] = tiles
+        return pixels
+
+    def frame(self, index: int):
+        """Rebuild frame `index` as a RawFrame"""
+        if not 0 <= index < len(self.records):
+            raise IndexError(f"Timeline has {len(self.records)} frames, requested {index}")
+        with self._lock:
+            keyframe = index
+            while self.records[keyframe]['kind'] != 'key':
+                keyframe -= 1
+            if self._current_index is not None and keyframe <= self._current_index <= index:
+                start, pixels = self._current_index + 1, self._current
+            else:
+                start, pixels = keyframe, None
+            for position in range(start, index + 1):
+                pixels = self._apply(pixels, self.records[position])
+            self._current_index, self._current = index, pixels
+
+            record = self.records[index]
+            # Copy, since the cached frame is updated in place by later deltas
+            visible = pixels[:record['height'], :record['width']].copy()
+            return RawFrame(visible, record['width'], record['height'])
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import numpy as np
+from PIL import Image
+from utils.screencap import RawFrame
+
+BASELINES_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'data', 'baselines'))
+
+_SIZE_RE = re.compile(r'(Physical|Override) size:\s*(\d+)x(\d+)')
+_DENSITY_RE = re.compile(r'(Physical|Override) density:\s*(\d+)')
+
+# RGB bytes of a little-endian RGBA pixel read as uint32
+_RGB_BITS = 0x00FFFFFF
+# Above this share of changed pixels, channel differences are computed over the whole frame:
+# gathering and scattering most of a frame by index costs more than the dense pass
+DENSE_FRACTION = 0.1
+
+_profiles = {}
+_baselines = {}
+_baselines_lock = threading.Lock()
+
+
+def parse_display_profile(output: str):
+    """Build a profile key like '1080x2400_420dpi' from `wm size; wm density` output (overrides win)"""
+    sizes = {kind: (int(w), int(h)) for kind, w, h in _SIZE_RE.findall(output or '')}
+    densities = {kind: int(d) for kind, d in _DENSITY_RE.findall(output or '')}
+    size = sizes.get('Override') or sizes.get('Physical')
+    density = densities.get('Override') or densities.get('Physical')
+    if not size:
+        raise ValueError(f"Could not read the screen size from: {output!r}")
+    return f"{size[0]}x{size[1]}_{density or 0}dpi"
+
+
+def display_profile(driver):
+    """Resolution/density key of the device in this session (read once per session)"""
+    key = getattr(driver, 'session_id', None) or id(driver)
+    if key not in _profiles:
+        output = driver.execute_script('mobile: shell', {'command': 'wm size; wm density'})
+        _profiles[key] = parse_display_profile(output)
+    return _profiles[key]
+
+
+def baseline_path(name: str, profile: str):
+    safe_name = name.replace("..", "").replace("/", "_").replace("\\", "_")
+    if not safe_name.lower().endswith('.png'):
+        safe_name += '.png'
+    return os.path.join(BASELINES_DIR, profile, safe_name)
+
+
+def load_baseline(path: str):
+    """Decoded RGBA array of a baseline image, cached until the file changes"""
+    mtime = os.path.getmtime(path)
+    with _baselines_lock:
+        cached = _baselines.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert('RGBA'))
+    with _baselines_lock:
+        _baselines[path] = (mtime, pixels)
+    return pixels
+
+
+def save_baseline(frame: RawFrame, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.save(path)
+    with _baselines_lock:
+        _baselines.pop(path, None)
+    return path
+
+
+def build_mask(shape, ignore_regions=None):
+    """Boolean (height, width) mask of pixels to compare.
+
+    Ignore regions are [x, y, width, height] lists, {x, y, width, height}
+    dicts, or a string like "0,0,1080,80; 0,2300,1080,100".
+    """
+    if isinstance(ignore_regions, str):
+        ignore_regions = [r.split(',') for r in ignore_regions.split(';') if r.strip()]
+    mask = np.ones(shape[:2], dtype=bool)
+    for region in ignore_regions or []:
+        if isinstance(region, dict):
+            region = [region.get('x', 0), region.get('y', 0), region.get('width', 0), region.get('height', 0)]
+        x, y, width, height = (int(v) for v in region)
+        mask[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)] = False
+    return mask
+
+
+def channel_tolerance(tolerance):
+    """Per-channel (R, G, B) tolerance array from an int or a 3-item list"""
+    values = np.array(tolerance if isinstance(tolerance, (list, tuple)) else [tolerance] * 3, dtype=np.uint8)
+    if values.shape != (3,):
+        raise ValueError(f"channel_tolerance must be a number or [r, g, b], got {tolerance!r}")
+    return values
+
+
+def _pixels_as_uint32(pixels):
+    """View (height, width, 4) uint8 pixels as one uint32 per pixel (copies only if not contiguous)"""
+    return np.ascontiguousarray(pixels).view(np.uint32).reshape(pixels.shape[:2])
+
+
+def _exceeding_delta(actual, baseline, limits):
+    """Maximum channel difference per pixel, zero where no channel exceeds its limit.
+
+    Works channel by channel on (..., 4) or (..., 3) arrays, avoiding
+    reductions over the short channel axis.
+    """
+    delta = exceeded = None
+    for channel in range(3):
+        a, b = actual[..., channel], baseline[..., channel]
+        difference = np.maximum(a, b)
+        difference -= np.minimum(a, b)
+        over = difference > limits[channel]
+        if delta is None:
+            delta, exceeded = difference, over
+        else:
+            np.maximum(delta, difference, out=delta)
+            exceeded |= over
+    delta[~exceeded] = 0
+    return delta
+
+
+def compare(actual, baseline, tolerance=0, mask=None):
+    """Compare two (height, width, 4) RGBA uint8 arrays, ignoring alpha.
+
+    Whole pixels are first compared as uint32 words, which is a single cheap
+    pass over the frame. Channel differences are then only computed for the
+    pixels that changed, or for the whole frame when most of it changed. A
+    pixel differs when any channel differs by more than its tolerance.
+    Returns (stats, delta), where delta is the flat per-pixel maximum
+    channel difference (zero for pixels that match).
+    """
+    if actual.shape != baseline.shape:
+        raise ValueError(f"Size mismatch: capture {actual.shape[1]}x{actual.shape[0]}, "
+                         f"baseline {baseline.shape[1]}x{baseline.shape[0]}")
+    height, width = actual.shape[:2]
+    changed = _pixels_as_uint32(actual) ^ _pixels_as_uint32(baseline)
+    changed &= np.uint32(_RGB_BITS)
+    if mask is not None:
+        changed[~mask] = 0
+    limits = channel_tolerance(tolerance)
+    changed_count = int(np.count_nonzero(changed))
+
+    if changed_count > DENSE_FRACTION * height * width:
+        delta = _exceeding_delta(actual, baseline, limits)
+        if mask is not None:
+            delta[~mask] = 0
+        differing_count = int(np.count_nonzero(delta))
+        rows = np.flatnonzero(delta.any(axis=1))
+        cols = np.flatnonzero(delta.any(axis=0))
+        delta = delta.ravel()
+    else:
+        candidates = np.flatnonzero(changed)
+        candidate_delta = _exceeding_delta(actual.reshape(-1, 4)[candidates], baseline.reshape(-1, 4)[candidates], limits)
+        differing = candidates[candidate_delta != 0]
+        delta = np.zeros(height * width, dtype=np.uint8)
+        delta[differing] = candidate_delta[candidate_delta != 0]
+        differing_count = len(differing)
+        rows, cols = np.divmod(differing, width)
+
+    compared = int(np.count_nonzero(mask)) if mask is not None else height * width
+    stats = {
+        'compared_pixels': compared,
+        'differing_pixels': differing_count,
+        'diff_percent': round(100.0 * differing_count / compared, 4) if compared else 0.0,
+        'max_channel_delta': int(delta.max()) if differing_count else 0,
+        'diff_bounds': None,
+    }
+    if differing_count:
+        stats['diff_bounds'] = [int(cols.min()), int(rows.min()), int(cols.max() - cols.min() + 1),
+                                int(rows.max() - rows.min() + 1)]
+    return stats, delta
+
+
+def heatmap(baseline, delta, mask=None):
+    """RawFrame showing the baseline dimmed to gray with differences in red (brighter = larger)"""
+    height, width = baseline.shape[:2]
+    rgba = np.empty((height * width, 4), dtype=np.uint8)
+    rgba[:, :3] = (baseline.reshape(-1, 4)[:, 1] >> 2)[:, None]
+    rgba[:, 3] = 255
+    if mask is not None:
+        rgba[~mask.ravel(), 2] = 120
+    differing = np.flatnonzero(delta)
+    rgba[differing, 0] = np.maximum(delta[differing], 128)
+    rgba[differing, 1:3] = 0
+    return RawFrame(rgba, width, height)